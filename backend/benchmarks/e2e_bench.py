@@ -0,0 +1,328 @@
+# backend/benchmarks/e2e_bench.py - END-TO-END LATENCY, THROUGHPUT & MEMORY
+"""
+Drive /generate-diagram and /chat against synthetic repositories and a stub LLM
+
+    cd backend
+    python -m benchmarks.e2e_bench                                    # 1k and 10k files, flat
+    python -m benchmarks.e2e_bench --files 100000 --shapes deep,monorepo --requests 50 --concurrency 8
+    python -m benchmarks.e2e_bench --mode partial --llm-latency 1.5 --json results.json
+    python -m benchmarks.e2e_bench --mode tarball --files 1000
+
+Each run starts:
+- synthetic bare git remotes (benchmarks/synthetic_repos.py), cloned over file:// via GITHUB_URL
+  (--mode tarball: served as refs and codeload tarballs by benchmarks/fake_github.py instead)
+- the deterministic fake LLM / GitHub API (benchmarks/fake_llm.py) via OPENAI_BASE_URL and GITHUB_API_URL
+- the backend itself under uvicorn, with its caches in a scratch directory
+
+Phases per repository:
+- cold_diagram: first /generate-diagram (clone + full analysis + LLM)
+- reanalysis: a new commit before every request (fetch + incremental or full re-analysis)
+- diagram: concurrent /generate-diagram on an unchanged repo (cached analysis, uncached LLM)
+- chat: concurrent /chat questions (cached analysis, uncached LLM)
+
+Reports p50/p95/p99 latency, throughput and peak server RSS per phase, and p50/p95/p99
+per pipeline stage from the Server-Timing headers the backend sends.
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_repos import SHAPES, create_remote, add_commit  # noqa: E402
+from benchmarks.fake_llm import start_fake_llm  # noqa: E402
+from benchmarks.fake_github import start_fake_github  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OWNER = "bench"
+ENDPOINTS = ("diagram", "chat")
+REQUEST_TIMEOUT_SECONDS = 600
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile (0 for no values)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(fraction * len(ordered)))) - 1]
+
+
+def parse_server_timing(header: str) -> dict:
+    """'clone;dur=840.0, scan;dur=12.5' -> {"clone": 0.84, "scan": 0.0125} (seconds)"""
+    stages = {}
+    for entry in filter(None, (part.strip() for part in (header or "").split(","))):
+        name, _, params = entry.partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                stages[name.strip()] = float(value) / 1000
+    return stages
+
+
+def read_rss_bytes(pid: int) -> int:
+    """Resident set size of a process (Linux /proc, psutil elsewhere when installed)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except Exception:
+        return 0
+
+
+class RSSSampler:
+    """Track the peak RSS of a process in a background thread"""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = read_rss_bytes(self.pid)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, read_rss_bytes(self.pid))
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, read_rss_bytes(self.pid))
+
+
+def start_backend(port: int, env: dict, log_path: str) -> subprocess.Popen:
+    """uvicorn main:app in its own process; waits for /health"""
+    log_file = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode} (see {log_path})")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Backend did not become healthy within 60s (see {log_path})")
+
+
+def stop_backend(process: subprocess.Popen):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def send_request(client: httpx.Client, endpoint: str, repo_url: str, index: int) -> dict:
+    """One request; returns {"seconds", "ok", "stages", "error"}"""
+    if endpoint == "chat":
+        path = "/chat"
+        payload = {"repo_url": repo_url, "question": f"How is the code organised? ({index})", "use_cache": False}
+    else:
+        path = "/generate-diagram"
+        payload = {"repo_url": repo_url, "diagram_type": "component", "use_cache": False}
+
+    start = time.perf_counter()
+    try:
+        response = client.post(path, json=payload, headers={"X-Request-ID": f"bench-{endpoint}-{index}"})
+        ok = response.status_code == 200
+        error = None if ok else f"HTTP {response.status_code}: {response.text[:200]}"
+        stages = parse_server_timing(response.headers.get("server-timing"))
+    except httpx.HTTPError as e:
+        ok, error, stages = False, str(e), {}
+    return {"seconds": time.perf_counter() - start, "ok": ok, "stages": stages, "error": error}
+
+
+def run_phase(name: str, base_url: str, pid: int, endpoint: str, repo_url: str,
+              requests: int, concurrency: int, before_each=None) -> dict:
+    """Run `requests` requests (concurrently unless before_each is set) and summarise them"""
+    results = []
+    with RSSSampler(pid) as rss, httpx.Client(base_url=base_url, timeout=REQUEST_TIMEOUT_SECONDS) as client:
+        start = time.perf_counter()
+        if before_each is not None:
+            for index in range(requests):
+                before_each(index)
+                results.append(send_request(client, endpoint, repo_url, index))
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(lambda i: send_request(client, endpoint, repo_url, i), range(requests)))
+        wall = time.perf_counter() - start
+
+    latencies = [r["seconds"] for r in results if r["ok"]]
+    stage_values = {}
+    for result in results:
+        for stage, seconds in result["stages"].items():
+            stage_values.setdefault(stage, []).append(seconds)
+
+    errors = [r["error"] for r in results if not r["ok"]]
+    if errors:
+        print(f"   ⚠️ {name}: {len(errors)} failed, first error: {errors[0]}")
+    return {
+        "phase": name,
+        "requests": len(results),
+        "errors": len(errors),
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "peak_rss_mb": rss.peak / (1024 * 1024),
+        "stages": {
+            stage: {"n": len(values), "p50": percentile(values, 0.50),
+                    "p95": percentile(values, 0.95), "p99": percentile(values, 0.99)}
+            for stage, values in stage_values.items()
+        }
+    }
+
+
+def print_phase(result: dict):
+    print(f"   {result['phase']:<13} n={result['requests']:<4} err={result['errors']:<3} "
+          f"p50={result['p50']:.3f}s p95={result['p95']:.3f}s p99={result['p99']:.3f}s "
+          f"{result['throughput']:.2f} req/s  peak RSS {result['peak_rss_mb']:.0f} MB")
+    for stage, stats in result["stages"].items():
+        print(f"      {stage:<20} n={stats['n']:<4} p50={stats['p50'] * 1000:.1f}ms "
+              f"p95={stats['p95'] * 1000:.1f}ms p99={stats['p99'] * 1000:.1f}ms")
+
+
+def benchmark_repository(args, work_dir: str, shape: str, file_count: int, fake_port: int,
+                         github_port: int = None) -> dict:
+    """Fresh backend (empty caches) against one synthetic repository"""
+    repo_name = f"{shape}-{file_count}"
+    remotes = os.path.join(work_dir, "remotes")
+    remote_path = os.path.join(remotes, OWNER, repo_name)
+
+    start = time.perf_counter()
+    create_remote(remote_path, file_count, shape, args.seed)
+    print(f"\n📦 {repo_name}: remote ready in {time.perf_counter() - start:.1f}s")
+
+    state_dir = tempfile.mkdtemp(prefix=f"{repo_name}-", dir=work_dir)
+    port = _free_port()
+    env = dict(os.environ,
+               OPENAI_API_KEY="bench-key",
+               OPENAI_BASE_URL=f"http://127.0.0.1:{fake_port}/v1",
+               GITHUB_URL=f"file://{remotes}",
+               GITHUB_API_URL=f"http://127.0.0.1:{fake_port}",
+               REPO_CACHE_DIR=os.path.join(state_dir, "repos"),
+               ANALYSIS_CACHE_PATH=os.path.join(state_dir, "analysis_cache.db"),
+               JOBS_DB_PATH=os.path.join(state_dir, "jobs.db"),
+               REPO_ACQUISITION_MODE=args.mode)
+    env.pop("GITHUB_TOKEN", None)
+    if github_port:
+        env["GITHUB_URL"] = env["GITHUB_CODELOAD_URL"] = f"http://127.0.0.1:{github_port}"
+    if args.no_incremental:
+        env["INCREMENTAL_MAX_CHANGES"] = "0"
+
+    process = start_backend(port, env, os.path.join(state_dir, "backend.log"))
+    base_url = f"http://127.0.0.1:{port}"
+    repo_url = f"https://github.com/{OWNER}/{repo_name}"
+    phases = []
+    try:
+        phases.append(run_phase("cold_diagram", base_url, process.pid, "diagram", repo_url, 1, 1))
+        if args.analysis_runs:
+            revision_base = int(time.time())
+            phases.append(run_phase(
+                "reanalysis", base_url, process.pid, "diagram", repo_url, args.analysis_runs, 1,
+                before_each=lambda index: add_commit(remote_path, revision_base + index)
+            ))
+        for endpoint in args.endpoints:
+            phases.append(run_phase(endpoint, base_url, process.pid, endpoint, repo_url,
+                                    args.requests, args.concurrency))
+    finally:
+        stop_backend(process)
+
+    for phase in phases:
+        print_phase(phase)
+    return {"repository": repo_name, "shape": shape, "files": file_count, "mode": args.mode, "phases": phases}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end backend benchmark with a stub LLM")
+    parser.add_argument("--files", default="1000,10000", help="Comma-separated repository sizes")
+    parser.add_argument("--shapes", default="flat", help=f"Comma-separated shapes ({', '.join(SHAPES)})")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint phase")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--analysis-runs", type=int, default=3, help="Requests after a new commit each")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated: diagram, chat")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub LLM seconds per call")
+    parser.add_argument("--llm-token-delay", type=float, default=0.0, help="Stub LLM seconds per token")
+    parser.add_argument("--mode", choices=("full", "partial", "tarball"), default="full", help="REPO_ACQUISITION_MODE")
+    parser.add_argument("--no-incremental", action="store_true", help="Force full re-analysis on new commits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="Reuse remotes from this directory (kept afterwards)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    shapes = [s.strip() for s in args.shapes.split(",") if s.strip()]
+    if unknown or set(shapes) - set(SHAPES):
+        parser.error(f"Unknown endpoint or shape: {', '.join(sorted(unknown | (set(shapes) - set(SHAPES))))}")
+
+    work_dir = os.path.abspath(args.work_dir) if args.work_dir else tempfile.mkdtemp(prefix="repovision-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    fake_llm = start_fake_llm(0, args.llm_latency, args.llm_token_delay)
+    print(f"🤖 Stub LLM on port {fake_llm.server_address[1]} "
+          f"({args.llm_latency:.2f}s per call, {args.llm_token_delay * 1000:.1f}ms per token)")
+    fake_github = start_fake_github(os.path.join(work_dir, "remotes")) if args.mode == "tarball" else None
+    github_port = fake_github.server_address[1] if fake_github else None
+
+    results = []
+    try:
+        for shape in shapes:
+            for file_count in (int(n) for n in args.files.split(",")):
+                results.append(benchmark_repository(args, work_dir, shape, file_count, fake_llm.server_address[1],
+                                                    github_port))
+    finally:
+        fake_llm.shutdown()
+        if fake_github:
+            fake_github.shutdown()
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k != "json"}, "results": results}, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+    failed = sum(phase["errors"] for result in results for phase in result["phases"])
+    print(f"\n{'✅' if not failed else '❌'} {len(results)} repositories benchmarked, {failed} failed requests")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
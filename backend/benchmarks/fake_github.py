@@ -0,0 +1,129 @@
+# backend/benchmarks/fake_github.py - LOCAL GITHUB STAND-IN FOR TARBALL MODE
+"""
+Serves bare git remotes (e.g. from benchmarks/synthetic_repos.py) the way GitHub does for
+REPO_ACQUISITION_MODE=tarball: the smart-HTTP ref advertisement and codeload tarballs
+
+    cd backend
+    python -m benchmarks.fake_github --remotes /tmp/remotes --port 8788
+
+With remotes/<owner>/<repo> bare repositories, point the backend at it with
+GITHUB_URL=http://127.0.0.1:8788 and GITHUB_CODELOAD_URL=http://127.0.0.1:8788.
+- GET /<owner>/<repo>.git/info/refs?service=git-upload-pack: HEAD and its branch
+- GET /<owner>/<repo>/tar.gz/<ref>: `git archive` of ref under an "<owner>-<repo>-<sha>/" top directory,
+  with the commit in the pax "comment" header like GitHub's
+"""
+import os
+import sys
+import argparse
+import threading
+import subprocess
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK_BYTES = 64 * 1024
+
+
+def _pkt_line(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return f"{len(data) + 4:04x}".encode("ascii") + data
+
+
+def _git(remote_path: str, *args) -> str:
+    return subprocess.run(["git", "--git-dir", remote_path, *args], check=True, capture_output=True,
+                          text=True).stdout.strip()
+
+
+def ref_advertisement(remote_path: str) -> bytes:
+    """What git ls-remote reads over smart HTTP (refs only, no pack negotiation)"""
+    head = _git(remote_path, "rev-parse", "HEAD")
+    branch = _git(remote_path, "symbolic-ref", "HEAD")
+    return b"".join([
+        _pkt_line("# service=git-upload-pack\n"), b"0000",
+        _pkt_line(f"{head} HEAD\0symref=HEAD:{branch} agent=git/fake-github\n"),
+        _pkt_line(f"{head} {branch}\n"), b"0000"
+    ])
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    remotes_dir = ""
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+    def _send(self, status: int, body: bytes, content_type: str = "text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _remote(self, owner: str, repo_name: str) -> str:
+        path = os.path.join(self.remotes_dir, owner, repo_name)
+        return path if "/" not in owner + repo_name and os.path.isdir(path) else None
+
+    def do_GET(self):
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        if len(parts) == 4 and parts[1].endswith(".git") and parts[2:] == ["info", "refs"]:
+            remote_path = self._remote(parts[0], parts[1][:-len(".git")])
+            if remote_path:
+                self._send(200, ref_advertisement(remote_path), "application/x-git-upload-pack-advertisement")
+                return
+        elif len(parts) == 4 and parts[2] == "tar.gz":
+            remote_path = self._remote(parts[0], parts[1])
+            if remote_path:
+                self._send_tarball(remote_path, parts[0], parts[1], parts[3])
+                return
+        self._send(404, b"Not Found")
+
+    def _send_tarball(self, remote_path: str, owner: str, repo_name: str, ref: str):
+        """Stream `git archive` output chunked, as codeload does (no Content-Length up front)"""
+        try:
+            sha = _git(remote_path, "rev-parse", "--verify", f"{ref}^{{commit}}")
+        except subprocess.CalledProcessError:
+            self._send(404, b"Not Found")
+            return
+
+        process = subprocess.Popen(
+            ["git", "--git-dir", remote_path, "archive", "--format=tar.gz",
+             f"--prefix={owner}-{repo_name}-{sha[:7]}/", sha],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-gzip")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while chunk := process.stdout.read(CHUNK_BYTES):
+                self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        finally:
+            process.stdout.close()
+            process.wait()
+
+
+def start_fake_github(remotes_dir: str, port: int = 0) -> ThreadingHTTPServer:
+    """Serve remotes_dir/<owner>/<repo> in a daemon thread; the bound port is server.server_address[1]"""
+    handler = type("ConfiguredFakeGitHubHandler", (FakeGitHubHandler,), {"remotes_dir": os.path.abspath(remotes_dir)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve bare git remotes as GitHub refs and codeload tarballs")
+    parser.add_argument("--remotes", required=True, help="Directory holding <owner>/<repo> bare repositories")
+    parser.add_argument("--port", type=int, default=8788)
+    args = parser.parse_args()
+
+    server = start_fake_github(args.remotes, args.port)
+    print(f"🐙 Fake GitHub on http://127.0.0.1:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
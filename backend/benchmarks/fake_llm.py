@@ -0,0 +1,169 @@
+# backend/benchmarks/fake_llm.py - DETERMINISTIC OPENAI-COMPATIBLE STUB FOR BENCHMARKS
+"""
+A local stand-in for the OpenAI chat completions API (and the GitHub metadata endpoint)
+
+    cd backend
+    python -m benchmarks.fake_llm --port 8787 --latency 0.5 --token-delay 0.002
+
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8787/v1 and
+GITHUB_API_URL=http://127.0.0.1:8787. Answers depend only on the prompt, so runs are
+repeatable; latency is simulated with a fixed delay per call plus a delay per streamed token.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NODE_GROUPS = ("Frontend", "Gateway", "Domain", "Storage", "Workers")
+NODES_PER_GROUP = 8
+
+
+def diagram_reply() -> str:
+    """A flowchart big enough to pass validate_diagram_completeness (35+ named nodes in subgraphs)"""
+    lines = ["graph TB"]
+    for group in NODE_GROUPS:
+        lines.append(f"    subgraph {group}Layer[\"{group}\"]")
+        for i in range(NODES_PER_GROUP):
+            lines.append(f"        {group}{i}[\"{group} part {i}\"]")
+        lines.append("    end")
+    for index, group in enumerate(NODE_GROUPS[:-1]):
+        following = NODE_GROUPS[index + 1]
+        for i in range(NODES_PER_GROUP):
+            lines.append(f"    {group}{i} --> {following}{i}")
+    return "\n".join(lines)
+
+
+def chat_reply(prompt: str) -> str:
+    """Prose answer, with a diagram block when the prompt asks for the [DIAGRAM_START] format"""
+    answer = (f"This repository is organised in layers. The request you sent was {len(prompt)} characters long "
+              "and the answer below is generated by the benchmark stub.")
+    if "[DIAGRAM_START]" in prompt:
+        return f"{answer}\n\n[DIAGRAM_START]\n{diagram_reply()}\n[DIAGRAM_END]\n\nEach layer only calls the next one."
+    return answer
+
+
+def _prompt_text(body: dict) -> str:
+    parts = []
+    for message in body.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def _tokens(text: str) -> list:
+    """Roughly word-sized pieces that concatenate back to text"""
+    pieces = []
+    start = 0
+    for index, char in enumerate(text):
+        if char in " \n" and index > start:
+            pieces.append(text[start:index + 1])
+            start = index + 1
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    token_delay = 0.0
+    calls = 0
+    calls_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "repos":  # GitHub repository metadata
+            self._send_json(200, {
+                "name": parts[2], "full_name": f"{parts[1]}/{parts[2]}", "description": "Synthetic benchmark repository",
+                "stargazers_count": 0, "forks_count": 0, "language": "Python", "default_branch": "main",
+                "private": False, "topics": []
+            })
+        else:
+            self._send_json(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown endpoint {self.path}"}})
+            return
+
+        with self.calls_lock:
+            FakeLLMHandler.calls += 1
+        prompt = _prompt_text(body)
+        reply = chat_reply(prompt) if "[DIAGRAM_START]" in prompt else diagram_reply()
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(reply) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        model = body.get("model", "fake-model")
+        time.sleep(self.latency)
+
+        if not body.get("stream"):
+            time.sleep(self.token_delay * len(_tokens(reply)))
+            self._send_json(200, {
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta: dict, finish_reason: str = None, extra: dict = None):
+            chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **(extra or {})}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        for token in _tokens(reply):
+            time.sleep(self.token_delay)
+            event({"content": token})
+        event({}, "stop", {"usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_fake_llm(port: int = 0, latency: float = 0.0, token_delay: float = 0.0) -> ThreadingHTTPServer:
+    """Serve in a daemon thread; the bound port is server.server_address[1]"""
+    handler = type("ConfiguredFakeLLMHandler", (FakeLLMHandler,), {"latency": latency, "token_delay": token_delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic OpenAI-compatible stub server")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response starts")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds per generated token")
+    args = parser.parse_args()
+
+    server = start_fake_llm(args.port, args.latency, args.token_delay)
+    print(f"🤖 Fake LLM on http://127.0.0.1:{server.server_address[1]}/v1 (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
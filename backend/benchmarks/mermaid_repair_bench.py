@@ -0,0 +1,111 @@
+# backend/benchmarks/mermaid_repair_bench.py - MERMAID REPAIR REGRESSION & THROUGHPUT
+"""
+Run the shared repair engine over a corpus of broken LLM outputs
+
+    cd backend
+    python -m benchmarks.mermaid_repair_bench            # check against expected outputs
+    python -m benchmarks.mermaid_repair_bench --update   # accept current outputs as expected
+
+Each corpus/<case>.mmd has a <case>.expected.mmd with the repaired diagram.
+Exits non-zero when an output changes or a previously valid repair stops parsing.
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.mermaid_repair import repair_diagram  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mermaid_corpus")
+
+
+def load_corpus(corpus_dir: str = CORPUS_DIR) -> list:
+    """[(case name, broken code, expected code or None)] sorted by name"""
+    cases = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.mmd"))):
+        if path.endswith(".expected.mmd"):
+            continue
+        name = os.path.basename(path)[:-len(".mmd")]
+        expected_path = os.path.join(corpus_dir, f"{name}.expected.mmd")
+        with open(path, encoding="utf-8") as f:
+            code = f.read()
+        expected = None
+        if os.path.exists(expected_path):
+            with open(expected_path, encoding="utf-8") as f:
+                expected = f.read().rstrip("\n")
+        cases.append((name, code, expected))
+    return cases
+
+
+def check_regressions(cases: list, update: bool = False) -> int:
+    """Repair every case, compare with the expected output and return the number of failures"""
+    failures = 0
+    valid = 0
+
+    for name, code, expected in cases:
+        result = repair_diagram(code)
+        status = "✅" if result["is_valid"] else "⚠️"
+        valid += result["is_valid"]
+
+        if update:
+            with open(os.path.join(CORPUS_DIR, f"{name}.expected.mmd"), "w", encoding="utf-8") as f:
+                f.write(result["mermaid_code"] + "\n")
+        elif expected is None:
+            status = "❓"
+            print(f"   {name}: no expected output (run with --update)")
+        elif result["mermaid_code"] != expected:
+            status = "❌"
+            failures += 1
+
+        print(f"{status} {name}: {len(result['fixes'])} fixes, {len(result['errors'])} unfixable")
+        for error in result["errors"]:
+            print(f"      - {error}")
+
+    print(f"\n📊 {valid}/{len(cases)} diagrams valid after local repair")
+    return failures
+
+
+def measure_throughput(cases: list, seconds: float = 2.0) -> dict:
+    """Repair the whole corpus repeatedly for about `seconds` and report per-diagram latency"""
+    codes = [code for _, code, _ in cases]
+    repaired = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for code in codes:
+            repair_diagram(code)
+        repaired += len(codes)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "diagrams": repaired,
+        "seconds": round(elapsed, 3),
+        "diagrams_per_second": round(repaired / elapsed, 1),
+        "microseconds_per_diagram": round(elapsed / repaired * 1e6, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mermaid repair regression and throughput benchmark")
+    parser.add_argument("--update", action="store_true", help="Write current outputs as expected")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Throughput run duration")
+    args = parser.parse_args()
+
+    cases = load_corpus()
+    print(f"🔧 Mermaid repair corpus: {len(cases)} cases\n")
+
+    failures = check_regressions(cases, update=args.update)
+
+    stats = measure_throughput(cases, args.seconds)
+    print(f"⚡ {stats['diagrams_per_second']} diagrams/s "
+          f"({stats['microseconds_per_diagram']} µs per diagram, {stats['diagrams']} repaired)")
+
+    if failures:
+        print(f"\n❌ {failures} regression(s): repaired output differs from the expected file")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
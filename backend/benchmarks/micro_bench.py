@@ -0,0 +1,206 @@
+# backend/benchmarks/micro_bench.py - MICRO-BENCHMARKS FOR PER-REQUEST HOT FUNCTIONS
+"""
+Time the analysis and formatting functions every request runs, against a stored baseline
+
+    cd backend
+    python -m benchmarks.micro_bench                        # compare with micro_baseline.json
+    python -m benchmarks.micro_bench --update               # accept current timings as the baseline
+    python -m benchmarks.micro_bench --only format --history results.jsonl
+
+Fixtures are generated (benchmarks/synthetic_repos.py, written to a temporary checkout),
+so every machine benchmarks the same input. Each benchmark is calibrated to run for
+--min-time per round and reports the fastest of --rounds rounds (the least disturbed by
+other processes, as timeit recommends) alongside mean and spread, like pytest-benchmark.
+Exits non-zero when a benchmark is more than --threshold slower than the baseline.
+Baselines are machine-specific: regenerate with --update on the machine that compares.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.github_service import (  # noqa: E402
+    analyze_local_repo, build_file_tree_from_disk, read_important_files, detect_languages,
+    format_file_structure, format_file_contents
+)
+from services.repo_scanner import classify_file_purpose  # noqa: E402
+from services.llm_service import (  # noqa: E402
+    extract_detailed_repo_components, validate_mermaid_syntax, fix_mermaid_syntax, extract_diagram_from_response
+)
+from benchmarks.synthetic_repos import SHAPES, iter_repository_files  # noqa: E402
+from benchmarks.fake_llm import diagram_reply, chat_reply  # noqa: E402
+from benchmarks.mermaid_repair_bench import load_corpus  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "micro_baseline.json")
+
+
+def write_checkout(root: str, file_count: int, shape: str, seed: int = 0) -> str:
+    """Write a synthetic repository as a plain directory tree"""
+    for rel_path, data in iter_repository_files(file_count, shape, seed):
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    return root
+
+
+def build_cases(checkout: str) -> list:
+    """[(name, callable)] - one entry per benchmarked function"""
+    repo_data = analyze_local_repo(checkout, "https://github.com/bench/micro")
+    tree = repo_data["file_structure"]
+    contents = repo_data["file_contents"]
+    paths = list(contents) + [f"src/pkg_{i}/UserService_{i}.test.tsx" for i in range(200)]
+    names = [(path.rsplit("/", 1)[-1], path) for path in paths]
+    broken = [code for _, code, _ in load_corpus()]
+    diagram = diagram_reply()
+    response = chat_reply("[DIAGRAM_START]")
+
+    def classify_all():
+        for name, path in names:
+            classify_file_purpose(name, path)
+
+    def validate_all():
+        validate_mermaid_syntax(diagram)
+        for code in broken:
+            validate_mermaid_syntax(code)
+
+    def fix_all():
+        for code in broken:
+            fix_mermaid_syntax(code)
+
+    return [
+        ("build_file_tree_from_disk", lambda: build_file_tree_from_disk(checkout)),
+        ("read_important_files", lambda: read_important_files(checkout)),
+        ("detect_languages", lambda: detect_languages(checkout)),
+        ("classify_file_purpose", classify_all),
+        ("format_file_structure", lambda: format_file_structure(tree)),
+        ("format_file_structure_full", lambda: format_file_structure(tree, max_items=100000)),  # context packer
+        ("format_file_contents", lambda: format_file_contents(contents)),
+        ("extract_detailed_repo_components", lambda: extract_detailed_repo_components(repo_data)),
+        ("validate_mermaid_syntax", validate_all),
+        ("fix_mermaid_syntax", fix_all),
+        ("extract_diagram_from_response", lambda: extract_diagram_from_response(response)),
+    ]
+
+
+def measure(function, rounds: int, min_time: float) -> dict:
+    """Calibrate iterations per round to about min_time, then time `rounds` rounds (seconds per call)"""
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or iterations >= 1_000_000:
+            break
+        iterations *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        timings.append((time.perf_counter() - start) / iterations)
+
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "mean": statistics.fmean(timings),
+        "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "iterations": iterations,
+        "rounds": rounds
+    }
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}µs"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    """Print results next to the baseline and return the number of regressions"""
+    regressions = 0
+    for name, stats in results.items():
+        reference = baseline.get(name, {}).get("min")
+        if not reference:
+            status, change = "❓", "no baseline"
+        else:
+            ratio = stats["min"] / reference
+            change = f"{(ratio - 1) * 100:+.1f}% vs {_format_time(reference)}"
+            status = "❌" if ratio > 1 + threshold else ("⚡" if ratio < 1 - threshold else "✅")
+            regressions += status == "❌"
+        print(f"{status} {name:<34} {_format_time(stats['min']):>10} "
+              f"(±{_format_time(stats['stddev'])}, {stats['iterations']}×{stats['rounds']})  {change}")
+    return regressions
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for per-request hot functions")
+    parser.add_argument("--files", type=int, default=5000, help="Fixture repository size")
+    parser.add_argument("--shape", choices=SHAPES, default="monorepo", help="Fixture repository shape")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.1, help="Seconds per round")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--only", help="Run benchmarks whose name contains this text")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update", action="store_true", help="Write current timings as the baseline")
+    parser.add_argument("--history", help="Append this run as one JSON line to this file")
+    args = parser.parse_args()
+
+    checkout = tempfile.mkdtemp(prefix="repovision-micro-")
+    try:
+        write_checkout(checkout, args.files, args.shape)
+        cases = [(name, fn) for name, fn in build_cases(checkout) if not args.only or args.only in name]
+        print(f"🔬 {len(cases)} micro-benchmarks on a {args.shape} fixture with {args.files} files\n")
+        results = {name: measure(fn, args.rounds, args.min_time) for name, fn in cases}
+    finally:
+        shutil.rmtree(checkout, ignore_errors=True)
+
+    fixture = {"files": args.files, "shape": args.shape}
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("fixture") == fixture:
+            baseline = stored.get("results", {})
+        else:
+            print(f"⚠️ Baseline was recorded on {stored.get('fixture')}, not compared\n")
+
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.history:
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "revision": _git_revision(),
+                                "fixture": fixture, "results": results}) + "\n")
+
+    if args.update:
+        stored = {"fixture": fixture, "results": {**baseline, **results}}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n💾 Baseline written to {args.baseline}")
+    elif regressions:
+        print(f"\n❌ {regressions} benchmark(s) more than {args.threshold:.0%} slower than the baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
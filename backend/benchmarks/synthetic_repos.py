@@ -0,0 +1,171 @@
+# backend/benchmarks/synthetic_repos.py - SYNTHETIC GIT REMOTES FOR BENCHMARKS
+"""
+Generate deterministic repositories of a given size and shape as local bare git remotes
+
+    cd backend
+    python -m benchmarks.synthetic_repos --files 10000 --shape monorepo --out /tmp/remotes
+
+Shapes:
+- flat: a few source folders with a couple of hundred files each
+- deep: the same files spread over 10 levels of nested folders
+- monorepo: packages/<name>/{src,tests} with a manifest per package
+
+Every shape mixes Python and JavaScript sources that import each other, configs, docs,
+vendored code (node_modules, dist), binary assets and a few data files over the 400KB
+read limit, so each skip rule in the analyzer has something to skip. Docs live under
+website/ so they sort after the sources and don't fill the 200 read slots on their own.
+Repositories are written straight into the object store with git fast-import
+(no working tree), so 100k files take seconds.
+"""
+import os
+import sys
+import random
+import argparse
+import subprocess
+
+SHAPES = ("flat", "deep", "monorepo")
+BRANCH = "refs/heads/main"
+COMMITTER = "Benchmark <bench@example.com> 1700000000 +0000"
+FILES_PER_FOLDER = 200
+DEEP_LEVELS = 10
+FILES_PER_PACKAGE = 500
+
+
+def _python_module(rng: random.Random, module: str, siblings: list) -> bytes:
+    imports = "\n".join(f"from .{name} import {name.title().replace('_', '')}" for name in rng.sample(siblings, min(3, len(siblings))))
+    class_name = module.title().replace("_", "")
+    methods = "\n".join(
+        f"    def step_{i}(self, value):\n        return self.helper_{i % 3}(value) + {i}\n" for i in range(rng.randint(3, 8))
+    )
+    route = (f'\n@router.get("/{module}/{{item_id}}")\nasync def get_{module}(item_id: int):\n'
+             f'    return {{"id": item_id}}\n' if rng.random() < 0.2 else "")
+    return (f'"""{module}: generated benchmark module"""\nimport os\nimport json\n{imports}\n\n\n'
+            f"class {class_name}:\n{methods}\n\ndef run_{module}(config):\n"
+            f"    return {class_name}().step_0(config)\n{route}").encode("utf-8")
+
+
+def _js_module(rng: random.Random, module: str, siblings: list) -> bytes:
+    imports = "\n".join(f"import {{ {name} }} from './{name}';" for name in rng.sample(siblings, min(3, len(siblings))))
+    return (f"{imports}\nimport React from 'react';\n\nexport class {module.title().replace('_', '')} {{\n"
+            f"  constructor() {{ this.cache = new Map(); }}\n  render(props) {{ return props.value; }}\n}}\n\n"
+            f"export function {module}(input) {{\n  return input * {rng.randint(1, 99)};\n}}\n").encode("utf-8")
+
+
+def _folder(index: int, shape: str) -> str:
+    """Folder of the index-th generated source file"""
+    if shape == "flat":
+        return f"src/module_{index // FILES_PER_FOLDER}"
+    if shape == "deep":
+        return "/".join(f"level{level}_{(index // 4 ** level) % 4}" for level in range(DEEP_LEVELS))
+    package = index // FILES_PER_PACKAGE
+    return f"packages/pkg_{package}/{'tests' if index % 10 == 0 else 'src'}/part_{(index // 50) % 10}"
+
+
+def iter_repository_files(file_count: int, shape: str, seed: int = 0):
+    """Yield (path, bytes) for a repository of about file_count files"""
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape '{shape}' (choose from {', '.join(SHAPES)})")
+    rng = random.Random(f"{seed}-{shape}-{file_count}")
+
+    yield "README.md", f"# Synthetic {shape} repository\n\n{file_count} generated files.\n".encode("utf-8")
+    yield "requirements.txt", b"fastapi==0.104.1\nhttpx==0.25.1\npydantic==2.5.0\n"
+    yield "package.json", b'{"name": "synthetic", "dependencies": {"react": "^18.2.0"}}\n'
+    yield ".gitignore", b"node_modules/\ndist/\n"
+
+    remaining = max(0, file_count - 4)
+    extra = max(1, remaining // 20)  # ~5% each: vendored, assets, configs/docs
+    sources = remaining - 3 * extra
+
+    folder_modules = {}
+    for index in range(sources):
+        folder = _folder(index, shape)
+        python = index % 3 != 2
+        name = f"{'mod' if python else 'comp'}_{index}"
+        siblings = folder_modules.setdefault((folder, python), [])
+        if python:
+            yield f"{folder}/{name}.py", _python_module(rng, name, siblings or [name])
+        else:
+            yield f"{folder}/{name}.js", _js_module(rng, name, siblings or [name])
+        siblings.append(name)
+        if shape == "monorepo" and index % FILES_PER_PACKAGE == 0:
+            package = folder.split("/")[1]
+            yield f"packages/{package}/package.json", f'{{"name": "{package}"}}\n'.encode("utf-8")
+
+    for index in range(extra):
+        yield f"node_modules/lib_{index % 50}/index_{index}.js", f"module.exports = {index};\n".encode("utf-8")
+        if index % 2:
+            yield f"assets/images/img_{index}.png", b"\x89PNG\r\n\x1a\n\0\0" + rng.randbytes(2048)
+        else:
+            yield f"dist/bundle_{index}.js", b"!function(){" + b"var a=1;" * 200 + b"}();\n"
+        if index % 25 == 0:
+            yield f"data/dataset_{index}.csv", b"id,value\n" + b"1,2\n" * 120000  # over the read limit
+        else:
+            yield f"website/docs/page_{index}.md", f"# Page {index}\n\nSee `mod_{index}`.\n".encode("utf-8")
+
+
+def _fast_import_stream(files, message: str, parent: str = None):
+    """fast-import commands for one commit containing `files`"""
+    message_bytes = message.encode("utf-8")
+    yield f"commit {BRANCH}\ncommitter {COMMITTER}\ndata {len(message_bytes)}\n".encode("utf-8") + message_bytes + b"\n"
+    if parent:
+        yield f"from {parent}\n".encode("utf-8")
+    for path, data in files:
+        yield f"M 100644 inline {path}\ndata {len(data)}\n".encode("utf-8") + data + b"\n"
+    yield b"\n"
+
+
+def _fast_import(remote_path: str, chunks):
+    process = subprocess.Popen(
+        ["git", "--git-dir", remote_path, "fast-import", "--quiet"],
+        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    for chunk in chunks:
+        process.stdin.write(chunk)
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"git fast-import failed: {stderr.decode('utf-8', errors='replace')}")
+
+
+def create_remote(remote_path: str, file_count: int, shape: str, seed: int = 0) -> str:
+    """
+    Create a bare repository at remote_path with one commit of the generated files
+    An existing remote is reused as-is. Returns remote_path
+    """
+    if os.path.isdir(remote_path):
+        return remote_path
+    os.makedirs(os.path.dirname(remote_path), exist_ok=True)
+    subprocess.run(["git", "init", "--bare", "--quiet", remote_path], check=True)
+    for key, value in (("uploadpack.allowFilter", "true"), ("uploadpack.allowAnySHA1InWant", "true")):
+        subprocess.run(["git", "--git-dir", remote_path, "config", key, value], check=True)
+
+    _fast_import(remote_path, _fast_import_stream(
+        iter_repository_files(file_count, shape, seed), f"Synthetic {shape} repository ({file_count} files)"
+    ))
+    subprocess.run(["git", "--git-dir", remote_path, "symbolic-ref", "HEAD", BRANCH], check=True)
+    return remote_path
+
+
+def add_commit(remote_path: str, revision: int) -> str:
+    """Change one source file on top of HEAD (forces re-analysis). Returns the new commit SHA"""
+    path = "src/changed_by_benchmark.py"
+    data = f'"""Benchmark revision {revision}"""\nREVISION = {revision}\n'.encode("utf-8")
+    _fast_import(remote_path, _fast_import_stream([(path, data)], f"Benchmark revision {revision}", f"{BRANCH}^0"))
+    return subprocess.run(
+        ["git", "--git-dir", remote_path, "rev-parse", BRANCH], check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic bare git remote")
+    parser.add_argument("--files", type=int, default=1000, help="Approximate number of files")
+    parser.add_argument("--shape", choices=SHAPES, default="flat")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="Directory for the bare repository")
+    args = parser.parse_args()
+
+    create_remote(os.path.abspath(args.out), args.files, args.shape, args.seed)
+    print(f"✅ {args.shape} repository with ~{args.files} files at {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
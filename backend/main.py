@@ -1,19 +1,39 @@
 # backend/main.py - COMPLETE & TESTED
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, PlainTextResponse
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 import base64
-import requests
+import httpx
 
-from routes import diagram_routes, chat_routes
+from routes import diagram_routes, chat_routes, job_routes
+from services.analysis_cache import cache_stats
+from services.llm_cache import llm_cache_stats
+from services.llm_clients import llm_client_stats, close_llm_clients
+from services.github_service import get_http_client, close_http_client
+from services.executor import shutdown_executor, run_blocking
+from services.job_queue import start_job_workers, stop_job_workers
+from services.metrics import RequestMetricsMiddleware, render_metrics, log
 
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks for shared resources"""
+    await start_job_workers()
+    yield
+    await stop_job_workers()
+    # Release shared HTTP connections and let running analyses finish
+    await close_http_client()
+    await close_llm_clients()
+    shutdown_executor()
+
 app = FastAPI(
     title="RepoVision AI - GitHub Repository Analyzer",
     description="AI-powered GitHub repository analysis with detailed Mermaid diagrams",
-    version="2.0"
+    version="2.0",
+    lifespan=lifespan
 )
 
 # CORS Configuration
@@ -23,11 +43,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Server-Timing"],
 )
+# Request ids, per-stage timing summaries and HTTP metrics
+app.add_middleware(RequestMetricsMiddleware)
 
 # Include routers
 app.include_router(diagram_routes.router, tags=["Diagrams"])
 app.include_router(chat_routes.router, tags=["Chat"])
+app.include_router(job_routes.router, tags=["Jobs"])
 
 @app.post("/export-diagram")
 async def export_diagram(request: dict):
@@ -51,11 +75,11 @@ async def export_diagram(request: dict):
             media_type = "image/png"
         
         # Fetch the image
-        print(f"📥 Fetching {format_type.upper()} from mermaid.ink...")
-        response = requests.get(url, timeout=30)
+        log(f"📥 Fetching {format_type.upper()} from mermaid.ink...")
+        response = await get_http_client().get(url, timeout=30)
         
         if response.status_code == 200:
-            print(f"✅ Successfully generated {format_type.upper()} image")
+            log(f"✅ Successfully generated {format_type.upper()} image")
             return Response(
                 content=response.content,
                 media_type=media_type,
@@ -69,10 +93,12 @@ async def export_diagram(request: dict):
                 detail=f"Failed to generate image: {response.status_code}"
             )
             
-    except requests.exceptions.Timeout:
+    except HTTPException:
+        raise
+    except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Image generation timed out")
     except Exception as e:
-        print(f"❌ Error exporting diagram: {e}")
+        log(f"❌ Error exporting diagram: {e}")
         raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
 
 @app.get("/")
@@ -84,9 +110,16 @@ async def root():
         "status": "operational",
         "endpoints": {
             "/generate-diagram": "POST - Generate specific diagram type",
+            "/generate-diagrams": "POST - Generate several diagram types, streamed as each completes (Server-Sent Events)",
             "/generate-custom-diagram": "POST - Generate custom diagram",
+            "/repair-diagram": "POST - Repair Mermaid syntax locally",
             "/chat": "POST - Interactive chat with repository analysis",
-            "/export-diagram": "POST - Export diagram as PNG/SVG"
+            "/chat/stream": "POST - Streaming chat (Server-Sent Events)",
+            "/jobs/diagram": "POST - Queue diagram generation as a background job",
+            "/jobs/{job_id}": "GET - Poll background job status and result",
+            "/export-diagram": "POST - Export diagram as PNG/SVG",
+            "/cache/stats": "GET - Analysis and LLM response cache hit/miss counters",
+            "/metrics": "GET - Prometheus metrics (stage timings, token counts, cache hit ratios)"
         },
         "features": [
             "Detailed diagram generation (10-20+ components)",
@@ -99,8 +132,26 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "version": "2.0"}
+    """Health check endpoint (with in-flight/queued LLM requests per model)"""
+    return {"status": "healthy", "version": "2.0", "llm": llm_client_stats()}
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Analysis and LLM response cache hit/miss counters"""
+    return {"analysis_cache": await run_blocking(cache_stats), "llm_cache": llm_cache_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics for this worker process"""
+    # cache_stats counts sqlite entries
+    analysis_stats = await run_blocking(cache_stats)
+    return PlainTextResponse(
+        render_metrics(
+            caches={"analysis": analysis_stats, "llm": llm_cache_stats()},
+            llm_clients=llm_client_stats()
+        ),
+        media_type="text/plain; version=0.0.4"
+    )
 
 if __name__ == "__main__":
     import uvicorn
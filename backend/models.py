@@ -2,21 +2,35 @@
 from pydantic import BaseModel, Field
 from typing import Literal, List, Optional
 
+DiagramType = Literal[
+    "sequence", 
+    "component", 
+    "database", 
+    "flowchart", 
+    "class", 
+    "state", 
+    "journey", 
+    "gantt", 
+    "mindmap"
+]
+
 class DiagramRequest(BaseModel):
     """Request model for generating specific diagram types"""
     repo_url: str = Field(..., description="GitHub repository URL")
-    diagram_type: Literal[
-        "sequence", 
-        "component", 
-        "database", 
-        "flowchart", 
-        "class", 
-        "state", 
-        "journey", 
-        "gantt", 
-        "mindmap"
-    ] = Field(..., description="Type of diagram to generate")
+    diagram_type: DiagramType = Field(..., description="Type of diagram to generate")
+    github_token: Optional[str] = Field(None, description="GitHub personal access token for private repos")
+    use_cache: bool = Field(True, description="Reuse a cached AI response for an identical prompt")
+    engine: Literal["llm", "static"] = Field(
+        "llm", description="llm: AI-generated; static: built from the code structure (component and class only)"
+    )
+    describe: bool = Field(False, description="With engine=static, let the AI add short node descriptions")
+
+class MultiDiagramRequest(BaseModel):
+    """Request model for generating several diagram types from one analysis"""
+    repo_url: str = Field(..., description="GitHub repository URL")
+    diagram_types: List[DiagramType] = Field(..., min_length=1, description="Types of diagram to generate")
     github_token: Optional[str] = Field(None, description="GitHub personal access token for private repos")
+    use_cache: bool = Field(True, description="Reuse cached AI responses for identical prompts")
 
 class CustomDiagramRequest(BaseModel):
     """Request model for custom diagram generation"""
@@ -24,6 +38,7 @@ class CustomDiagramRequest(BaseModel):
     user_prompt: str = Field(..., description="User's custom prompt for diagram generation")
     diagram_type: Optional[str] = Field(None, description="Optional diagram type hint")
     github_token: Optional[str] = Field(None, description="GitHub personal access token for private repos")
+    use_cache: bool = Field(True, description="Reuse a cached AI response for an identical prompt")
 
 class DiagramResponse(BaseModel):
     """Response model for diagram generation"""
@@ -31,6 +46,17 @@ class DiagramResponse(BaseModel):
     diagram_type: str = Field(..., description="Type of diagram generated")
     repo_name: str = Field(..., description="Repository name")
 
+class RepairRequest(BaseModel):
+    """Request model for local Mermaid syntax repair"""
+    mermaid_code: str = Field(..., max_length=100_000, description="Mermaid diagram code to repair (at most 100k characters)")
+
+class RepairResponse(BaseModel):
+    """Response model for local Mermaid syntax repair"""
+    mermaid_code: str = Field(..., description="Repaired Mermaid diagram code")
+    fixes: List[str] = Field(default_factory=list, description="Problems that were fixed")
+    errors: List[str] = Field(default_factory=list, description="Problems that could not be fixed locally")
+    is_valid: bool = Field(..., description="Whether the repaired code parses without errors")
+
 class ChatMessage(BaseModel):
     """Chat message model"""
     role: str = Field(..., description="Message role: 'user' or 'assistant'")
@@ -48,6 +74,7 @@ class ChatRequest(BaseModel):
         description="Previous chat messages for context"
     )
     github_token: Optional[str] = Field(None, description="GitHub personal access token for private repos")
+    use_cache: bool = Field(True, description="Reuse a cached AI response for an identical conversation")
     
     class Config:
         from_attributes = True
@@ -62,4 +89,19 @@ class ChatResponse(BaseModel):
     follow_up_questions: Optional[List[str]] = Field(
         default_factory=list, 
         description="Suggested follow-up questions"
-    )
\ No newline at end of file
+    )
+
+class JobResponse(BaseModel):
+    """Response model for a newly queued background job"""
+    job_id: str = Field(..., description="Identifier to poll with GET /jobs/{job_id}")
+    status: str = Field(..., description="Job status: queued, running, completed or failed")
+
+class JobStatusResponse(BaseModel):
+    """Response model for background job status polling"""
+    job_id: str = Field(..., description="Job identifier")
+    status: str = Field(..., description="Job status: queued, running, completed or failed")
+    stage: Optional[str] = Field(None, description="Current pipeline stage (e.g. cloning, generating)")
+    result: Optional[DiagramResponse] = Field(None, description="Generated diagram once completed")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    created_at: float = Field(..., description="Unix timestamp when the job was queued")
+    updated_at: float = Field(..., description="Unix timestamp of the last status change")
\ No newline at end of file
@@ -1,10 +1,14 @@
 # backend/routes/chat_routes.py - COMPLETE & TESTED
 from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import StreamingResponse
 from models import ChatRequest, ChatResponse
 from services.github_service import fetch_github_repo_structure
-from services.llm_service import analyze_repo_with_chat
+from services.llm_service import analyze_repo_with_chat, stream_repo_chat
 from typing import Optional
 import traceback
+import asyncio
+import json
+from services.metrics import log
 
 router = APIRouter()
 
@@ -18,12 +22,12 @@ async def chat_with_repo(
     Supports detailed diagram generation and Q&A
     """
     try:
-        print(f"\n{'='*60}")
-        print(f"💬 Chat Request Received")
-        print(f"📦 Repository: {request.repo_url}")
-        print(f"❓ Question: {request.question[:100]}...")
-        print(f"🔒 Auth: {'Yes (Token provided)' if x_github_token or request.github_token else 'No (Public only)'}")
-        print(f"{'='*60}\n")
+        log(f"\n{'='*60}")
+        log(f"💬 Chat Request Received")
+        log(f"📦 Repository: {request.repo_url}")
+        log(f"❓ Question: {request.question[:100]}...")
+        log(f"🔒 Auth: {'Yes (Token provided)' if x_github_token or request.github_token else 'No (Public only)'}")
+        log(f"{'='*60}\n")
         
         # Validate inputs
         if not request.repo_url or not request.repo_url.strip():
@@ -43,25 +47,25 @@ async def chat_with_repo(
         
         # Step 1: Fetch repository data
         try:
-            print("🔍 Step 1: Fetching repository structure...")
-            repo_data = fetch_github_repo_structure(
+            log("🔍 Step 1: Fetching repository structure...")
+            repo_data = await fetch_github_repo_structure(
                 request.repo_url,
                 deep_fetch=True,
                 github_token=github_token
             )
             
             files_count = repo_data.get('total_files_analyzed', 0)
-            print(f"✅ Repository fetched successfully!")
-            print(f"   - Files analyzed: {files_count}")
-            print(f"   - Languages: {', '.join(list(repo_data.get('languages', {}).keys())[:3])}")
-            print()
+            log(f"✅ Repository fetched successfully!")
+            log(f"   - Files analyzed: {files_count}")
+            log(f"   - Languages: {', '.join(list(repo_data.get('languages', {}).keys())[:3])}")
+            log()
             
         except HTTPException as e:
             # Re-raise HTTP exceptions with clear messages
-            print(f"❌ Repository fetch failed: {e.detail}")
+            log(f"❌ Repository fetch failed: {e.detail}")
             raise
         except Exception as e:
-            print(f"❌ Unexpected error fetching repository: {str(e)}")
+            log(f"❌ Unexpected error fetching repository: {str(e)}")
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to fetch repository: {str(e)}. Please check the URL and try again."
@@ -69,41 +73,33 @@ async def chat_with_repo(
         
         # Step 2: Analyze with AI
         try:
-            print("🤖 Step 2: Analyzing with AI...")
+            log("🤖 Step 2: Analyzing with AI...")
             
             # Convert chat history to proper format
-            chat_history = []
-            if request.chat_history:
-                for msg in request.chat_history:
-                    if isinstance(msg, dict):
-                        chat_history.append(msg)
-                    else:
-                        chat_history.append({
-                            "role": msg.role,
-                            "content": msg.content
-                        })
+            chat_history = normalize_chat_history(request.chat_history)
             
-            print(f"   - Context: {len(chat_history)} previous messages")
-            print(f"   - Generating detailed response...")
+            log(f"   - Context: {len(chat_history)} previous messages")
+            log(f"   - Generating detailed response...")
             
             # Analyze repository with LLM
-            result = analyze_repo_with_chat(
+            result = await analyze_repo_with_chat(
                 repo_data,
                 request.question,
-                chat_history
+                chat_history,
+                use_cache=request.use_cache
             )
             
-            print(f"✅ AI analysis complete!")
-            print(f"   - Answer length: {len(result['answer'])} chars")
-            print(f"   - Diagram included: {result.get('has_diagram', False)}")
+            log(f"✅ AI analysis complete!")
+            log(f"   - Answer length: {len(result['answer'])} chars")
+            log(f"   - Diagram included: {result.get('has_diagram', False)}")
             if result.get('has_diagram'):
-                print(f"   - Diagram type: {result.get('diagram_type', 'unknown')}")
-                print(f"   - Diagram size: {len(result.get('mermaid_code', ''))} chars")
-            print()
+                log(f"   - Diagram type: {result.get('diagram_type', 'unknown')}")
+                log(f"   - Diagram size: {len(result.get('mermaid_code', ''))} chars")
+            log()
             
-            print(f"{'='*60}")
-            print("✨ SUCCESS: Chat response ready!")
-            print(f"{'='*60}\n")
+            log(f"{'='*60}")
+            log("✨ SUCCESS: Chat response ready!")
+            log(f"{'='*60}\n")
             
             return ChatResponse(
                 answer=result["answer"],
@@ -115,7 +111,7 @@ async def chat_with_repo(
             )
             
         except Exception as e:
-            print(f"❌ AI analysis error: {str(e)}")
+            log(f"❌ AI analysis error: {str(e)}")
             traceback.print_exc()
             raise HTTPException(
                 status_code=500,
@@ -126,13 +122,103 @@ async def chat_with_repo(
         # Re-raise HTTP exceptions as-is
         raise
     except Exception as e:
-        print(f"\n{'='*60}")
-        print(f"❌ UNEXPECTED ERROR")
-        print(f"{'='*60}")
-        print(traceback.format_exc())
-        print(f"{'='*60}\n")
+        log(f"\n{'='*60}")
+        log(f"❌ UNEXPECTED ERROR")
+        log(f"{'='*60}")
+        log(traceback.format_exc())
+        log(f"{'='*60}\n")
         
         raise HTTPException(
             status_code=500,
             detail=f"An unexpected error occurred: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def normalize_chat_history(chat_history) -> list:
+    """Convert ChatMessage models (or dicts) into plain role/content dicts"""
+    normalized = []
+    for msg in chat_history or []:
+        if isinstance(msg, dict):
+            normalized.append(msg)
+        else:
+            normalized.append({"role": msg.role, "content": msg.content})
+    return normalized
+
+@router.post("/chat/stream")
+async def chat_with_repo_stream(
+    request: ChatRequest,
+    x_github_token: Optional[str] = Header(None, alias="X-GitHub-Token")
+):
+    """
+    Streaming chat via Server-Sent Events
+    Events: stage (resolving, cloning, analyzing, prompting, generating),
+    token (answer text), diagram (once [DIAGRAM_END] closes), done (final result), error
+    """
+    if not request.repo_url or not request.repo_url.strip():
+        raise HTTPException(
+            status_code=400, 
+            detail="Repository URL is required. Example: https://github.com/owner/repo"
+        )
+    
+    if not request.question or not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question is required")
+    
+    github_token = x_github_token or request.github_token
+    chat_history = normalize_chat_history(request.chat_history)
+    
+    async def event_stream():
+        stages = asyncio.Queue()
+        fetch_task = asyncio.create_task(fetch_github_repo_structure(
+            request.repo_url,
+            deep_fetch=True,
+            github_token=github_token,
+            progress=stages.put_nowait
+        ))
+        
+        try:
+            log(f"💬 Streaming chat for {request.repo_url}: {request.question[:100]}")
+            
+            # Relay pipeline stages while the repository is being fetched
+            while True:
+                stage_task = asyncio.create_task(stages.get())
+                await asyncio.wait({fetch_task, stage_task}, return_when=asyncio.FIRST_COMPLETED)
+                if stage_task.done():
+                    yield format_sse("stage", {"stage": stage_task.result()})
+                    continue
+                stage_task.cancel()
+                break
+            while not stages.empty():
+                yield format_sse("stage", {"stage": stages.get_nowait()})
+            
+            repo_data = fetch_task.result()
+            
+            yield format_sse("stage", {"stage": "prompting"})
+            first_token = True
+            async for event, data in stream_repo_chat(
+                    repo_data, request.question, chat_history, use_cache=request.use_cache):
+                if first_token and event == "token":
+                    yield format_sse("stage", {"stage": "generating"})
+                    first_token = False
+                yield format_sse(event, data)
+            
+            log(f"✅ Streaming chat complete")
+            
+        except HTTPException as e:
+            log(f"❌ Streaming chat failed: {e.detail}")
+            yield format_sse("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            log(f"❌ Streaming chat failed: {str(e)}")
+            traceback.print_exc()
+            yield format_sse("error", {"status_code": 500, "detail": f"AI analysis failed: {str(e)}"})
+        finally:
+            if not fetch_task.done():
+                fetch_task.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
\ No newline at end of file
@@ -0,0 +1,36 @@
+# backend/routes/job_routes.py - BACKGROUND DIAGRAM JOBS
+from fastapi import APIRouter, HTTPException
+from models import DiagramRequest, JobResponse, JobStatusResponse
+from services.job_queue import submit_diagram_job, get_job
+from services.executor import run_blocking
+
+router = APIRouter()
+
+@router.post("/jobs/diagram", response_model=JobResponse, status_code=202)
+async def create_diagram_job(request: DiagramRequest):
+    """Queue diagram generation and return immediately with a job id to poll"""
+    if not request.repo_url or not request.repo_url.strip():
+        raise HTTPException(status_code=400, detail="Repository URL is required")
+    
+    if not request.diagram_type or not request.diagram_type.strip():
+        raise HTTPException(status_code=400, detail="Diagram type is required")
+    
+    job_id = await submit_diagram_job(request)
+    return JobResponse(job_id=job_id, status="queued")
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """Return status, current stage and (when completed) the diagram for a job"""
+    job = await run_blocking(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    
+    return JobStatusResponse(
+        job_id=job["job_id"],
+        status=job["status"],
+        stage=job["stage"],
+        result=job["result"],
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"]
+    )
@@ -0,0 +1,282 @@
+# backend/services/analysis_cache.py - CONTENT-ADDRESSED ANALYSIS CACHE
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from .repo_cache import REPO_CACHE_DIR
+from .repo_model import to_plain, split_file_contents
+from .metrics import log
+
+# Analysis cache configuration (override in .env)
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join(REPO_CACHE_DIR, "analysis_cache.db"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "500"))
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "incremental": 0, "content_loads": 0, "content_reuses": 0}
+_schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the cache database, creating the schema on first use"""
+    global _schema_ready
+
+    os.makedirs(os.path.dirname(os.path.abspath(ANALYSIS_CACHE_PATH)), exist_ok=True)
+    conn = sqlite3.connect(ANALYSIS_CACHE_PATH, timeout=30)
+
+    if not _schema_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                repo_key TEXT NOT NULL,
+                commit_sha TEXT NOT NULL,
+                analyzer_version TEXT NOT NULL,
+                repo_data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (repo_key, commit_sha, analyzer_version)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_last_used ON analysis_cache(last_used)")
+        # Materialized file contents, keyed by content SHA and shared by every analysis that read them
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS file_contents (
+                sha TEXT PRIMARY KEY,
+                content BLOB NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_files (
+                repo_key TEXT NOT NULL,
+                commit_sha TEXT NOT NULL,
+                analyzer_version TEXT NOT NULL,
+                sha TEXT NOT NULL,
+                PRIMARY KEY (repo_key, commit_sha, analyzer_version, sha)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_files_sha ON analysis_files(sha)")
+        conn.commit()
+        _schema_ready = True
+
+    return conn
+
+
+def _count(stat: str, amount: int = 1):
+    with _stats_lock:
+        _stats[stat] += amount
+
+
+def record_incremental_update():
+    """Count an analysis patched from an older commit instead of rebuilt"""
+    _count("incremental")
+
+
+def _content_shas(repo_data: dict) -> list:
+    """Content store SHAs an analysis refers to"""
+    return list(dict.fromkeys(
+        entry["sha"] for entry in repo_data.get("file_contents", {}).values()
+        if isinstance(entry, dict) and "sha" in entry
+    ))
+
+
+def _missing_contents(conn: sqlite3.Connection, shas: list) -> list:
+    """Those of shas the content store no longer has"""
+    present = set()
+    for start in range(0, len(shas), 500):
+        batch = shas[start:start + 500]
+        present.update(sha for (sha,) in conn.execute(
+            f"SELECT sha FROM file_contents WHERE sha IN ({','.join('?' * len(batch))})", batch
+        ))
+    return [sha for sha in shas if sha not in present]
+
+
+def _delete_analysis(conn: sqlite3.Connection, repo_key: str, commit_sha: str, analyzer_version: str):
+    key = (repo_key, commit_sha, analyzer_version)
+    conn.execute("DELETE FROM analysis_cache WHERE repo_key = ? AND commit_sha = ? AND analyzer_version = ?", key)
+    conn.execute("DELETE FROM analysis_files WHERE repo_key = ? AND commit_sha = ? AND analyzer_version = ?", key)
+
+
+def discard_analysis(repo_key: str, commit_sha: str, analyzer_version: str):
+    """Drop a stored analysis (e.g. its file contents went missing) so the next request rebuilds it"""
+    try:
+        conn = _connect()
+        try:
+            _delete_analysis(conn, repo_key, commit_sha, analyzer_version)
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log(f"⚠️ Analysis cache delete failed: {e}")
+
+
+def _load_complete(conn: sqlite3.Connection, repo_key: str, commit_sha: str, analyzer_version: str,
+                   repo_data_json: str):
+    """
+    Decoded repo_data, or None (and the row dropped) when the content store lost some of its files
+    A cached analysis without its contents would quietly feed prompts and retrieval empty files
+    """
+    repo_data = json.loads(repo_data_json)
+    missing = _missing_contents(conn, _content_shas(repo_data))
+    if not missing:
+        return repo_data
+    log(f"⚠️ Cached analysis of {repo_key} @ {commit_sha[:10]} lost {len(missing)} file contents, rebuilding")
+    _delete_analysis(conn, repo_key, commit_sha, analyzer_version)
+    conn.commit()
+    return None
+
+
+def get_cached_analysis(repo_key: str, commit_sha: str, analyzer_version: str, count: bool = True) -> dict:
+    """
+    Return the stored repo_data for this exact commit, or None on a miss
+    - count: False for a re-check of the same request (e.g. under the analysis lock), so it isn't
+      counted twice in hits/misses
+    """
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT repo_data FROM analysis_cache "
+                "WHERE repo_key = ? AND commit_sha = ? AND analyzer_version = ?",
+                (repo_key, commit_sha, analyzer_version)
+            ).fetchone()
+            repo_data = _load_complete(conn, repo_key, commit_sha, analyzer_version, row[0]) if row else None
+
+            if repo_data is None:
+                if count:
+                    _count("misses")
+                return None
+
+            conn.execute(
+                "UPDATE analysis_cache SET last_used = ? "
+                "WHERE repo_key = ? AND commit_sha = ? AND analyzer_version = ?",
+                (time.time(), repo_key, commit_sha, analyzer_version)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        if count:
+            _count("hits")
+        return repo_data
+    except (sqlite3.Error, ValueError) as e:
+        log(f"⚠️ Analysis cache read failed: {e}")
+        _count("misses")
+        return None
+
+
+def get_latest_analysis(repo_key: str, analyzer_version: str) -> tuple:
+    """
+    Most recently stored analysis of this repository at any commit, as (commit_sha, repo_data)
+    Used as the base for incremental re-analysis; (None, None) when there is none
+    """
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT commit_sha, repo_data FROM analysis_cache "
+                "WHERE repo_key = ? AND analyzer_version = ? ORDER BY created_at DESC LIMIT 1",
+                (repo_key, analyzer_version)
+            ).fetchone()
+            # Unchanged files stay handles in an incremental update, so the base must still have its contents
+            repo_data = _load_complete(conn, repo_key, row[0], analyzer_version, row[1]) if row else None
+        finally:
+            conn.close()
+        return (row[0], repo_data) if repo_data is not None else (None, None)
+    except (sqlite3.Error, ValueError) as e:
+        log(f"⚠️ Analysis cache read failed: {e}")
+        return None, None
+
+
+def read_file_contents(shas: list, reused: bool = False) -> dict:
+    """
+    Materialized contents for these content SHAs as {sha: UTF-8 bytes} (unknown SHAs are left out)
+    - reused: the caller takes these instead of reading the files again (counted as content_reuses)
+    """
+    if not shas:
+        return {}
+    found = {}
+    try:
+        conn = _connect()
+        try:
+            for start in range(0, len(shas), 500):  # stay under SQLite's bound-parameter limit
+                batch = shas[start:start + 500]
+                found.update(conn.execute(
+                    f"SELECT sha, content FROM file_contents WHERE sha IN ({','.join('?' * len(batch))})", batch
+                ).fetchall())
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log(f"⚠️ Content store read failed: {e}")
+    _count("content_reuses" if reused else "content_loads", len(found))
+    return found
+
+
+def store_analysis(repo_key: str, commit_sha: str, analyzer_version: str, repo_data: dict):
+    """
+    Persist repo_data for this commit and prune least-recently-used entries
+    File contents go to the content store once per distinct SHA; the analysis row keeps handles,
+    so a cache hit decodes metadata only and reads file contents when a prompt needs them
+    """
+    now = time.time()
+    handles, blobs = split_file_contents(repo_data.get("file_contents", {}))
+    key = (repo_key, commit_sha, analyzer_version)
+    try:
+        conn = _connect()
+        try:
+            conn.executemany("INSERT OR IGNORE INTO file_contents (sha, content) VALUES (?, ?)", blobs.items())
+            conn.execute(
+                "DELETE FROM analysis_files WHERE repo_key = ? AND commit_sha = ? AND analyzer_version = ?", key
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO analysis_files (repo_key, commit_sha, analyzer_version, sha) "
+                "VALUES (?, ?, ?, ?)",
+                [(*key, handle["sha"]) for handle in handles.values()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache "
+                "(repo_key, commit_sha, analyzer_version, repo_data, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(dict(repo_data, file_contents=handles), default=to_plain), now, now)
+            )
+            pruned = conn.execute(
+                "DELETE FROM analysis_cache WHERE rowid NOT IN "
+                "(SELECT rowid FROM analysis_cache ORDER BY last_used DESC LIMIT ?)",
+                (ANALYSIS_CACHE_MAX_ENTRIES,)
+            ).rowcount
+            if pruned:
+                # Contents no remaining analysis refers to go with the analyses that read them
+                conn.execute(
+                    "DELETE FROM analysis_files WHERE NOT EXISTS (SELECT 1 FROM analysis_cache a "
+                    "WHERE a.repo_key = analysis_files.repo_key AND a.commit_sha = analysis_files.commit_sha "
+                    "AND a.analyzer_version = analysis_files.analyzer_version)"
+                )
+                conn.execute(
+                    "DELETE FROM file_contents WHERE NOT EXISTS "
+                    "(SELECT 1 FROM analysis_files f WHERE f.sha = file_contents.sha)"
+                )
+            conn.commit()
+        finally:
+            conn.close()
+        _count("stores")
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        log(f"⚠️ Analysis cache write failed: {e}")
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters for this process plus the number of stored analyses"""
+    with _stats_lock:
+        stats = dict(_stats)
+
+    try:
+        conn = _connect()
+        try:
+            stats["entries"] = conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        stats["entries"] = None
+
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
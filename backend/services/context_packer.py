@@ -0,0 +1,248 @@
+# backend/services/context_packer.py - TOKEN-BUDGETED PROMPT CONTEXT
+import os
+import re
+from functools import lru_cache
+from collections.abc import Mapping
+from .metrics import log
+
+# Context budget configuration (override in .env)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "60000"))
+CONTEXT_TOKENIZER_MODEL = os.getenv("CONTEXT_TOKENIZER_MODEL", "gpt-4o")
+
+# Share of the budget each section may use; whatever a section leaves unused goes to file contents
+TREE_BUDGET_SHARE = 0.15
+README_BUDGET_SHARE = 0.10
+FILE_BUDGET_SHARE = 0.12  # cap for any single file, so one huge file can't crowd out the rest
+SYMBOL_BUDGET_SHARE = 0.25
+# With a symbol graph the model gets structure from the graph, so raw source is only a sample
+SOURCE_BUDGET_SHARE_WITH_SYMBOLS = 0.30
+MIN_FILE_TOKENS = 120  # don't bother including a file cut shorter than this
+
+# Files that explain architecture go first; tests and docs only fill leftover space
+PURPOSE_PRIORITY = {
+    "api": 0,
+    "service": 1,
+    "data_model": 2,
+    "middleware": 3,
+    "database": 4,
+    "ui": 5,
+    "general": 6,
+    "dependencies": 7,
+    "configuration": 8,
+    "utility": 9,
+    "documentation": 10,
+    "testing": 11
+}
+
+ENTRY_POINT_NAMES = {
+    "main.py", "app.py", "server.py", "manage.py", "wsgi.py", "asgi.py", "__main__.py",
+    "index.js", "index.ts", "main.js", "main.ts", "server.js", "server.ts", "app.js", "app.ts",
+    "main.go", "main.rs", "lib.rs", "Program.cs", "Main.java"
+}
+
+# Lines where a new top-level definition starts; truncation prefers to stop just before one
+DEFINITION_START = re.compile(
+    r'^(?:@|def |async def |class |function |async function |export |const \w+\s*=\s*(?:async\s*)?\(|'
+    r'func |fn |pub |impl |struct |interface |type |public |private |protected |module |package )'
+)
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """tiktoken encoding for the configured model, or None to fall back to a character estimate"""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(CONTEXT_TOKENIZER_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # Not installed, or the encoding file can't be downloaded (offline)
+        log(f"⚠️ tiktoken unavailable ({type(e).__name__}), estimating tokens from characters")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with the local tokenizer (~4 characters per token without tiktoken)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> tuple:
+    """
+    Cut text to at most max_tokens, ending on a line boundary
+    Prefers to stop right before a top-level definition when one is in the last half,
+    so the prompt sees whole functions/classes instead of half of one.
+    Returns (text, truncated)
+    """
+    if count_tokens(text) <= max_tokens:
+        return text, False
+
+    lines = text.split("\n")
+    kept = 0
+    used = 0
+    for line in lines:
+        cost = count_tokens(line + "\n")
+        if used + cost > max_tokens:
+            break
+        used += cost
+        kept += 1
+
+    for cut in range(kept, kept // 2, -1):
+        if cut < len(lines) and DEFINITION_START.match(lines[cut]):
+            kept = cut
+            break
+
+    return "\n".join(lines[:kept]).rstrip(), True
+
+
+def file_priority(path: str, file_data) -> tuple:
+    """Sort key: purpose first, then entry points, then shallow paths"""
+    purpose = file_data.get("purpose", "general") if isinstance(file_data, Mapping) else "general"
+    name = path.rsplit("/", 1)[-1]
+    return (
+        PURPOSE_PRIORITY.get(purpose, PURPOSE_PRIORITY["general"]),
+        0 if name in ENTRY_POINT_NAMES else 1,
+        path.count("/"),
+        path
+    )
+
+
+def format_file_block(path: str, file_data, content: str, note: str = "") -> str:
+    """One file in the same layout as format_file_contents"""
+    divider = "=" * 60
+    if isinstance(file_data, Mapping):
+        header = (
+            f"\n{divider}\nFILE: {path}\n"
+            f"Type: {file_data.get('extension', '')} | Purpose: {file_data.get('purpose', '')} | "
+            f"Size: {file_data.get('full_size', 0)}B\n{divider}"
+        )
+    else:
+        header = f"\n{divider}\nFILE: {path}\n{divider}"
+    return f"{header}\n{content}{note}"
+
+
+def pack_lines(text: str, max_tokens: int, what: str = "lines") -> tuple:
+    """Keep whole lines that fit, then say how many were left out. Returns (text, tokens, dropped_lines)"""
+    packed, truncated = truncate_to_tokens(text, max_tokens)
+    if not truncated:
+        return text, count_tokens(text), 0
+
+    dropped = text.count("\n") - packed.count("\n")
+    packed += f"\n... ({dropped} more {what} omitted)"
+    return packed, count_tokens(packed), dropped
+
+
+def pack_file_contents(contents: dict, max_tokens: int) -> dict:
+    """
+    Fill max_tokens with file contents by importance
+    Returns {"text", "tokens", "included", "truncated", "dropped"}
+    """
+    blocks = []
+    included, truncated, dropped = [], [], []
+    remaining = max_tokens
+    per_file_cap = max(MIN_FILE_TOKENS * 4, int(max_tokens * FILE_BUDGET_SHARE))
+
+    for path, file_data in sorted(contents.items(), key=lambda item: file_priority(*item)):
+        overhead = count_tokens(format_file_block(path, file_data, ""))
+        allowance = min(per_file_cap, remaining) - overhead
+
+        if allowance < MIN_FILE_TOKENS:
+            dropped.append(path)
+            continue
+
+        # Content is read only for files that get space (lazy records load from the content store here)
+        content = file_data.get("content", "") if isinstance(file_data, Mapping) else str(file_data)
+        body, was_cut = truncate_to_tokens(content, allowance)
+        note = ""
+        if was_cut:
+            shown = body.count("\n") + 1
+            total = content.count("\n") + 1
+            note = f"\n... (truncated: showing {shown} of {total} lines)"
+            if not body.strip():
+                dropped.append(path)
+                continue
+            truncated.append(path)
+        else:
+            included.append(path)
+
+        block = format_file_block(path, file_data, body, note)
+        blocks.append(block)
+        remaining -= count_tokens(block)
+
+    return {
+        "text": "\n".join(blocks),
+        "tokens": max_tokens - remaining,
+        "included": included,
+        "truncated": truncated,
+        "dropped": dropped
+    }
+
+
+def pack_repo_context(repo_data: dict, render, budget: int = None, readme: bool = True,
+                      symbols: bool = True) -> dict:
+    """
+    Build the repository context for a prompt within a token budget
+    - render: callable(file_structure, file_contents, readme) -> context text;
+      everything else it adds (name, description, ...) is counted as fixed overhead
+    - budget: tokens for the whole context (default CONTEXT_TOKEN_BUDGET)
+    - symbols: lead the file contents with the symbol graph (when the analysis has one)
+      and keep raw source to SOURCE_BUDGET_SHARE_WITH_SYMBOLS of the budget
+    ✅ Sections get a share of the budget; unused tree/README space goes to file contents
+    ✅ Files are added by importance and cut on line/definition boundaries
+    Returns {"context", "tokens", "budget", "included", "truncated", "dropped",
+             "tree_lines_dropped", "symbol_tokens"}
+    """
+    from .github_service import format_file_structure
+    from .symbol_extractor import format_symbol_graph
+
+    budget = budget or CONTEXT_TOKEN_BUDGET
+    fixed_tokens = count_tokens(render("", "", ""))
+    available = max(0, budget - fixed_tokens)
+
+    # A generous item limit: the token budget, not the item count, decides what is shown
+    tree_text = format_file_structure(repo_data.get('file_structure', {}), max_items=100000)
+    tree_text, tree_tokens, tree_dropped = pack_lines(tree_text, int(available * TREE_BUDGET_SHARE), "tree entries")
+
+    readme_text, readme_tokens = "", 0
+    if readme:
+        readme_text, readme_tokens, _ = pack_lines(
+            repo_data.get('readme', ''), int(available * README_BUDGET_SHARE), "README lines"
+        )
+
+    symbol_text, symbol_tokens = "", 0
+    if symbols and repo_data.get('symbols'):
+        symbol_text, symbol_tokens, _ = pack_lines(
+            format_symbol_graph(repo_data['symbols']), int(available * SYMBOL_BUDGET_SHARE), "symbol lines"
+        )
+
+    source_budget = max(0, available - tree_tokens - readme_tokens - symbol_tokens)
+    if symbol_text:
+        source_budget = min(source_budget, int(available * SOURCE_BUDGET_SHARE_WITH_SYMBOLS))
+    files = pack_file_contents(repo_data.get('file_contents', {}), source_budget)
+
+    file_text = f"{symbol_text}\n\nSOURCE EXCERPTS:\n{files['text']}" if symbol_text else files["text"]
+    context = render(tree_text, file_text, readme_text)
+    packed = {
+        "context": context,
+        "tokens": count_tokens(context),
+        "budget": budget,
+        "included": files["included"],
+        "truncated": files["truncated"],
+        "dropped": files["dropped"],
+        "tree_lines_dropped": tree_dropped,
+        "symbol_tokens": symbol_tokens
+    }
+
+    log(f"📦 Context packed: {packed['tokens']}/{budget} tokens, "
+          f"{len(packed['included'])} files whole, {len(packed['truncated'])} truncated, "
+          f"{len(packed['dropped'])} dropped, symbol graph {symbol_tokens} tokens")
+    if packed["dropped"]:
+        log(f"   - Dropped: {', '.join(packed['dropped'][:10])}"
+              f"{' ...' if len(packed['dropped']) > 10 else ''}")
+
+    return packed
@@ -0,0 +1,304 @@
+# backend/services/diagram_service.py - DIAGRAM GENERATION PIPELINE
+import os
+import asyncio
+from fastapi import HTTPException
+from models import DiagramRequest, DiagramResponse, MultiDiagramRequest
+from services.github_service import fetch_github_repo_structure, report_progress
+from services.context_packer import pack_repo_context
+from services.llm_service import get_llm, clean_mermaid_code, detect_diagram_type, validate_mermaid_syntax
+from services.llm_cache import cached_ainvoke, discard_cached_response
+from services.prompt_templates import get_diagram_prompt, get_static_description_prompt
+from services.static_diagrams import (
+    STATIC_DIAGRAM_TYPES, build_static_diagram, describe_nodes_text, parse_descriptions, apply_descriptions
+)
+from services.metrics import log, stage_timer, observe_tokens
+from services.executor import run_blocking
+
+# Diagrams generated at once for one /generate-diagrams request (override in .env)
+DIAGRAM_CONCURRENCY = int(os.getenv("DIAGRAM_CONCURRENCY", "3"))
+
+
+async def generate_diagram_result(request: DiagramRequest, progress=None) -> DiagramResponse:
+    """
+    Run the full diagram pipeline: analyze repo → build context → LLM with retries
+    - progress: optional callable receiving stage names
+      (resolving, cloning, analyzing, building_context, prompting, generating, validating)
+    - request.engine "static" builds component/class diagrams from the symbol graph instead
+    Raises HTTPException with a user-facing message on failure
+    """
+    if request.engine == "static":
+        return await generate_static_result(request, progress)
+    
+    repo_data, context = await build_diagram_context(request.repo_url, request.github_token, progress)
+    llm = init_llm()
+    return await generate_from_context(
+        llm, request.diagram_type, context, repo_data.get('name', 'Unknown'),
+        use_cache=request.use_cache, progress=progress
+    )
+
+
+async def generate_static_result(request: DiagramRequest, progress=None) -> DiagramResponse:
+    """
+    Rule-based component/class diagram from the analyzed tree and symbol graph
+    ⚡ Milliseconds after analysis, no AI cost, same output for the same commit
+    - request.describe: ask the AI for short node descriptions afterwards
+      (the structure never changes; a failed description step is ignored)
+    """
+    if request.diagram_type not in STATIC_DIAGRAM_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"The static engine supports {', '.join(STATIC_DIAGRAM_TYPES)} diagrams, not {request.diagram_type}"
+        )
+    
+    repo_data = await fetch_repo_data(request.repo_url, request.github_token, progress)
+    
+    log(f"🧱 Building static {request.diagram_type} diagram...")
+    report_progress(progress, "generating")
+    mermaid_code, nodes = build_static_diagram(request.diagram_type, repo_data)
+    log(f"✅ Static diagram built: {len(nodes)} nodes")
+    
+    if request.describe and nodes:
+        try:
+            log("🏷️ Adding AI descriptions...")
+            report_progress(progress, "prompting")
+            llm = get_llm()
+            prompt = get_static_description_prompt(
+                request.diagram_type, describe_nodes_text(request.diagram_type, nodes, repo_data)
+            )
+            response = await cached_ainvoke(llm, prompt, use_cache=request.use_cache)
+            descriptions = parse_descriptions(response.content, nodes)
+            mermaid_code = apply_descriptions(request.diagram_type, mermaid_code, descriptions)
+            log(f"✅ Described {len(descriptions)}/{len(nodes)} nodes")
+        except Exception as e:
+            log(f"⚠️ AI descriptions skipped: {str(e)}")
+    
+    report_progress(progress, "validating")
+    is_valid, errors = validate_mermaid_syntax(mermaid_code)
+    if not is_valid:
+        log(f"⚠️ Static diagram has syntax errors: {errors[:2]}")
+    
+    return DiagramResponse(
+        mermaid_code=mermaid_code,
+        diagram_type=request.diagram_type,
+        repo_name=repo_data.get('name', 'Unknown')
+    )
+
+
+async def generate_diagram_results(request: MultiDiagramRequest, progress=None):
+    """
+    Several diagram types for one repository
+    ✅ The repository is analyzed and the context built once
+    ⚡ Per-type LLM calls run concurrently, at most DIAGRAM_CONCURRENCY at a time
+    - progress: optional callable receiving (stage, diagram_type); diagram_type is None
+      for the shared analysis stages
+    Yields (diagram_type, DiagramResponse or HTTPException) in completion order.
+    Failures of the shared analysis are raised as HTTPException.
+    """
+    def progress_for(diagram_type):
+        def forward(stage):
+            if progress is not None:
+                progress(stage, diagram_type)
+        return forward
+
+    repo_data, context = await build_diagram_context(request.repo_url, request.github_token, progress_for(None))
+    llm = init_llm()
+    repo_name = repo_data.get('name', 'Unknown')
+    semaphore = asyncio.Semaphore(max(1, DIAGRAM_CONCURRENCY))
+
+    async def generate_one(diagram_type):
+        async with semaphore:
+            try:
+                result = await generate_from_context(
+                    llm, diagram_type, context, repo_name, use_cache=request.use_cache,
+                    progress=progress_for(diagram_type)
+                )
+            except HTTPException as e:
+                result = e
+            except Exception as e:
+                result = HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+            return diagram_type, result
+
+    # Duplicates in the request are generated once
+    diagram_types = list(dict.fromkeys(request.diagram_types))
+    log(f"🎨 Generating {len(diagram_types)} diagrams ({DIAGRAM_CONCURRENCY} at a time): {', '.join(diagram_types)}")
+    tasks = [asyncio.create_task(generate_one(t)) for t in diagram_types]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away: don't keep paying for diagrams nobody will read
+        for task in tasks:
+            task.cancel()
+
+
+def init_llm():
+    """get_llm() with the pipeline's logging and error mapping"""
+    try:
+        log("🤖 Step 2: Initializing AI...")
+        llm = get_llm()
+        log("✅ AI initialized")
+        log()
+        return llm
+    except Exception as e:
+        log(f"❌ AI initialization failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"AI initialization failed: {str(e)}")
+
+
+async def fetch_repo_data(repo_url: str, github_token: str = None, progress=None) -> dict:
+    """Analyze the repository (cached by commit), mapping failures to HTTPException"""
+    try:
+        log("🔍 Step 1: Analyzing repository...")
+        repo_data = await fetch_github_repo_structure(
+            repo_url,
+            deep_fetch=True,
+            github_token=github_token,
+            progress=progress
+        )
+        log(f"✅ Repository analyzed: {repo_data.get('total_files_analyzed', 0)} files")
+        log()
+    except HTTPException:
+        raise
+    except Exception as e:
+        log(f"❌ Repository fetch failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch repository: {str(e)}")
+    return repo_data
+
+
+async def build_diagram_context(repo_url: str, github_token: str = None, progress=None) -> tuple:
+    """Analyze the repository and pack the prompt context. Returns (repo_data, context)"""
+    repo_data = await fetch_repo_data(repo_url, github_token, progress)
+
+    # Build context
+    try:
+        log("📝 Step 3: Building analysis context...")
+        report_progress(progress, "building_context")
+        
+        def render(file_structure: str, file_contents: str, readme: str) -> str:
+            return f"""
+Repository: {repo_data.get('name', 'Unknown')}
+Description: {repo_data.get('description', 'No description')}
+Primary Language: {repo_data.get('language', 'Unknown')}
+All Languages: {', '.join([f"{k} ({v} files)" for k, v in list(repo_data.get('languages', {}).items())[:5]])}
+Stars: {repo_data.get('stars', 0)} | Forks: {repo_data.get('forks', 0)}
+
+COMPLETE FILE STRUCTURE:
+{file_structure}
+
+KEY FILE CONTENTS:
+{file_contents}
+
+README:
+{readme}
+
+DEPENDENCIES:
+{', '.join(repo_data.get('dependencies', {}).keys())}
+"""
+        
+        with stage_timer("context_build"):
+            # Lazy file contents are read from the content store here
+            packed = await run_blocking(pack_repo_context, repo_data, render)
+        observe_tokens("context", packed["tokens"])
+        context = packed["context"]
+        log(f"✅ Context built ({packed['tokens']} tokens, {len(packed['dropped'])} files dropped)")
+        log()
+    except Exception as e:
+        log(f"❌ Context building failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Context building failed: {str(e)}")
+
+    return repo_data, context
+
+
+# Appended to the prompt after a syntax-invalid answer; {errors} lists the first few problems
+DIAGRAM_RETRY_SUFFIX = """
+
+PREVIOUS ATTEMPT HAD ERRORS: {errors}
+
+REGENERATE with these STRICT RULES:
+1. Node IDs: ONLY letters, numbers, underscores (NO SPACES!)
+   ✅ Good: user_service, auth_controller, UserModel
+   ❌ BAD: user service, auth controller
+2. Arrows: ONLY --> or -.-> or ==>
+3. Include 15-20+ major components for detailed view
+4. Use actual file names from the repository
+5. Organize with subgraphs by folder/module
+
+Generate a DETAILED, comprehensive diagram with ALL major components:"""
+
+
+async def generate_from_context(llm, diagram_type: str, context: str, repo_name: str,
+                                use_cache: bool = True, progress=None, prompt: str = None,
+                                retry_suffix: str = DIAGRAM_RETRY_SUFFIX) -> DiagramResponse:
+    """
+    Prompt → LLM → clean/validate, retrying with the syntax errors up to 3 times
+    - prompt: ready-made prompt (e.g. a custom request); default is the diagram_type template
+    - retry_suffix: appended on a syntax retry, formatted with {errors}
+    - diagram_type None: detected from the generated code
+    """
+    # Get diagram prompt
+    if prompt is None:
+        try:
+            log(f"💭 Step 4: Creating {diagram_type} diagram prompt...")
+            report_progress(progress, "prompting")
+            prompt = get_diagram_prompt(diagram_type, context)
+            log(f"✅ Prompt ready")
+            log()
+        except Exception as e:
+            log(f"❌ Prompt creation failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Prompt creation failed: {str(e)}")
+
+    # Generate diagram with retry logic
+    max_retries = 3
+    attempt = 0
+
+    while attempt < max_retries:
+        try:
+            log(f"🎨 Step 5: Generating detailed {diagram_type or 'custom'} diagram "
+                f"(attempt {attempt + 1}/{max_retries})...")
+            report_progress(progress, "generating")
+            response = await cached_ainvoke(llm, prompt, use_cache=use_cache)
+            log("✅ AI response received")
+
+            # Clean and validate
+            report_progress(progress, "validating")
+            mermaid_code = clean_mermaid_code(response.content)
+
+            if not mermaid_code or len(mermaid_code.strip()) < 10:
+                raise ValueError("Generated diagram is empty or too short")
+
+            # Validate syntax
+            with stage_timer("validation"):
+                is_valid, errors = validate_mermaid_syntax(mermaid_code)
+
+            if not is_valid and attempt < max_retries - 1:
+                discard_cached_response(llm, prompt)
+                log(f"⚠️ Syntax errors detected: {errors[:2]}")
+                log(f"🔄 Retrying with improved instructions...")
+
+                prompt += retry_suffix.format(errors=', '.join(errors[:3]))
+                attempt += 1
+                continue
+
+            generated_type = diagram_type or detect_diagram_type(mermaid_code)
+            log(f"✅ Diagram generated successfully!")
+            log(f"   - Size: {len(mermaid_code)} characters")
+            log(f"   - Type: {generated_type}")
+            log()
+
+            return DiagramResponse(
+                mermaid_code=mermaid_code,
+                diagram_type=generated_type,
+                repo_name=repo_name
+            )
+
+        except Exception as e:
+            discard_cached_response(llm, prompt)
+            if attempt < max_retries - 1:
+                log(f"⚠️ Attempt {attempt + 1} failed: {str(e)}")
+                attempt += 1
+                continue
+            else:
+                log(f"❌ All attempts failed: {str(e)}")
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to generate valid diagram after {max_retries} attempts"
+                )
@@ -0,0 +1,26 @@
+# backend/services/executor.py - BOUNDED EXECUTOR FOR BLOCKING WORK
+import os
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Max analyses running at once per worker process (override in .env)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+
+_analysis_pool = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="repo-analysis")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run blocking or CPU-bound work on the bounded pool without stalling the event loop
+    The caller's context (request id, stage timings) goes along to the worker thread
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_analysis_pool, functools.partial(context.run, func, *args, **kwargs))
+
+
+def shutdown_executor():
+    """Stop accepting work and let running analyses finish"""
+    _analysis_pool.shutdown(wait=True)
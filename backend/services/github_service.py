@@ -1,13 +1,48 @@
 # backend/services/github_service.py - AUTHENTICATION FIXED + DETAILED ANALYSIS
 import os
-import requests
-import tempfile
-import shutil
+import httpx
+import asyncio
+import threading
 import subprocess
-import sys
-from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
 
+from .repo_cache import (
+    cached_mirror, mirror_worktree, remote_head_sha, head_sha, git_env, token_scope, get_mirror_path,
+    list_tree_files, read_blobs, GitCommandError, REPO_ACQUISITION_MODE, GITHUB_URL
+)
+from .analysis_cache import (
+    get_cached_analysis, get_latest_analysis, store_analysis, record_incremental_update, read_file_contents,
+    discard_analysis
+)
+from .repo_scanner import (
+    RepoScan, scan_repository, path_flags, classify_file_purpose, file_extension, MAX_READ_FILE_SIZE
+)
+from .symbol_extractor import build_symbol_graph
+from .retrieval import build_retrieval_index
+from .repo_model import compact_repo_data, FileContents, FileNode, FileRecord
+from .executor import run_blocking
+from .single_flight import SingleFlight, interprocess_lock
+from .metrics import log, stage_timer
+
+# Bump whenever analyze_local_repo output or the stored format changes so cached analyses are invalidated
+ANALYZER_VERSION = "7"
+
+# File reader configuration (override in .env)
+READ_WORKERS = int(os.getenv("READ_WORKERS", "8"))
+READ_BYTE_BUDGET = int(os.getenv("READ_BYTE_BUDGET", "8000000"))  # 8MB per repository
+MAX_CONTENT_BYTES = 40000  # First 40KB of each file
+
+# GitHub API endpoint (override in .env, e.g. a local stand-in for benchmarks; GITHUB_URL is in repo_cache)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+BINARY_SNIFF_BYTES = 8000
+
+_reader_pool = None
+_reader_pool_lock = threading.Lock()
+_http_client = None
+_analysis_flight = SingleFlight()
+
 def parse_github_url(repo_url: str) -> tuple:
     """Parse GitHub URL to extract owner and repo name"""
     repo_url = repo_url.strip()
@@ -28,8 +63,9 @@ def parse_github_url(repo_url: str) -> tuple:
     
     return parts[0], parts[1]
 
+@lru_cache(maxsize=1)
 def check_git_installed() -> bool:
-    """Check if Git is installed and accessible"""
+    """Check if Git is installed and accessible (checked once per process)"""
     try:
         result = subprocess.run(
             ["git", "--version"],
@@ -41,36 +77,112 @@ def check_git_installed() -> bool:
     except (FileNotFoundError, subprocess.TimeoutExpired):
         return False
 
-def get_safe_temp_dir() -> str:
-    """Get a safe temporary directory that works on all platforms"""
+def raise_for_git_error(stderr: str, owner: str, repo_name: str):
+    """Translate a failed git clone/fetch into a helpful HTTPException"""
+    error_msg = (stderr or "").lower()
+    
+    # Provide specific, helpful error messages
+    if "repository not found" in error_msg or "not found" in error_msg:
+        raise HTTPException(
+            status_code=404,
+            detail=f"❌ Repository '{owner}/{repo_name}' not found.\n\n"
+                   "Please check:\n"
+                   "1. Repository URL is correct\n"
+                   "2. Repository exists and hasn't been deleted\n"
+                   "3. For PRIVATE repos: Add your GitHub token in the sidebar\n\n"
+                   f"Tried to access: {owner}/{repo_name}"
+        )
+    elif "authentication" in error_msg or "permission denied" in error_msg or "could not read" in error_msg:
+        raise HTTPException(
+            status_code=401,
+            detail=f"🔒 Authentication failed for '{owner}/{repo_name}'.\n\n"
+                   "This is a PRIVATE repository. To access it:\n\n"
+                   "1. Go to: https://github.com/settings/tokens\n"
+                   "2. Click 'Generate new token (classic)'\n"
+                   "3. Give it a name like 'RepoVision AI'\n"
+                   "4. Check the 'repo' permission\n"
+                   "5. Generate and copy the token\n"
+                   "6. Paste it in the sidebar under 'GitHub Token'\n\n"
+                   "Note: Public repositories don't need authentication."
+        )
+    elif "could not resolve host" in error_msg:
+        raise HTTPException(
+            status_code=503,
+            detail="🌐 Network error: Cannot connect to GitHub.\n\n"
+                   "Please check:\n"
+                   "1. Your internet connection\n"
+                   "2. GitHub is not blocked by firewall\n"
+                   "3. Try accessing github.com in your browser"
+        )
+    elif "timeout" in error_msg or "timed out" in error_msg:
+        raise HTTPException(
+            status_code=408,
+            detail=f"⏱️ Clone operation timed out.\n\n"
+                   "This usually means:\n"
+                   "1. Repository is very large (>500MB)\n"
+                   "2. Slow internet connection\n"
+                   "3. Network issues\n\n"
+                   "Try a smaller repository first to test."
+        )
+    else:
+        # Show actual Git error
+        error_display = stderr[:500] if stderr else "Unknown error"
+        raise HTTPException(
+            status_code=500,
+            detail=f"❌ Git clone failed:\n\n{error_display}\n\n"
+                   "If you need help, check:\n"
+                   "1. Repository URL is correct\n"
+                   "2. Git is properly installed\n"
+                   "3. You have internet access"
+        )
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared async HTTP client for GitHub API calls (keeps connections alive)"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=10)
+    return _http_client
+
+async def close_http_client():
+    """Close the shared HTTP client on shutdown"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def fetch_repo_metadata(owner: str, repo_name: str) -> dict:
+    """Fetch repository metadata from the GitHub API ({} when unavailable)"""
+    api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}"
+    headers = {"Accept": "application/vnd.github.v3+json"}
+    github_token = os.getenv("GITHUB_TOKEN")
+    if github_token:
+        headers["Authorization"] = f"Bearer {github_token}"
+    
     try:
-        # Try to use a custom temp directory in the current directory
-        base_dir = os.path.join(os.getcwd(), "temp_repos")
-        os.makedirs(base_dir, exist_ok=True)
-        
-        # Create a unique subdirectory
-        import time
-        import random
-        unique_name = f"repo_{int(time.time() * 1000)}_{random.randint(1000, 9999)}"
-        temp_dir = os.path.join(base_dir, unique_name)
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        return temp_dir
+        with stage_timer("metadata"):
+            repo_response = await get_http_client().get(api_url, headers=headers)
+        return repo_response.json() if repo_response.status_code == 200 else {}
     except Exception as e:
-        # Fallback to system temp
-        print(f"⚠️ Using system temp directory: {e}")
-        return tempfile.mkdtemp(prefix="repovision_")
+        log(f"⚠️ Could not fetch GitHub API metadata: {e}")
+        return {}
+
+def report_progress(progress, stage: str):
+    """Forward a pipeline stage name to an optional progress callback"""
+    if progress is not None:
+        progress(stage)
 
-def clone_and_analyze_repo(repo_url: str, github_token: str = None) -> dict:
+async def clone_and_analyze_repo(repo_url: str, github_token: str = None, progress=None) -> dict:
     """
-    Clone repository to temp directory, analyze it, then delete
+    Check out repository from the mirror cache, analyze it, then drop the worktree
     ✅ FIXED: Proper authentication for public and private repos
     ✅ ENHANCED: Detailed file analysis for comprehensive diagrams
+    ⚡ CACHED: Bare mirrors are reused across requests and refreshed with git fetch
+    ⚡ CACHED: Analyses are stored by commit SHA; unchanged repos skip checkout and walk
+    ⚡ COALESCED: Concurrent callers for the same repo share one in-flight analysis
+    - progress: optional callable receiving stage names (resolving, waiting, cloning, analyzing)
     """
-    temp_dir = None
-    
-    # Check if Git is installed
-    if not check_git_installed():
+    # Check if Git is installed (the tarball mode does without it)
+    if REPO_ACQUISITION_MODE != "tarball" and not check_git_installed():
         raise HTTPException(
             status_code=500,
             detail="⚠️ Git is not installed on this system.\n\n"
@@ -85,7 +197,7 @@ def clone_and_analyze_repo(repo_url: str, github_token: str = None) -> dict:
         # Parse and validate URL
         try:
             owner, repo_name = parse_github_url(repo_url)
-            print(f"📦 Target: {owner}/{repo_name}")
+            log(f"📦 Target: {owner}/{repo_name}")
         except ValueError as e:
             raise HTTPException(
                 status_code=400, 
@@ -93,216 +205,300 @@ def clone_and_analyze_repo(repo_url: str, github_token: str = None) -> dict:
                        "Expected format: https://github.com/owner/repository"
             )
         
-        # Create temp directory
-        try:
-            temp_dir = get_safe_temp_dir()
-            print(f"📁 Temp directory: {temp_dir}")
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to create temporary directory: {str(e)}"
-            )
-        
-        # Prepare clone URL with authentication
-        clone_url = repo_url
-        if not clone_url.startswith(("http://", "https://")):
-            clone_url = f"https://github.com/{owner}/{repo_name}"
-        
-        # ✅ FIXED: Proper token authentication
-        if github_token and "github.com" in clone_url:
-            # Remove any existing protocol
-            clone_url = clone_url.replace("https://", "").replace("http://", "")
-            # Add token in correct format: https://TOKEN@github.com/owner/repo
-            clone_url = f"https://{github_token}@{clone_url}"
-            print(f"🔒 Using authenticated access (token provided)")
+        # Credentials travel as a header (see repo_cache.git_env), never in the URL
+        clone_url = f"{GITHUB_URL}/{owner}/{repo_name}"
+        if github_token:
+            log(f"🔒 Using authenticated access (token provided)")
         else:
-            print(f"🌐 Using public access (no token)")
-        
-        # Clone the repository
-        print(f"⏳ Cloning repository...")
-        
-        is_windows = sys.platform.startswith('win')
-        
-        # Set environment to prevent Git from prompting for credentials
-        env = os.environ.copy()
-        env['GIT_TERMINAL_PROMPT'] = '0'
-        env['GIT_ASKPASS'] = 'echo'  # Prevent password prompts
-        
-        clone_cmd = [
-            "git", "clone",
-            "--depth", "1",  # Shallow clone for speed
-            "--single-branch",  # Only main branch
-            clone_url,
-            temp_dir
-        ]
-        
-        try:
-            result = subprocess.run(
-                clone_cmd,
-                capture_output=True,
-                text=True,
-                timeout=180,  # 3 minute timeout
-                env=env,
-                shell=is_windows  # Use shell on Windows for compatibility
-            )
-            
-            if result.returncode != 0:
-                error_msg = result.stderr.lower()
-                
-                # Provide specific, helpful error messages
-                if "repository not found" in error_msg or "not found" in error_msg:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"❌ Repository '{owner}/{repo_name}' not found.\n\n"
-                               "Please check:\n"
-                               "1. Repository URL is correct\n"
-                               "2. Repository exists and hasn't been deleted\n"
-                               "3. For PRIVATE repos: Add your GitHub token in the sidebar\n\n"
-                               f"Tried to access: {owner}/{repo_name}"
-                    )
-                elif "authentication" in error_msg or "permission denied" in error_msg or "could not read" in error_msg:
-                    raise HTTPException(
-                        status_code=401,
-                        detail=f"🔒 Authentication failed for '{owner}/{repo_name}'.\n\n"
-                               "This is a PRIVATE repository. To access it:\n\n"
-                               "1. Go to: https://github.com/settings/tokens\n"
-                               "2. Click 'Generate new token (classic)'\n"
-                               "3. Give it a name like 'RepoVision AI'\n"
-                               "4. Check the 'repo' permission\n"
-                               "5. Generate and copy the token\n"
-                               "6. Paste it in the sidebar under 'GitHub Token'\n\n"
-                               "Note: Public repositories don't need authentication."
-                    )
-                elif "could not resolve host" in error_msg:
-                    raise HTTPException(
-                        status_code=503,
-                        detail="🌐 Network error: Cannot connect to GitHub.\n\n"
-                               "Please check:\n"
-                               "1. Your internet connection\n"
-                               "2. GitHub is not blocked by firewall\n"
-                               "3. Try accessing github.com in your browser"
-                    )
-                elif "timeout" in error_msg or "timed out" in error_msg:
-                    raise HTTPException(
-                        status_code=408,
-                        detail=f"⏱️ Clone operation timed out.\n\n"
-                               "This usually means:\n"
-                               "1. Repository is very large (>500MB)\n"
-                               "2. Slow internet connection\n"
-                               "3. Network issues\n\n"
-                               "Try a smaller repository first to test."
-                    )
-                else:
-                    # Show actual Git error
-                    error_display = result.stderr[:500] if result.stderr else "Unknown error"
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"❌ Git clone failed:\n\n{error_display}\n\n"
-                               "If you need help, check:\n"
-                               "1. Repository URL is correct\n"
-                               "2. Git is properly installed\n"
-                               "3. You have internet access"
-                    )
-            
-            print(f"✅ Repository cloned successfully!")
-            
-        except subprocess.TimeoutExpired:
-            raise HTTPException(
-                status_code=408,
-                detail=f"⏱️ Clone timeout after 3 minutes.\n\n"
-                       f"Repository '{owner}/{repo_name}' is too large or connection is slow.\n\n"
-                       "Suggestions:\n"
-                       "1. Try a smaller repository\n"
-                       "2. Check your internet speed\n"
-                       "3. Repository might be >500MB"
-            )
-        
-        # Analyze the cloned repository
-        print(f"🔍 Analyzing repository structure...")
-        repo_data = analyze_local_repo(temp_dir, repo_url)
+            log(f"🌐 Using public access (no token)")
         
-        print(f"✨ Analysis complete!")
-        print(f"   - Files analyzed: {repo_data['total_files_analyzed']}")
-        print(f"   - Languages found: {len(repo_data.get('languages', {}))}")
+        repo_key = f"{owner.lower()}/{repo_name.lower()}@{token_scope(github_token)}"
         
-        return repo_data
+        # Concurrent requests for the same (repo, ref, token scope) share one analysis
+        return await _analysis_flight.do(
+            f"{repo_key}#HEAD",
+            lambda shared_progress: _analyze_with_cache(
+                owner, repo_name, repo_url, clone_url, github_token, repo_key, shared_progress
+            ),
+            progress
+        )
         
     except HTTPException:
         # Re-raise HTTP exceptions with our clear error messages
         raise
     except Exception as e:
-        print(f"❌ Unexpected error: {str(e)}")
+        log(f"❌ Unexpected error: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process repository: {str(e)}"
         )
+
+async def _analyze_with_cache(owner: str, repo_name: str, repo_url: str, clone_url: str,
+                             github_token: str, repo_key: str, progress=None) -> dict:
+    """Serve from the analysis cache, or check out and analyze under a cross-process lock"""
+    metadata_task = None
+    try:
+        # Cheap ls-remote tells us whether a stored analysis is still current
+        report_progress(progress, "resolving")
+        with stage_timer("resolve"):
+            remote_sha = await _resolve_remote_sha(owner, repo_name, clone_url, github_token)
+        cached = await run_blocking(get_cached_analysis, repo_key, remote_sha, ANALYZER_VERSION)
+        if cached is not None:
+            log(f"⚡ Analysis cache hit for {owner}/{repo_name} @ {remote_sha[:10]}")
+            return _compact_analysis(cached, repo_key, remote_sha)
+        
+        # Other uvicorn workers may be analyzing the same mirror right now
+        mirror_path = get_mirror_path(owner, repo_name, github_token)
+        async with interprocess_lock(mirror_path, on_wait=lambda: report_progress(progress, "waiting")):
+            # Same request, already counted as a miss above
+            cached = await run_blocking(get_cached_analysis, repo_key, remote_sha, ANALYZER_VERSION, False)
+            if cached is not None:
+                log(f"⚡ Analysis finished by another worker for {owner}/{repo_name}")
+                return _compact_analysis(cached, repo_key, remote_sha)
+            
+            # Metadata request overlaps with the checkout
+            metadata_task = asyncio.create_task(fetch_repo_metadata(owner, repo_name))
+            
+            # An older analysis of this repository only needs the paths that changed since
+            repo_data = await _analyze_incrementally(owner, repo_name, clone_url, github_token, repo_key,
+                                                     remote_sha, metadata_task, progress)
+            if repo_data is not None:
+                commit_sha = repo_data["commit_sha"]
+            elif REPO_ACQUISITION_MODE == "tarball":
+                log(f"⏳ Analysis cache miss, streaming repository tarball...")
+                report_progress(progress, "cloning")
+                repo_info = await metadata_task
+                repo_data = await analyze_tarball(owner, repo_name, remote_sha, github_token, repo_info)
+                commit_sha = repo_data["commit_sha"]
+                report_progress(progress, "analyzing")
+            elif REPO_ACQUISITION_MODE == "partial":
+                log(f"⏳ Analysis cache miss, fetching repository tree...")
+                report_progress(progress, "cloning")
+                env = git_env(github_token)
+                async with cached_mirror(owner, repo_name, clone_url, github_token, remote_sha) as mirror_path:
+                    commit_sha = await head_sha(mirror_path, env)
+                    
+                    log(f"🔍 Analyzing repository structure...")
+                    report_progress(progress, "analyzing")
+                    repo_info = await metadata_task
+                    repo_data = await analyze_partial_mirror(mirror_path, commit_sha, repo_url, env, repo_info)
+                    repo_data["commit_sha"] = commit_sha
+            else:
+                log(f"⏳ Analysis cache miss, checking out repository...")
+                report_progress(progress, "cloning")
+                async with mirror_worktree(owner, repo_name, clone_url, github_token, remote_sha) as worktree_path:
+                    log(f"✅ Repository checked out: {worktree_path}")
+                    commit_sha = await head_sha(worktree_path, git_env(github_token))
+                    
+                    # Analyze the checked-out repository on the bounded analysis pool
+                    log(f"🔍 Analyzing repository structure...")
+                    report_progress(progress, "analyzing")
+                    repo_info = await metadata_task
+                    repo_data = await run_blocking(analyze_local_repo, worktree_path, repo_url, repo_info)
+                    repo_data["commit_sha"] = commit_sha
+            
+            await run_blocking(store_analysis, repo_key, commit_sha, ANALYZER_VERSION, repo_data)
+    except GitCommandError as e:
+        raise_for_git_error(e.stderr, owner, repo_name)
+    except subprocess.TimeoutExpired:
+        raise HTTPException(
+            status_code=408,
+            detail=f"⏱️ Clone timeout after 3 minutes.\n\n"
+                   f"Repository '{owner}/{repo_name}' is too large or connection is slow.\n\n"
+                   "Suggestions:\n"
+                   "1. Try a smaller repository\n"
+                   "2. Check your internet speed\n"
+                   "3. Repository might be >500MB"
+        )
     finally:
-        # Cleanup: Always delete temp directory
-        if temp_dir and os.path.exists(temp_dir):
-            try:
-                # On Windows, handle read-only files
-                if sys.platform.startswith('win'):
-                    for root, dirs, files in os.walk(temp_dir):
-                        for d in dirs:
-                            try:
-                                os.chmod(os.path.join(root, d), 0o777)
-                            except:
-                                pass
-                        for f in files:
-                            try:
-                                os.chmod(os.path.join(root, f), 0o777)
-                            except:
-                                pass
-                
-                shutil.rmtree(temp_dir, ignore_errors=True)
-                print(f"🗑️ Cleaned up temp directory")
-            except Exception as e:
-                print(f"⚠️ Warning: Could not fully clean temp directory: {e}")
-
-def analyze_local_repo(repo_path: str, repo_url: str) -> dict:
+        if metadata_task is not None and not metadata_task.done():
+            metadata_task.cancel()
+    
+    log(f"✨ Analysis complete!")
+    log(f"   - Files analyzed: {repo_data['total_files_analyzed']}")
+    log(f"   - Languages found: {len(repo_data.get('languages', {}))}")
+    
+    return _compact_analysis(repo_data, repo_key, commit_sha)
+
+def _compact_analysis(repo_data: dict, repo_key: str, commit_sha: str) -> dict:
+    """
+    Compact model of a stored analysis whose file contents load lazily from the content store
+    A pruned blob can vanish between the cache hit and the read; the analysis is then dropped
+    so the next request rebuilds it, instead of staying cached with empty files
+    """
+    def on_missing(shas):
+        log(f"⚠️ {len(shas)} file contents of {repo_key} @ {commit_sha[:10]} left the content store, "
+            f"dropping the cached analysis")
+        discard_analysis(repo_key, commit_sha, ANALYZER_VERSION)
+
+    return compact_repo_data(repo_data, read_file_contents, on_missing)
+
+async def _resolve_remote_sha(owner: str, repo_name: str, clone_url: str, github_token: str) -> str:
+    """Remote HEAD via git ls-remote, or over plain HTTP in tarball mode"""
+    if REPO_ACQUISITION_MODE == "tarball":
+        from .tarball_source import resolve_head_sha  # imports this module
+        return await resolve_head_sha(owner, repo_name, github_token)
+    return await remote_head_sha(clone_url, github_token)
+
+async def _analyze_incrementally(owner: str, repo_name: str, clone_url: str, github_token: str,
+                                 repo_key: str, remote_sha: str, metadata_task, progress=None):
+    """
+    Patch the newest stored analysis of this repository up to remote_sha from a git diff
+    Returns None when there is nothing to patch from or the diff is unsuitable (full analysis instead)
+    """
+    from .incremental_analysis import update_analysis  # imports this module
+    
+    if REPO_ACQUISITION_MODE == "tarball":
+        return None  # no mirror to diff in
+    base_sha, base_data = await run_blocking(get_latest_analysis, repo_key, ANALYZER_VERSION)
+    if base_data is None or base_sha == remote_sha:
+        return None
+    
+    report_progress(progress, "cloning")
+    env = git_env(github_token)
+    async with cached_mirror(owner, repo_name, clone_url, github_token, remote_sha) as mirror_path:
+        commit_sha = await head_sha(mirror_path, env)
+        
+        report_progress(progress, "analyzing")
+        with stage_timer("incremental_update"):
+            repo_data = await update_analysis(mirror_path, base_sha, base_data, commit_sha, env)
+    if repo_data is None:
+        return None
+    
+    repo_info = await metadata_task
+    if repo_info:
+        repo_data.update({
+            "name": repo_info.get("name", repo_name),
+            "description": repo_info.get("description", ""),
+            "language": repo_info.get("language", detect_primary_language(repo_data["languages"])),
+            "stars": repo_info.get("stargazers_count", 0),
+            "forks": repo_info.get("forks_count", 0),
+            "open_issues": repo_info.get("open_issues_count", 0),
+            "topics": repo_info.get("topics", [])
+        })
+    repo_data["commit_sha"] = commit_sha
+    record_incremental_update()
+    return repo_data
+
+def analyze_local_repo(repo_path: str, repo_url: str, repo_info: dict = None) -> dict:
     """
-    Analyze locally cloned repository
+    Analyze locally cloned repository (blocking - run via run_blocking)
     ✅ ENHANCED: Read more files for detailed diagrams
+    - repo_info: GitHub API metadata from fetch_repo_metadata, if available
     """
     owner, repo_name = parse_github_url(repo_url)
+    repo_info = repo_info or {}
     
-    # Try to get repo info from GitHub API (for metadata)
-    api_url = f"https://api.github.com/repos/{owner}/{repo_name}"
-    headers = {"Accept": "application/vnd.github.v3+json"}
-    github_token = os.getenv("GITHUB_TOKEN")
-    if github_token:
-        headers["Authorization"] = f"Bearer {github_token}"
+    # One traversal yields the tree, languages, read candidates and manifests
+    log("📂 Scanning repository (single pass)...")
+    with stage_timer("scan"):  # tree build + language detection
+        scan = scan_repository(repo_path)
     
-    try:
-        repo_response = requests.get(api_url, headers=headers, timeout=10)
-        repo_info = repo_response.json() if repo_response.status_code == 200 else {}
-    except Exception as e:
-        print(f"⚠️ Could not fetch GitHub API metadata: {e}")
-        repo_info = {}
+    log("📄 Reading important files for detailed analysis...")
+    with stage_timer("file_read"):
+        file_contents = read_candidate_files(scan.read_candidates)
     
-    print("📂 Building file tree...")
-    file_structure = build_file_tree_from_disk(repo_path)
+    log(f"✅ Read {len(file_contents)} files")
     
-    print("📄 Reading important files for detailed analysis...")
-    file_contents = read_important_files(repo_path)
+    log("🧬 Extracting symbols and imports...")
+    with stage_timer("symbols"):
+        symbols = build_symbol_graph(file_contents)
+    log(f"✅ Symbol graph: {len(symbols['files'])} files, "
+          f"{len(symbols['imports'])} internal imports, {len(symbols['calls'])} call edges")
+    with stage_timer("retrieval_index"):
+        retrieval = build_retrieval_index(file_contents)
     
-    print(f"✅ Read {len(file_contents)} files")
+    readme_path = scan.readme_source()
+    readme_content = read_text_file(readme_path) if readme_path else ""
+    dependencies = read_dependency_manifests(scan.manifest_sources())
     
-    readme_content = read_readme_from_disk(repo_path)
-    languages = detect_languages(repo_path)
-    dependencies = analyze_dependencies_from_disk(repo_path)
+    return build_repo_data(repo_name, repo_info, scan, file_contents, dependencies, readme_content, symbols,
+                           retrieval)
+
+async def analyze_partial_mirror(mirror_path: str, commit_sha: str, repo_url: str, env: dict,
+                                 repo_info: dict = None) -> dict:
+    """
+    Analyze a blob-less mirror (REPO_ACQUISITION_MODE=partial) without a checkout
+    ⚡ The tree listing needs no blobs; only the files the analyzer reads are downloaded,
+       so vendored code, build output and large assets never leave GitHub
+    - Files that are never read show size 0 in the tree (their size is unknown without the blob)
+    """
+    owner, repo_name = parse_github_url(repo_url)
+    repo_info = repo_info or {}
+    
+    log("📂 Listing repository tree...")
+    with stage_timer("scan"):
+        scan = RepoScan()
+        for blob_sha, rel_path in await list_tree_files(mirror_path, commit_sha, env):
+            parts = rel_path.split('/')
+            dir_parts = tuple(parts[:-1])
+            scan.add_file(dir_parts, parts[-1], 0, blob_sha, *path_flags(dir_parts))
+        scan.finalize()
+    
+    log("📄 Fetching and reading important files...")
+    with stage_timer("file_read"):
+        file_contents = await read_candidate_blobs(mirror_path, commit_sha, scan.read_candidates, env)
+    _fill_tree_sizes(scan.file_structure, file_contents)
+    log(f"✅ Read {len(file_contents)} files")
+    
+    readme_sha = scan.readme_source()
+    manifests = scan.manifest_sources()
+    root_blobs = await read_blobs(mirror_path, commit_sha, [s for s in [readme_sha, *manifests.values()] if s], env)
+    readme_content = root_blobs[readme_sha][1].decode('utf-8', errors='ignore') if readme_sha in root_blobs else ""
+    dependencies = {
+        package_manager: root_blobs[blob_sha][1].decode('utf-8', errors='ignore')[:10000]  # First 10KB
+        for package_manager, blob_sha in manifests.items() if blob_sha in root_blobs
+    }
     
+    log("🧬 Extracting symbols and imports...")
+    with stage_timer("symbols"):
+        symbols = await run_blocking(build_symbol_graph, file_contents)
+    with stage_timer("retrieval_index"):
+        retrieval = await run_blocking(build_retrieval_index, file_contents)
+    
+    return build_repo_data(repo_name, repo_info, scan, file_contents, dependencies, readme_content, symbols,
+                           retrieval)
+
+async def analyze_tarball(owner: str, repo_name: str, commit_sha: str, github_token: str = None,
+                          repo_info: dict = None) -> dict:
+    """
+    Analyze the GitHub tarball of commit_sha (REPO_ACQUISITION_MODE=tarball)
+    ⚡ Entries are filtered and read while the archive streams; nothing touches the disk
+    """
+    from .tarball_source import stream_repository_tarball  # imports this module
+    
+    with stage_timer("tarball_stream"):  # download, scan and file reads in one pass
+        tarball = await run_blocking(stream_repository_tarball, owner, repo_name, commit_sha, github_token)
+    log(f"✅ Read {len(tarball['file_contents'])} files")
+    
+    log("🧬 Extracting symbols and imports...")
+    with stage_timer("symbols"):
+        symbols = await run_blocking(build_symbol_graph, tarball["file_contents"])
+    with stage_timer("retrieval_index"):
+        retrieval = await run_blocking(build_retrieval_index, tarball["file_contents"])
+    
+    repo_data = build_repo_data(repo_name, repo_info or {}, tarball["scan"], tarball["file_contents"],
+                                tarball["dependencies"], tarball["readme"], symbols, retrieval)
+    repo_data["commit_sha"] = tarball["commit_sha"]
+    return repo_data
+
+def build_repo_data(repo_name: str, repo_info: dict, scan: RepoScan, file_contents: dict,
+                    dependencies: dict, readme: str, symbols: dict, retrieval: dict) -> dict:
+    """The analysis record shared by every acquisition mode"""
+    languages = scan.languages
     return {
         "name": repo_info.get("name", repo_name),
         "description": repo_info.get("description", ""),
         "language": repo_info.get("language", detect_primary_language(languages)),
         "languages": languages,
-        "file_structure": file_structure,
+        "file_structure": scan.file_structure,
         "file_contents": file_contents,
         "dependencies": dependencies,
-        "readme": readme_content,
+        "readme": readme,
+        "symbols": symbols,
+        "retrieval": retrieval,
         "stars": repo_info.get("stargazers_count", 0),
         "forks": repo_info.get("forks_count", 0),
         "open_issues": repo_info.get("open_issues_count", 0),
@@ -310,194 +506,154 @@ def analyze_local_repo(repo_path: str, repo_url: str) -> dict:
         "total_files_analyzed": len(file_contents)
     }
 
+def _fill_tree_sizes(file_structure: dict, file_contents: dict):
+    """Copy the sizes learned while reading into the tree nodes of those files"""
+    for rel_path, entry in file_contents.items():
+        level = file_structure
+        parts = rel_path.split('/')
+        for part in parts[:-1]:
+            level = level.get(part, {}).get("contents", {})
+        node = level.get(parts[-1])
+        if node is not None:
+            node["size"] = entry["size"]
+
 def build_file_tree_from_disk(repo_path: str, max_depth: int = 6) -> dict:
+    """Build file tree from local repository"""
+    return scan_repository(repo_path, max_depth).file_structure
+
+def read_text_file(file_path: str, max_chars: int = None) -> str:
+    """Read a text file leniently, optionally keeping only the first max_chars"""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read() if max_chars is None else f.read(max_chars)
+
+def read_file_prefix(file_path: str, max_bytes: int = MAX_CONTENT_BYTES):
     """
-    Build file tree from local repository
-    ✅ ENHANCED: Increased depth for better analysis
+    Read only the bytes we will keep
+    Returns None for binary files (NUL byte in the first block)
     """
-    
-    skip_dirs = {
-        '.git', 'node_modules', '__pycache__', '.next', 'dist', 'build',
-        'coverage', '.venv', 'venv', 'env', '.idea', '.vscode', 'target',
-        '.pytest_cache', '.mypy_cache', '__pypackages__', 'eggs', '.eggs',
-        'vendor', 'bower_components', '.bundle'
+    with open(file_path, 'rb') as f:
+        return decode_prefix(f.read(max_bytes))
+
+def decode_prefix(data: bytes, max_bytes: int = MAX_CONTENT_BYTES):
+    """Text of the first max_bytes, or None for binary data (NUL byte in the first block)"""
+    data = data[:max_bytes]
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    return data.decode('utf-8', errors='ignore')
+
+def file_content_entry(rel_path: str, content: str, size: int) -> dict:
+    """One file_contents record"""
+    filename = rel_path.rsplit('/', 1)[-1]
+    return {
+        "content": content,
+        "size": size,
+        "extension": file_extension(filename),
+        "purpose": classify_file_purpose(filename, rel_path),
+        "full_size": size
     }
-    
-    def build_tree(path: str, depth: int = 0) -> dict:
-        if depth > max_depth:
-            return {}
-        
-        tree = {}
-        try:
-            items = os.listdir(path)
-        except PermissionError:
-            return {}
-        
-        for item in items:
-            # Skip hidden files except important ones
-            if item.startswith('.') and item not in ['.env', '.gitignore', '.env.example', '.github']:
-                continue
-            
-            item_path = os.path.join(path, item)
-            
-            try:
-                if os.path.isdir(item_path):
-                    if item not in skip_dirs:
-                        subtree = build_tree(item_path, depth + 1)
-                        if subtree:  # Only add if has contents
-                            tree[item] = {
-                                "type": "dir",
-                                "path": os.path.relpath(item_path, repo_path).replace('\\', '/'),
-                                "contents": subtree
-                            }
-                else:
-                    size = os.path.getsize(item_path)
-                    extension = item.split(".")[-1] if "." in item else "none"
-                    purpose = classify_file_purpose(item, os.path.relpath(item_path, repo_path))
-                    
-                    tree[item] = {
-                        "type": "file",
-                        "path": os.path.relpath(item_path, repo_path).replace('\\', '/'),
-                        "size": size,
-                        "extension": extension,
-                        "purpose": purpose
-                    }
-            except (PermissionError, OSError) as e:
-                continue
-        
-        return tree
-    
-    return build_tree(repo_path)
 
-def classify_file_purpose(filename: str, filepath: str) -> str:
-    """Classify file purpose for better diagram organization"""
-    name_lower = filename.lower()
-    path_lower = filepath.lower()
-    
-    # Test files
-    if any(x in name_lower for x in ["test", "spec", ".test.", "_test", "test_"]):
-        return "testing"
-    
-    # Config files
-    if any(x in name_lower for x in ["config", "setup", ".env", "settings", "conf"]):
-        return "configuration"
-    
-    # Data models
-    if any(x in name_lower for x in ["model", "schema", "entity", "dto"]):
-        return "data_model"
-    
-    # API/Routes
-    if any(x in name_lower for x in ["route", "endpoint", "api", "controller", "handler"]):
-        return "api"
-    
-    # UI Components
-    if any(x in name_lower for x in ["component", "view", "page", "screen", "template"]):
-        return "ui"
-    
-    # Utilities
-    if any(x in name_lower for x in ["util", "helper", "tool", "common"]):
-        return "utility"
-    
-    # Services
-    if any(x in name_lower for x in ["service", "provider", "manager", "factory"]):
-        return "service"
-    
-    # Middleware
-    if any(x in name_lower for x in ["middleware", "interceptor", "filter"]):
-        return "middleware"
-    
-    # Database
-    if any(x in name_lower for x in ["migration", "seed", "database", "db", ".sql"]):
-        return "database"
-    
-    # Dependencies
-    if filename in ["package.json", "requirements.txt", "Cargo.toml", "go.mod", "pom.xml", "build.gradle"]:
-        return "dependencies"
-    
-    # Documentation
-    if any(x in name_lower for x in ["readme", "doc", "docs", ".md"]):
-        return "documentation"
-    
-    return "general"
+def _get_reader_pool() -> ThreadPoolExecutor:
+    global _reader_pool
+    with _reader_pool_lock:
+        if _reader_pool is None:
+            _reader_pool = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="repo-reader")
+        return _reader_pool
 
-def read_important_files(repo_path: str, max_files: int = 200) -> dict:
+def _safe_read_prefix(file_path: str):
+    try:
+        return read_file_prefix(file_path)
+    except Exception:
+        return None
+
+def read_candidate_files(candidates: list, max_files: int = 200, byte_budget: int = None) -> dict:
     """
-    Read important files from repository
+    Read scanned candidate files in parallel, keeping walk order
     ✅ ENHANCED: Increased limits for detailed diagram generation
     - More files: 100 → 200
     - More content: 20KB → 40KB per file
     - Larger file size: 200KB → 400KB
+    ⚡ PARALLEL: Thread pool reads only the kept prefix, skips binaries,
+       and stops at a per-repository byte budget
     """
+    byte_budget = READ_BYTE_BUDGET if byte_budget is None else byte_budget
     important_files = {}
+    remaining = byte_budget
+    pool = _get_reader_pool()
+    index = 0
+    
+    while index < len(candidates) and len(important_files) < max_files and remaining > 0:
+        # Submit just enough files to fill the open slots and the remaining budget
+        window = []
+        window_bytes = 0
+        needed = max_files - len(important_files)
+        while index < len(candidates) and len(window) < needed and window_bytes < remaining:
+            candidate = candidates[index]
+            window.append(candidate)
+            window_bytes += min(candidate[2], MAX_CONTENT_BYTES)
+            index += 1
+        
+        # map() yields results in submission order, so output stays deterministic
+        results = pool.map(_safe_read_prefix, [c[1] for c in window])
+        for (rel_path, file_path, size), content in zip(window, results):
+            if content is None or len(important_files) >= max_files or remaining <= 0:
+                continue
+            
+            if len(content) > remaining:
+                content = content[:remaining]
+            remaining -= len(content)
+            important_files[rel_path] = file_content_entry(rel_path, content, size)
     
-    code_extensions = {
-        'py', 'js', 'jsx', 'ts', 'tsx', 'java', 'go', 'rs', 'cpp', 'c', 'h',
-        'rb', 'php', 'swift', 'kt', 'kts', 'scala', 'sh', 'bash', 'yml', 'yaml', 
-        'json', 'xml', 'md', 'txt', 'toml', 'ini', 'cfg', 'env', 'sql', 'graphql',
-        'vue', 'svelte', 'css', 'scss', 'sass', 'html', 'htm'
-    }
-    
-    skip_dirs = {
-        '.git', 'node_modules', '__pycache__', '.next', 'dist', 'build',
-        'coverage', '.venv', 'venv', 'env', '.idea', '.vscode', 'target',
-        '.pytest_cache', '.mypy_cache', '__pypackages__', 'vendor'
-    }
-    
-    file_count = 0
+    return important_files
+
+async def read_candidate_blobs(git_dir: str, rev: str, candidates: list, env: dict,
+                               max_files: int = 200, byte_budget: int = None) -> dict:
+    """
+    read_candidate_files for a partial mirror: candidates carry blob SHAs instead of paths
+    Blobs are fetched window by window, just enough to fill the open slots; files that turn
+    out to be binary or over 400KB are dropped as a disk scan would drop them
+    """
+    byte_budget = READ_BYTE_BUDGET if byte_budget is None else byte_budget
+    important_files = {}
+    remaining = byte_budget
+    index = 0
     
-    for root, dirs, files in os.walk(repo_path):
-        # Remove skip directories from traversal
-        dirs[:] = [d for d in dirs if d not in skip_dirs and not d.startswith('.')]
+    while index < len(candidates) and len(important_files) < max_files and remaining > 0:
+        window = candidates[index:index + max_files - len(important_files)]
+        index += len(window)
+        blobs = await read_blobs_materialized(git_dir, rev, [c[1] for c in window], env)
         
-        for file in files:
-            if file_count >= max_files:
-                break
-            
-            file_path = os.path.join(root, file)
-            rel_path = os.path.relpath(file_path, repo_path).replace('\\', '/')
-            
-            extension = file.split(".")[-1] if "." in file else ""
-            
-            try:
-                size = os.path.getsize(file_path)
-            except OSError:
+        for rel_path, blob_sha, _ in window:
+            if blob_sha not in blobs or len(important_files) >= max_files or remaining <= 0:
+                continue
+            size, data = blobs[blob_sha]
+            content = decode_prefix(data) if size < MAX_READ_FILE_SIZE else None
+            if content is None:
                 continue
             
-            # Read if: code file or important config, and under 400KB
-            should_read = (
-                extension in code_extensions or 
-                file in [
-                    "package.json", "requirements.txt", "Dockerfile", "README.md",
-                    "docker-compose.yml", "Makefile", ".env.example", "pyproject.toml",
-                    "go.mod", "Cargo.toml", "pom.xml", "build.gradle", "tsconfig.json"
-                ]
-            )
-            
-            if should_read and size < 400000:  # 400KB limit
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                    
-                    purpose = classify_file_purpose(file, rel_path)
-                    
-                    important_files[rel_path] = {
-                        "content": content[:40000],  # First 40KB (increased from 20KB)
-                        "size": size,
-                        "extension": extension,
-                        "purpose": purpose,
-                        "full_size": len(content)
-                    }
-                    
-                    file_count += 1
-                    
-                except Exception as e:
-                    continue
-        
-        if file_count >= max_files:
-            break
+            if len(content) > remaining:
+                content = content[:remaining]
+            remaining -= len(content)
+            important_files[rel_path] = file_content_entry(rel_path, content, size)
     
     return important_files
 
+async def read_blobs_materialized(git_dir: str, rev: str, shas: list, env: dict) -> dict:
+    """
+    read_blobs that serves blobs already in the content store from there
+    ⚡ Content SHAs are git blob ids, so a file some earlier analysis kept whole (any commit,
+       any fork) is neither fetched from GitHub nor read from the mirror again
+    """
+    stored = await run_blocking(read_file_contents, shas, True)
+    blobs = {sha: (len(data), data) for sha, data in stored.items()}
+    missing = [sha for sha in shas if sha not in blobs]
+    if missing:
+        blobs.update(await read_blobs(git_dir, rev, missing, env))
+    return blobs
+
+def read_important_files(repo_path: str, max_files: int = 200) -> dict:
+    """Read important files from repository"""
+    return read_candidate_files(scan_repository(repo_path).read_candidates, max_files)
+
 def read_readme_from_disk(repo_path: str) -> str:
     """Read README file from repository"""
     readme_files = ["README.md", "README.txt", "README.rst", "README", "readme.md", "Readme.md"]
@@ -506,8 +662,7 @@ def read_readme_from_disk(repo_path: str) -> str:
         readme_path = os.path.join(repo_path, readme_name)
         if os.path.exists(readme_path):
             try:
-                with open(readme_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    return f.read()
+                return read_text_file(readme_path)
             except Exception:
                 continue
     
@@ -515,42 +670,7 @@ def read_readme_from_disk(repo_path: str) -> str:
 
 def detect_languages(repo_path: str) -> dict:
     """Detect programming languages in repository"""
-    languages = {}
-    
-    language_extensions = {
-        'Python': ['.py', '.pyw'],
-        'JavaScript': ['.js', '.jsx', '.mjs'],
-        'TypeScript': ['.ts', '.tsx'],
-        'Java': ['.java'],
-        'Go': ['.go'],
-        'Rust': ['.rs'],
-        'C++': ['.cpp', '.cc', '.cxx', '.hpp'],
-        'C': ['.c', '.h'],
-        'Ruby': ['.rb'],
-        'PHP': ['.php'],
-        'Swift': ['.swift'],
-        'Kotlin': ['.kt', '.kts'],
-        'Scala': ['.scala'],
-        'HTML': ['.html', '.htm'],
-        'CSS': ['.css', '.scss', '.sass', '.less'],
-        'Shell': ['.sh', '.bash'],
-        'SQL': ['.sql'],
-        'Vue': ['.vue'],
-        'Svelte': ['.svelte']
-    }
-    
-    skip_dirs = {'.git', 'node_modules', '__pycache__', 'venv', '.venv', 'vendor'}
-    
-    for root, dirs, files in os.walk(repo_path):
-        dirs[:] = [d for d in dirs if d not in skip_dirs]
-        
-        for file in files:
-            ext = os.path.splitext(file)[1]
-            for lang, exts in language_extensions.items():
-                if ext in exts:
-                    languages[lang] = languages.get(lang, 0) + 1
-    
-    return languages
+    return scan_repository(repo_path).languages
 
 def detect_primary_language(languages: dict) -> str:
     """Detect primary language from language counts"""
@@ -558,64 +678,52 @@ def detect_primary_language(languages: dict) -> str:
         return "Unknown"
     return max(languages, key=languages.get)
 
-def analyze_dependencies_from_disk(repo_path: str) -> dict:
-    """Analyze dependencies from dependency files"""
+def read_dependency_manifests(manifests: dict) -> dict:
+    """Read dependency manifests as {package_manager: first 10KB}"""
     dependencies = {}
     
-    dependency_files = {
-        "package.json": "npm",
-        "yarn.lock": "yarn",
-        "requirements.txt": "pip",
-        "Pipfile": "pipenv",
-        "pyproject.toml": "poetry",
-        "Cargo.toml": "cargo",
-        "go.mod": "go",
-        "pom.xml": "maven",
-        "build.gradle": "gradle",
-        "build.gradle.kts": "gradle",
-        "composer.json": "composer",
-        "Gemfile": "bundler"
-    }
-    
-    for dep_file, package_manager in dependency_files.items():
-        file_path = os.path.join(repo_path, dep_file)
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                dependencies[package_manager] = content[:10000]  # First 10KB
-            except Exception:
-                continue
+    for package_manager, file_path in manifests.items():
+        try:
+            dependencies[package_manager] = read_text_file(file_path, 10000)  # First 10KB
+        except Exception:
+            continue
     
     return dependencies
 
+def analyze_dependencies_from_disk(repo_path: str) -> dict:
+    """Analyze dependencies from dependency files"""
+    return read_dependency_manifests(scan_repository(repo_path).manifest_sources())
+
 def format_file_structure(structure: dict, indent: int = 0, max_items: int = 150) -> str:
     """
     Format file structure for display
     ✅ ENHANCED: Show more items for detailed analysis
+    ⚡ One list for the whole tree, joined once (no re-copying of subtrees per level)
     """
-    result = []
+    lines = []
+    _format_tree_lines(structure, indent, max_items, lines)
+    return "\n".join(lines)
+
+def _format_tree_lines(structure: dict, indent: int, max_items: int, lines: list):
+    prefix = "  " * indent
     count = 0
-    
+
     for name, info in structure.items():
         if count >= max_items:
-            result.append(f"{'  ' * indent}... ({len(structure) - count} more items)")
+            lines.append(f"{prefix}... ({len(structure) - count} more items)")
             break
-            
-        prefix = "  " * indent
-        if isinstance(info, dict):
+
+        if isinstance(info, (dict, FileNode)):  # concrete types: an ABC isinstance is slow here
             if info.get("type") == "dir":
-                result.append(f"{prefix}📁 {name}/")
-                if "contents" in info and info["contents"]:
-                    result.append(format_file_structure(info["contents"], indent + 1, max_items))
+                lines.append(f"{prefix}📁 {name}/")
+                if info.get("contents"):
+                    _format_tree_lines(info["contents"], indent + 1, max_items, lines)
             else:
                 purpose = info.get("purpose", "")
                 size = info.get("size", 0)
                 ext = info.get("extension", "")
-                result.append(f"{prefix}📄 {name} [{ext}] ({purpose}, {size}B)")
+                lines.append(f"{prefix}📄 {name} [{ext}] ({purpose}, {size}B)")
         count += 1
-    
-    return "\n".join(result)
 
 def format_file_contents(contents: dict, max_files: int = 60) -> str:
     """
@@ -623,9 +731,12 @@ def format_file_contents(contents: dict, max_files: int = 60) -> str:
     ✅ ENHANCED: Show more files with more content
     """
     result = []
+    shown = list(contents.items())[:max_files]
+    if isinstance(contents, FileContents):
+        contents.prefetch([filepath for filepath, _ in shown])  # one store lookup instead of one per file
     
-    for filepath, file_data in list(contents.items())[:max_files]:
-        if isinstance(file_data, dict):
+    for filepath, file_data in shown:
+        if isinstance(file_data, (dict, FileRecord)):
             content = file_data.get("content", "")
             purpose = file_data.get("purpose", "")
             extension = file_data.get("extension", "")
@@ -647,6 +758,7 @@ def format_file_contents(contents: dict, max_files: int = 60) -> str:
     return "\n".join(result)
 
 # Keep old function name for backward compatibility
-def fetch_github_repo_structure(repo_url: str, deep_fetch: bool = True, github_token: str = None) -> dict:
+async def fetch_github_repo_structure(repo_url: str, deep_fetch: bool = True, github_token: str = None,
+                                     progress=None) -> dict:
     """Main entry point - uses git clone for comprehensive analysis"""
-    return clone_and_analyze_repo(repo_url, github_token)
\ No newline at end of file
+    return await clone_and_analyze_repo(repo_url, github_token, progress)
\ No newline at end of file
@@ -0,0 +1,207 @@
+# backend/services/incremental_analysis.py - INCREMENTAL RE-ANALYSIS FROM GIT DIFFS
+import os
+
+from .repo_cache import (
+    run_git, run_git_bytes, cat_file_batch, GitCommandError, REGULAR_FILE_MODES, REPO_ACQUISITION_MODE
+)
+from .repo_scanner import (
+    RepoScan, path_flags, sort_tree_level, walk_order_key,
+    EXTENSION_TO_LANGUAGE, DEPENDENCY_FILES, README_FILES
+)
+from .symbol_extractor import update_symbol_graph
+from .retrieval import update_retrieval_index
+from .github_service import decode_prefix, file_content_entry, read_blobs_materialized, READ_BYTE_BUDGET
+from .repo_model import content_length
+from .executor import run_blocking
+from .metrics import log
+
+# Above this many changed paths a full analysis is cheaper and simpler (override in .env)
+INCREMENTAL_MAX_CHANGES = int(os.getenv("INCREMENTAL_MAX_CHANGES", "300"))
+MAX_FILES = 200  # same cap as read_candidate_files
+
+
+async def diff_commits(git_dir: str, old_sha: str, new_sha: str, env: dict) -> list:
+    """
+    git diff --raw between two commits
+    Returns [{"path", "was_file", "blob"}] where blob is the new blob SHA, or None when the path
+    is gone (or is no longer a regular file)
+    """
+    output = await run_git_bytes(
+        ["--git-dir", git_dir, "diff", "--raw", "-z", "--no-renames", "--no-abbrev", old_sha, new_sha], env
+    )
+    fields = output.decode("utf-8", errors="replace").split("\0")
+
+    changes = []
+    for meta, path in zip(fields[0::2], fields[1::2]):
+        if not meta.startswith(":"):
+            continue
+        old_mode, new_mode, _, new_blob, _ = meta[1:].split()
+        changes.append({
+            "path": path,
+            "was_file": old_mode in REGULAR_FILE_MODES,
+            "blob": new_blob if new_mode in REGULAR_FILE_MODES else None
+        })
+    return changes
+
+
+def _language(name: str):
+    return EXTENSION_TO_LANGUAGE.get(os.path.splitext(name)[1])
+
+
+def _remove_from_tree(tree: dict, parts: list):
+    """Delete a file node and any directories left empty"""
+    levels = [tree]
+    for part in parts[:-1]:
+        node = levels[-1].get(part)
+        if not node or node.get("type") != "dir":
+            return
+        levels.append(node["contents"])
+
+    levels[-1].pop(parts[-1], None)
+    for depth in range(len(parts) - 1, 0, -1):
+        if levels[depth]:
+            break
+        levels[depth - 1].pop(parts[depth - 1], None)
+
+
+def _merge_tree(tree: dict, patch: dict):
+    for name, node in patch.items():
+        existing = tree.get(name)
+        if node["type"] == "dir" and existing and existing.get("type") == "dir":
+            _merge_tree(existing["contents"], node["contents"])
+        else:
+            tree[name] = node
+
+
+def apply_changes(base: dict, changes: list, sizes: dict, contents: dict, root_texts: dict,
+                  max_files: int = MAX_FILES, byte_budget: int = None) -> tuple:
+    """
+    Patch a stored analysis with a diff (blocking - run via run_blocking)
+    - sizes / contents: {blob_sha: (size, bytes)} from cat_file_batch
+    - root_texts: {filename: text} for root README/manifests, or None when untouched
+    Changed paths are re-classified, re-read and re-parsed; everything else is kept
+    (unchanged file_contents entries stay content store handles and are never read).
+    Files that no longer fit max_files/byte_budget stay out, so the selection can differ
+    from a full analysis at the margin.
+    Returns (repo_data, changed file_contents paths)
+    """
+    byte_budget = READ_BYTE_BUDGET if byte_budget is None else byte_budget
+    data = dict(base)
+    tree = data["file_structure"]
+    languages = dict(data.get("languages", {}))
+    file_contents = dict(data.get("file_contents", {}))
+    touched = set()
+
+    # Removals first, so a file replaced by a directory (or the reverse) lands cleanly
+    for change in changes:
+        parts = change["path"].split("/")
+        if change["was_file"] and path_flags(tuple(parts[:-1]))[2]:
+            lang = _language(parts[-1])
+            if lang in languages:
+                languages[lang] -= 1
+        _remove_from_tree(tree, parts)
+        if file_contents.pop(change["path"], None) is not None:
+            touched.add(change["path"])
+
+    # Re-add current versions through the scanner so tree/language/read rules match a full scan
+    scan = RepoScan()
+    blobs = {}
+    for change in changes:
+        if change["blob"] is None:
+            continue
+        parts = change["path"].split("/")
+        dir_parts = tuple(parts[:-1])
+        size = sizes.get(change["blob"], (0, None))[0]
+        blobs[change["path"]] = change["blob"]
+        scan.add_file(dir_parts, parts[-1], size, change["path"], *path_flags(dir_parts))
+    scan.finalize()
+
+    _merge_tree(tree, scan.file_structure)
+    for lang, count in scan.languages.items():
+        languages[lang] = languages.get(lang, 0) + count
+
+    used = sum(content_length(entry) for entry in file_contents.values())  # kept files stay unread
+    skipped = 0
+    for rel_path, _, size in scan.read_candidates:
+        content = decode_prefix(contents.get(blobs[rel_path], (0, b""))[1] or b"")
+        if content is None:
+            continue
+        if len(file_contents) >= max_files or used >= byte_budget:
+            skipped += 1
+            continue
+        content = content[:byte_budget - used]
+        used += len(content)
+        file_contents[rel_path] = file_content_entry(rel_path, content, size)
+        touched.add(rel_path)
+
+    data["file_structure"] = sort_tree_level(tree)
+    data["languages"] = {lang: count for lang, count in languages.items() if count > 0}
+    data["file_contents"] = dict(sorted(file_contents.items(), key=lambda item: walk_order_key(item[0])))
+    data["total_files_analyzed"] = len(data["file_contents"])
+    data["symbols"] = update_symbol_graph(data.get("symbols"), data["file_contents"], touched)
+    data["retrieval"] = update_retrieval_index(data.get("retrieval"), data["file_contents"], touched)
+
+    if root_texts is not None:
+        data["readme"] = next((root_texts[name] for name in README_FILES if name in root_texts), "")
+        data["dependencies"] = {
+            manager: root_texts[name][:10000]
+            for name, manager in DEPENDENCY_FILES.items() if name in root_texts
+        }
+
+    if skipped:
+        log(f"   - {skipped} changed files left out (file/byte budget full)")
+    return data, touched
+
+
+async def update_analysis(git_dir: str, base_sha: str, base: dict, new_sha: str, env: dict) -> dict:
+    """
+    Bring a stored analysis from base_sha to new_sha using only the changed paths
+    ⚡ Cost follows the size of the diff, not the size of the repository:
+       no checkout, just one diff and cat-file reads of changed blobs from the mirror
+    Returns the new repo_data, or None when a full analysis is needed
+    (base commit no longer in the mirror, or more than INCREMENTAL_MAX_CHANGES paths changed)
+    """
+    try:
+        await run_git(["--git-dir", git_dir, "cat-file", "-e", f"{base_sha}^{{commit}}"], env)
+    except GitCommandError:
+        log(f"⚠️ Base commit {base_sha[:10]} is not in the mirror, running a full analysis")
+        return None
+
+    changes = await diff_commits(git_dir, base_sha, new_sha, env)
+    if len(changes) > INCREMENTAL_MAX_CHANGES:
+        log(f"⚠️ {len(changes)} changed paths (limit {INCREMENTAL_MAX_CHANGES}), running a full analysis")
+        return None
+    log(f"🔁 Incremental update {base_sha[:10]} → {new_sha[:10]}: {len(changes)} changed paths")
+
+    new_blobs = list(dict.fromkeys(c["blob"] for c in changes if c["blob"]))
+    if REPO_ACQUISITION_MODE == "partial":
+        sizes = {}  # sizes of blobs not in the mirror are unknown until they are fetched
+    else:
+        sizes = await cat_file_batch(git_dir, new_blobs, env, check_only=True)
+
+    # Read contents only for files a full scan would read
+    probe = RepoScan()
+    for change in changes:
+        if change["blob"]:
+            parts = change["path"].split("/")
+            dir_parts = tuple(parts[:-1])
+            probe.add_file(dir_parts, parts[-1], sizes.get(change["blob"], (0, None))[0],
+                           change["blob"], *path_flags(dir_parts))
+    contents = await read_blobs_materialized(
+        git_dir, new_sha, list(dict.fromkeys(c[1] for c in probe.read_candidates)), env
+    )
+    sizes.update(contents)
+
+    root_texts = None
+    root_names = {c["path"] for c in changes if "/" not in c["path"]}
+    if root_names & (set(README_FILES) | set(DEPENDENCY_FILES)):
+        names = list(dict.fromkeys(README_FILES + list(DEPENDENCY_FILES)))
+        objects = await cat_file_batch(git_dir, [f"{new_sha}:{name}" for name in names], env)
+        root_texts = {
+            name: objects[f"{new_sha}:{name}"][1].decode("utf-8", errors="ignore")
+            for name in names if f"{new_sha}:{name}" in objects
+        }
+
+    repo_data, touched = await run_blocking(apply_changes, base, changes, sizes, contents, root_texts)
+    log(f"✅ Incremental update: {len(touched)} files re-read, {len(changes)} paths patched")
+    return repo_data
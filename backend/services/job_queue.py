@@ -0,0 +1,304 @@
+# backend/services/job_queue.py - BACKGROUND DIAGRAM JOBS
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import traceback
+from fastapi import HTTPException
+
+from models import DiagramRequest
+from .repo_cache import REPO_CACHE_DIR
+from .executor import run_blocking
+from .metrics import log, request_scope, format_stage_summary
+
+# Job queue configuration (override in .env)
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(REPO_CACHE_DIR, "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))  # 1 week
+
+_queue = None
+_workers = []
+# GitHub tokens stay in memory only; they are never written to the job table
+_job_tokens = {}
+_schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the job database, creating the schema on first use"""
+    global _schema_ready
+
+    os.makedirs(os.path.dirname(os.path.abspath(JOBS_DB_PATH)), exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+
+    if not _schema_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                request TEXT NOT NULL,
+                has_token INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                worker_pid INTEGER,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        conn.commit()
+        _schema_ready = True
+
+    return conn
+
+
+def _update_job(job_id: str, **fields):
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    conn = _connect()
+    try:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", list(fields.values()) + [job_id])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _insert_job(job_id: str, kind: str, request_json: str, has_token: bool):
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, stage, request, has_token, worker_pid, created_at, updated_at) "
+            "VALUES (?, ?, 'queued', 'queued', ?, ?, ?, ?, ?)",
+            (job_id, kind, request_json, int(has_token), os.getpid(), now, now)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _claim_job(job_id: str):
+    """
+    Mark a queued job running for this process and return its request_json
+    One conditional UPDATE, so a job queued twice (requeued or recovered) is only ever claimed once;
+    None when it is unknown or no longer queued
+    """
+    conn = _connect()
+    try:
+        claimed = conn.execute(
+            "UPDATE jobs SET status = 'running', stage = 'starting', worker_pid = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (os.getpid(), time.time(), job_id)
+        ).rowcount
+        row = conn.execute("SELECT request FROM jobs WHERE id = ?", (job_id,)).fetchone() if claimed else None
+        conn.commit()
+    finally:
+        conn.close()
+    return row["request"] if row else None
+
+
+def get_job(job_id: str) -> dict:
+    """Return a job row as a dict, or None if the id is unknown"""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+
+    return {
+        "job_id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "stage": row["stage"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"]
+    }
+
+
+def _pid_alive(pid: int) -> bool:
+    if not pid:
+        return False
+    if pid == os.getpid():
+        return True
+    if sys.platform.startswith('win'):
+        return _windows_pid_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _windows_pid_alive(pid: int) -> bool:
+    """os.kill(pid, 0) terminates the process on Windows, so ask for its exit code instead"""
+    import ctypes
+    from ctypes import wintypes
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    ERROR_ACCESS_DENIED = 5
+    STILL_ACTIVE = 259
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # Access denied means the process exists but belongs to someone else
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        exit_code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return True
+        return exit_code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _recover_jobs() -> list:
+    """
+    Requeue jobs orphaned by a previous process and prune expired ones
+    Jobs that needed a GitHub token can't be resumed (the token was never stored)
+    """
+    requeued = []
+    conn = _connect()
+    try:
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND updated_at < ?",
+            (time.time() - JOB_RETENTION_SECONDS,)
+        )
+        rows = conn.execute(
+            "SELECT id, has_token, worker_pid FROM jobs WHERE status IN ('queued', 'running') "
+            "ORDER BY created_at"
+        ).fetchall()
+        for row in rows:
+            if _pid_alive(row["worker_pid"]):
+                continue
+            if row["has_token"]:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', stage = 'interrupted', "
+                    "error = 'Server restarted before this private-repository job finished. Please resubmit.', "
+                    "updated_at = ? WHERE id = ?",
+                    (time.time(), row["id"])
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', stage = 'queued', worker_pid = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (os.getpid(), time.time(), row["id"])
+                )
+                requeued.append(row["id"])
+        conn.commit()
+    finally:
+        conn.close()
+    return requeued
+
+
+async def submit_diagram_job(request: DiagramRequest) -> str:
+    """Queue a diagram generation job and return its id"""
+    if _queue is None:
+        raise HTTPException(status_code=503, detail="Job workers are not running")
+
+    job_id = uuid.uuid4().hex
+    request_json = request.model_dump_json(exclude={"github_token"})
+    await run_blocking(_insert_job, job_id, "diagram", request_json, bool(request.github_token))
+
+    if request.github_token:
+        _job_tokens[job_id] = request.github_token
+
+    await _queue.put(job_id)
+    log(f"📥 Queued diagram job {job_id} ({request.diagram_type} for {request.repo_url})")
+    return job_id
+
+
+async def _run_diagram_job(job_id: str):
+    from .diagram_service import generate_diagram_result
+
+    request_json = await run_blocking(_claim_job, job_id)
+    if request_json is None:
+        return
+
+    request = DiagramRequest.model_validate_json(request_json)
+    request.github_token = _job_tokens.pop(job_id, None)
+
+    # Stage writes go through one writer task: off the event loop, in order,
+    # and finished before the final status so a late stage can't overwrite it
+    stages = asyncio.Queue()
+
+    async def write_stages():
+        while (stage := await stages.get()) is not None:
+            try:
+                await run_blocking(_update_job, job_id, stage=stage)
+            except sqlite3.Error as e:
+                log(f"⚠️ Job {job_id} stage update failed: {e}")
+
+    writer = asyncio.create_task(write_stages())
+    try:
+        try:
+            result = await generate_diagram_result(request, progress=stages.put_nowait)
+        finally:
+            stages.put_nowait(None)
+            await writer
+        await run_blocking(
+            _update_job, job_id, status="completed", stage="done", result=result.model_dump_json()
+        )
+        log(f"✅ Diagram job {job_id} completed")
+    except HTTPException as e:
+        await run_blocking(_update_job, job_id, status="failed", stage="failed", error=str(e.detail))
+        log(f"❌ Diagram job {job_id} failed: {e.detail}")
+    except Exception as e:
+        traceback.print_exc()
+        await run_blocking(_update_job, job_id, status="failed", stage="failed", error=f"Unexpected error: {str(e)}")
+        log(f"❌ Diagram job {job_id} failed: {e}")
+
+
+async def _worker_loop(worker_index: int):
+    while True:
+        job_id = await _queue.get()
+        try:
+            # Jobs log and time their stages under their own id, like HTTP requests do
+            with request_scope(f"job-{job_id[:8]}") as stages:
+                start = time.perf_counter()
+                await _run_diagram_job(job_id)
+                if stages:
+                    log(f"⏱️ Job {job_id} finished in {time.perf_counter() - start:.2f}s ({format_stage_summary(stages)})")
+        except Exception as e:
+            log(f"❌ Job worker {worker_index} error on {job_id}: {e}")
+        finally:
+            _queue.task_done()
+
+
+async def start_job_workers():
+    """Start the worker pool and requeue jobs left over from a previous run"""
+    global _queue
+    if _queue is not None:
+        return
+
+    _queue = asyncio.Queue()
+    for job_id in await run_blocking(_recover_jobs):
+        _queue.put_nowait(job_id)
+
+    for i in range(JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker_loop(i)))
+
+    log(f"👷 Started {JOB_WORKERS} diagram job workers")
+
+
+async def stop_job_workers():
+    """Cancel workers; unfinished jobs are requeued on the next start"""
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
@@ -0,0 +1,122 @@
+# backend/services/llm_cache.py - LLM RESPONSE CACHE
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from langchain.messages import AIMessage
+from .llm_clients import llm_slot
+from .metrics import log, stage_timer, observe_tokens
+
+# LLM response cache configuration (override in .env)
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))  # 1 hour
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+
+# Sampling parameters that change what the model returns
+SAMPLING_PARAMS = (
+    "temperature", "top_p", "max_tokens", "seed", "stop",
+    "frequency_penalty", "presence_penalty", "n"
+)
+
+_responses = OrderedDict()  # key -> (expires_at, content)
+_stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0}
+
+
+def _normalize_text(text) -> str:
+    """Line endings and trailing whitespace don't change the answer, so they don't change the key"""
+    if not isinstance(text, str):
+        return json.dumps(text, sort_keys=True, default=str)
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def _normalize_messages(messages) -> list:
+    if isinstance(messages, str):
+        return [["human", _normalize_text(messages)]]
+    return [[getattr(m, "type", "human"), _normalize_text(getattr(m, "content", m))] for m in messages]
+
+
+def cache_key(llm, messages) -> str:
+    """sha256 over model name, sampling params and the normalized messages"""
+    payload = {
+        "model": getattr(llm, "model_name", None) or getattr(llm, "model", None),
+        "params": {name: getattr(llm, name, None) for name in SAMPLING_PARAMS},
+        "messages": _normalize_messages(messages)
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def get_cached_response(llm, messages) -> str:
+    """Cached response text for this prompt, or None (expired entries count as misses)"""
+    key = cache_key(llm, messages)
+    entry = _responses.get(key)
+
+    if entry is not None and entry[0] < time.time():
+        del _responses[key]
+        _stats["expired"] += 1
+        entry = None
+
+    if entry is None:
+        _stats["misses"] += 1
+        return None
+
+    _responses.move_to_end(key)
+    _stats["hits"] += 1
+    return entry[1]
+
+
+def store_response(llm, messages, content: str):
+    """Remember a response, evicting least recently used entries past the size limit"""
+    if LLM_CACHE_MAX_ENTRIES <= 0 or not content:
+        return
+
+    key = cache_key(llm, messages)
+    _responses[key] = (time.time() + LLM_CACHE_TTL_SECONDS, content)
+    _responses.move_to_end(key)
+    _stats["stores"] += 1
+
+    while len(_responses) > LLM_CACHE_MAX_ENTRIES:
+        _responses.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def discard_cached_response(llm, messages):
+    """Forget a response the caller rejected, so retrying the same prompt asks the model again"""
+    _responses.pop(cache_key(llm, messages), None)
+
+
+async def cached_ainvoke(llm, messages, use_cache: bool = True):
+    """
+    llm.ainvoke with a response cache in front
+    ⚡ Identical prompts for an unchanged repo return in milliseconds
+    - use_cache=False always calls the model (the fresh answer is still stored)
+    """
+    if use_cache:
+        content = get_cached_response(llm, messages)
+        if content is not None:
+            log(f"⚡ LLM cache hit")
+            return AIMessage(content=content)
+
+    with stage_timer("llm_call"):
+        async with llm_slot(llm):
+            response = await llm.ainvoke(messages)
+    usage = getattr(response, "usage_metadata", None) or {}
+    observe_tokens("prompt", usage.get("input_tokens", 0))
+    observe_tokens("completion", usage.get("output_tokens", 0))
+    store_response(llm, messages, response.content)
+    return response
+
+
+def llm_cache_stats() -> dict:
+    """Hit/miss counters for this process"""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "entries": len(_responses),
+        "hit_ratio": round(_stats["hits"] / lookups, 3) if lookups else 0.0
+    }
+
+
+def clear_llm_cache():
+    _responses.clear()
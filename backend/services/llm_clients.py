@@ -0,0 +1,122 @@
+# backend/services/llm_clients.py - SHARED LLM CLIENT REGISTRY
+import os
+import asyncio
+import httpx
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+load_dotenv()
+from langchain_openai import ChatOpenAI
+from .metrics import log
+
+# LLM client configuration (override in .env)
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # e.g. a local OpenAI-compatible server for load tests
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+LLM_MAX_CONCURRENCY = max(1, int(os.getenv("LLM_MAX_CONCURRENCY", "8")))  # in-flight requests per model
+
+_clients = {}  # (model, temperature) -> ChatOpenAI
+_semaphores = {}  # model -> asyncio.Semaphore
+_waiting = {}  # model -> callers queued for a slot
+_in_flight = {}  # model -> callers holding a slot
+_http_client = None
+_async_http_client = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_SECONDS
+    )
+
+
+def _get_http_clients() -> tuple:
+    """One keep-alive connection pool (sync + async) shared by every LLM client"""
+    global _http_client, _async_http_client
+    if _async_http_client is None:
+        _http_client = httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT_SECONDS)
+        _async_http_client = httpx.AsyncClient(limits=_limits(), timeout=LLM_TIMEOUT_SECONDS)
+    return _http_client, _async_http_client
+
+
+def get_llm(model: str = None, temperature: float = 0.05):  # Very low for consistency
+    """
+    Shared ChatOpenAI client for this model and temperature
+    ⚡ Built once per process; connections (and their TLS sessions) are kept alive
+    between requests instead of a new pool and handshake per request
+    - OPENAI_BASE_URL points every client at an OpenAI-compatible stand-in server
+    """
+    model = model or OPENAI_MODEL
+    key = (model, temperature)
+    llm = _clients.get(key)
+    if llm is None:
+        http_client, async_http_client = _get_http_clients()
+        llm = ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=OPENAI_BASE_URL,
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=LLM_MAX_RETRIES,
+            http_client=http_client,
+            http_async_client=async_http_client
+        )
+        _clients[key] = llm
+        log(f"🤖 LLM client ready: {model} (temperature {temperature})"
+              f"{f' via {OPENAI_BASE_URL}' if OPENAI_BASE_URL else ''}")
+    return llm
+
+
+def _model_name(llm) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or OPENAI_MODEL
+
+
+@asynccontextmanager
+async def llm_slot(llm):
+    """
+    Hold one of the LLM_MAX_CONCURRENCY request slots for this client's model
+    Bursts queue here instead of piling onto the API and tripping rate limits
+    """
+    model = _model_name(llm)
+    semaphore = _semaphores.get(model)
+    if semaphore is None:
+        semaphore = _semaphores[model] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+    _waiting[model] = _waiting.get(model, 0) + 1
+    try:
+        await semaphore.acquire()
+    finally:
+        _waiting[model] -= 1
+    _in_flight[model] = _in_flight.get(model, 0) + 1
+    try:
+        yield
+    finally:
+        _in_flight[model] -= 1
+        semaphore.release()
+
+
+def llm_client_stats() -> dict:
+    """Per-model in-flight and queued LLM requests for this process"""
+    return {
+        model: {
+            "in_flight": _in_flight.get(model, 0),
+            "waiting": _waiting.get(model, 0),
+            "limit": LLM_MAX_CONCURRENCY
+        }
+        for model in _semaphores
+    }
+
+
+async def close_llm_clients():
+    """Close the shared connection pool on shutdown"""
+    global _http_client, _async_http_client
+    _clients.clear()
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _http_client.close()
+        _http_client = None
+        _async_http_client = None
@@ -1,18 +1,14 @@
 # backend/services/llm_service.py
-import os
-import re
+from collections.abc import Mapping
 from dotenv import load_dotenv
 load_dotenv()
-from langchain_openai import ChatOpenAI
 from langchain.messages import HumanMessage, SystemMessage, AIMessage
-
-def get_llm():
-    """Initialize LLM with settings optimized for consistency"""
-    return ChatOpenAI(
-        model="gpt-4o",
-        temperature=0.05,  # Very low for consistency
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
+from .mermaid_parser import parse_mermaid
+from .mermaid_repair import repair_diagram
+from .llm_clients import get_llm, llm_slot
+from .llm_cache import cached_ainvoke, discard_cached_response, get_cached_response, store_response
+from .metrics import log, stage_timer
+from .executor import run_blocking
 
 def validate_diagram_completeness(mermaid_code: str, repo_data: dict) -> tuple:
     """Validate that diagram is comprehensive enough"""
@@ -54,32 +50,24 @@ def validate_diagram_completeness(mermaid_code: str, repo_data: dict) -> tuple:
     return len(issues) == 0, issues
 
 def validate_mermaid_syntax(mermaid_code: str) -> tuple:
-    """Validate Mermaid syntax and return errors if any"""
+    """Validate Mermaid syntax and return errors if any
+    Flowchart, sequence, class, ER and state diagrams go through the real parser,
+    other diagram types get the bracket-balance check"""
     errors = []
-    lines = mermaid_code.strip().split('\n')
+    code = mermaid_code.strip()
     
-    if not lines:
+    if not code:
         return False, ["Empty diagram code"]
     
-    first_line = lines[0].strip()
-    valid_types = [
-        'sequenceDiagram', 'graph', 'flowchart', 'classDiagram',
-        'erDiagram', 'stateDiagram', 'journey', 'gantt', 'mindmap',
-        'pie', 'gitGraph'
-    ]
-    
-    if not any(first_line.startswith(t) for t in valid_types):
-        errors.append(f"Invalid diagram type: {first_line[:50]}")
-        return False, errors
+    diagram = parse_mermaid(code)
+    if diagram.kind != "other":
+        return diagram.is_valid, [str(e) for e in diagram.errors]
     
-    for i, line in enumerate(lines[1:], 1):
+    for i, line in enumerate(code.split('\n')[1:], 1):
         line = line.strip()
         if not line or line.startswith('%%'):
             continue
         
-        if line.startswith('subgraph') or line == 'end':
-            continue
-        
         if line.count('[') != line.count(']'):
             errors.append(f"Line {i}: Unmatched brackets")
         if line.count('(') != line.count(')'):
@@ -90,47 +78,24 @@ def validate_mermaid_syntax(mermaid_code: str) -> tuple:
     return len(errors) == 0, errors
 
 def fix_mermaid_syntax(mermaid_code: str) -> str:
-    """Auto-fix common Mermaid syntax errors"""
-    code = mermaid_code.strip()
-    
-    if code.startswith("```mermaid"):
-        code = code.replace("```mermaid", "").replace("```", "").strip()
-    elif code.startswith("```"):
-        code = code.replace("```", "").strip()
-    
-    lines = code.split('\n')
-    fixed_lines = []
-    
-    for line in lines:
-        line = line.strip()
-        
-        if not line or line.startswith('%%'):
-            fixed_lines.append(line)
-            continue
-        
-        if line.startswith('subgraph') or line == 'end':
-            fixed_lines.append(line)
-            continue
-        
-        # Fix arrow syntax
-        line = re.sub(r'-{4,}>', '-->', line)
-        line = re.sub(r'\.{4,}>', '-..->', line)
-        line = line.replace('===>', '-->')
-        line = line.replace('....>', '-..->')
-        
-        # Fix node IDs with spaces - only before brackets
-        if '[' in line or '(' in line or '-->' in line or '-..->' in line:
-            parts = line.split('[', 1)
-            if len(parts) > 1:
-                before_bracket = parts[0]
-                before_bracket = re.sub(r'(\w+)\s+(\w+)(?=\s*$)', r'\1_\2', before_bracket)
-                line = before_bracket + '[' + parts[1]
-        
-        line = re.sub(r';+', ';', line)
-        
-        fixed_lines.append(line)
-    
-    return '\n'.join(fixed_lines)
+    """Auto-fix common Mermaid syntax errors (shared repair engine)"""
+    return repair_diagram(mermaid_code)["mermaid_code"]
+
+# (category, substrings of the lowercased path) for extract_detailed_repo_components
+COMPONENT_PATH_KEYWORDS = (
+    ('frontend_files', ('frontend', 'client')),
+    ('backend_files', ('backend', 'server')),
+    ('services', ('service',)),
+    ('routes', ('route', 'router')),
+    ('models', ('model', 'schema')),
+    ('components', ('component',)),
+    ('pages', ('page', 'view')),
+    ('utils', ('util', 'helper')),
+)
+CONFIG_EXTENSIONS = ('.json', '.yaml', '.yml', '.env', '.toml', '.ini')
+
+# Entries per categorized list in the chat context; the ones most relevant to the question come first
+CHAT_LIST_LIMIT = 40
 
 def extract_detailed_repo_components(repo_data: dict) -> dict:
     """Extract and categorize ALL components from repository"""
@@ -154,39 +119,34 @@ def extract_detailed_repo_components(repo_data: dict) -> dict:
     
     file_structure = repo_data.get('file_structure', {})
     
+    all_files = components['all_files']
+    folders = components['folders']
+    
     def traverse_structure(obj, path=""):
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                current_path = f"{path}/{key}" if path else key
-                
-                if isinstance(value, dict):
-                    components['folders'].append(current_path)
-                    traverse_structure(value, current_path)
-                else:
-                    components['all_files'].append(current_path)
-                    
-                    if 'frontend' in current_path.lower() or 'client' in current_path.lower():
-                        components['frontend_files'].append(current_path)
-                    if 'backend' in current_path.lower() or 'server' in current_path.lower():
-                        components['backend_files'].append(current_path)
-                    if 'service' in current_path.lower():
-                        components['services'].append(current_path)
-                    if 'route' in current_path.lower() or 'router' in current_path.lower():
-                        components['routes'].append(current_path)
-                    if 'model' in current_path.lower() or 'schema' in current_path.lower():
-                        components['models'].append(current_path)
-                    if 'component' in current_path.lower():
-                        components['components'].append(current_path)
-                    if 'page' in current_path.lower() or 'view' in current_path.lower():
-                        components['pages'].append(current_path)
-                    if 'util' in current_path.lower() or 'helper' in current_path.lower():
-                        components['utils'].append(current_path)
-                    if current_path.endswith(('.json', '.yaml', '.yml', '.env', '.toml', '.ini')):
-                        components['config_files'].append(current_path)
-                    if 'database' in current_path.lower() or 'db' in current_path.lower() or current_path.endswith('.sql'):
-                        components['database_files'].append(current_path)
-    
-    traverse_structure(file_structure)
+        for key, value in obj.items():
+            current_path = f"{path}/{key}" if path else key
+            
+            if isinstance(value, Mapping):
+                folders.append(current_path)
+                traverse_structure(value, current_path)
+            else:
+                all_files.append(current_path)
+    
+    if isinstance(file_structure, dict):
+        traverse_structure(file_structure)
+    
+    # Lowercase each path once, then test every category against it
+    for current_path in all_files:
+        path_lower = current_path.lower()
+        for category, keywords in COMPONENT_PATH_KEYWORDS:
+            for keyword in keywords:
+                if keyword in path_lower:
+                    components[category].append(current_path)
+                    break
+        if current_path.endswith(CONFIG_EXTENSIONS):
+            components['config_files'].append(current_path)
+        if 'database' in path_lower or 'db' in path_lower or current_path.endswith('.sql'):
+            components['database_files'].append(current_path)
     
     # Extract dependencies
     file_contents = repo_data.get('file_contents', {})
@@ -201,17 +161,49 @@ def extract_detailed_repo_components(repo_data: dict) -> dict:
     
     return components
 
-def analyze_repo_with_chat(repo_data: dict, question: str, chat_history: list = None) -> dict:
-    """Analyze repository with ENFORCED comprehensive diagram generation"""
-    llm = get_llm()
-    
+def build_chat_messages(repo_data: dict, question: str, chat_history: list = None) -> tuple:
+    """Build the system context + history + question messages for a chat turn
+    Returns (messages, components)"""
     if chat_history is None:
         chat_history = []
     
     from .github_service import format_file_structure, format_file_contents
+    from .symbol_extractor import format_symbol_graph
+    from .context_packer import pack_lines, CONTEXT_TOKEN_BUDGET, TREE_BUDGET_SHARE, SYMBOL_BUDGET_SHARE
+    from .retrieval import retrieve_context
     
     components = extract_detailed_repo_components(repo_data)
     
+    # Code excerpts picked for this question (a follow-up also searches with the previous question)
+    previous = [msg.get('content', '') for msg in chat_history[-10:] if msg.get('role') == 'user']
+    retrieved = retrieve_context(repo_data, " ".join([question] + previous[-1:]))
+    relevance = {path: rank for rank, path in enumerate(retrieved['files'])}
+    log(f"🔎 Retrieved {retrieved['chunks']} chunks from {len(retrieved['files'])} files "
+        f"({retrieved['tokens']} tokens, {retrieved['matched']} matching the question)")
+    
+    def listing(paths: list) -> str:
+        relevant = sorted((path for path in paths if path in relevance), key=relevance.get)
+        shown = (relevant + [path for path in paths if path not in relevance])[:CHAT_LIST_LIMIT]
+        lines = ['   - ' + path for path in shown]
+        if len(paths) > CHAT_LIST_LIMIT:
+            lines.append(f"   ... ({len(paths) - CHAT_LIST_LIMIT} more)")
+        return "\n".join(lines)
+    
+    # Tree and symbol graph get the same budget shares as the diagram context; relevant files lead the graph
+    tree_text, _, _ = pack_lines(format_file_structure(repo_data.get('file_structure', {})),
+                                 int(CONTEXT_TOKEN_BUDGET * TREE_BUDGET_SHARE), "tree entries")
+    symbols = repo_data.get('symbols') or {}
+    symbol_files = symbols.get('files', {})
+    focused_symbols = dict(symbols, files={
+        path: symbol_files[path]
+        for path in sorted(symbol_files, key=lambda path: relevance.get(path, len(relevance)))
+    })
+    symbol_text, _, _ = pack_lines(format_symbol_graph(focused_symbols),
+                                   int(CONTEXT_TOKEN_BUDGET * SYMBOL_BUDGET_SHARE), "symbol lines")
+    # Without a retrieval index (older analyses) fall back to the first files; the symbol graph carries the structure
+    code_text = retrieved['text'] or format_file_contents(repo_data.get('file_contents', {}),
+                                                          max_files=20 if symbol_text else 60)
+    
     # Build ultra-comprehensive context
     context = f"""
 ==============================================================================
@@ -226,52 +218,57 @@ Stars: {repo_data.get('stars', 0)} | Forks: {repo_data.get('forks', 0)}
 ==============================================================================
 COMPLETE FILE STRUCTURE (USE ALL OF THIS):
 ==============================================================================
-{format_file_structure(repo_data.get('file_structure', {}))}
+{tree_text}
 
 ==============================================================================
 CATEGORIZED COMPONENTS (INCLUDE ALL IN DIAGRAM):
 ==============================================================================
 
 📁 ALL FOLDERS ({len(components['folders'])} total):
-{chr(10).join('   - ' + f for f in components['folders'])}
+{listing(components['folders'])}
 
 📄 ALL FILES ({len(components['all_files'])} total):
-{chr(10).join('   - ' + f for f in components['all_files'][:50])}
+{listing(components['all_files'])}
 
 🎨 FRONTEND FILES ({len(components['frontend_files'])}):
-{chr(10).join('   - ' + f for f in components['frontend_files'])}
+{listing(components['frontend_files'])}
 
 ⚙️ BACKEND FILES ({len(components['backend_files'])}):
-{chr(10).join('   - ' + f for f in components['backend_files'])}
+{listing(components['backend_files'])}
 
 🔧 SERVICES ({len(components['services'])}):
-{chr(10).join('   - ' + f for f in components['services'])}
+{listing(components['services'])}
 
 🛣️ ROUTES/API ({len(components['routes'])}):
-{chr(10).join('   - ' + f for f in components['routes'])}
+{listing(components['routes'])}
 
 📊 MODELS ({len(components['models'])}):
-{chr(10).join('   - ' + f for f in components['models'])}
+{listing(components['models'])}
 
 🧩 COMPONENTS ({len(components['components'])}):
-{chr(10).join('   - ' + f for f in components['components'])}
+{listing(components['components'])}
 
 📄 PAGES ({len(components['pages'])}):
-{chr(10).join('   - ' + f for f in components['pages'])}
+{listing(components['pages'])}
 
 🛠️ UTILITIES ({len(components['utils'])}):
-{chr(10).join('   - ' + f for f in components['utils'])}
+{listing(components['utils'])}
 
 ⚙️ CONFIG FILES ({len(components['config_files'])}):
-{chr(10).join('   - ' + f for f in components['config_files'])}
+{listing(components['config_files'])}
 
 💾 DATABASE FILES ({len(components['database_files'])}):
-{chr(10).join('   - ' + f for f in components['database_files'])}
+{listing(components['database_files'])}
 
 ==============================================================================
-FILE CONTENTS (ACTUAL CODE):
+SYMBOLS, ROUTES, IMPORTS AND CALLS (PARSED FROM THE CODE):
 ==============================================================================
-{format_file_contents(repo_data.get('file_contents', {}))}
+{symbol_text or 'Not available'}
+
+==============================================================================
+CODE RELEVANT TO THIS QUESTION (ACTUAL CODE):
+==============================================================================
+{code_text}
 
 ==============================================================================
 MANDATORY DIAGRAM REQUIREMENTS - YOU MUST FOLLOW:
@@ -403,22 +400,30 @@ NOW CREATE YOUR COMPREHENSIVE DIAGRAM USING ALL THE DATA ABOVE!
     
     messages.append(HumanMessage(content=question))
     
+    return messages, components
+
+async def analyze_repo_with_chat(repo_data: dict, question: str, chat_history: list = None,
+                                 use_cache: bool = True) -> dict:
+    """Analyze repository with ENFORCED comprehensive diagram generation"""
+    llm = get_llm()
+    with stage_timer("context_build"):
+        messages, components = await run_blocking(build_chat_messages, repo_data, question, chat_history)
+    
     # Retry with enforcement
     max_retries = 3
     attempt = 0
     
     while attempt < max_retries:
         try:
-            print(f"\n🎨 Generating diagram (attempt {attempt + 1}/{max_retries})...")
+            log(f"\n🎨 Generating diagram (attempt {attempt + 1}/{max_retries})...")
             
-            response = llm.invoke(messages)
+            response = await cached_ainvoke(llm, messages, use_cache=use_cache)
             answer_text = response.content
             
             answer, mermaid_code, diagram_type = extract_diagram_from_response(answer_text)
             
             if mermaid_code:
-                mermaid_code = fix_mermaid_syntax(mermaid_code)
-                
+                # extract_diagram_from_response already repaired what it could locally
                 # Validate syntax
                 is_valid_syntax, syntax_errors = validate_mermaid_syntax(mermaid_code)
                 
@@ -426,7 +431,7 @@ NOW CREATE YOUR COMPREHENSIVE DIAGRAM USING ALL THE DATA ABOVE!
                 is_complete, completeness_issues = validate_diagram_completeness(mermaid_code, repo_data)
                 
                 if not is_valid_syntax and attempt < max_retries - 1:
-                    print(f"   ❌ Syntax errors: {syntax_errors}")
+                    log(f"   ❌ Syntax errors: {syntax_errors}")
                     error_msg = f"""
 SYNTAX ERRORS FOUND: {', '.join(syntax_errors[:3])}
 
@@ -437,13 +442,14 @@ FIX THESE ISSUES:
 
 REGENERATE with correct syntax.
 """
+                    discard_cached_response(llm, messages)
                     messages.append(AIMessage(content=answer_text))
                     messages.append(HumanMessage(content=error_msg))
                     attempt += 1
                     continue
                 
                 if not is_complete and attempt < max_retries - 1:
-                    print(f"   ⚠️ Incompleteness issues: {completeness_issues}")
+                    log(f"   ⚠️ Incompleteness issues: {completeness_issues}")
                     error_msg = f"""
 DIAGRAM TOO SIMPLE: {', '.join(completeness_issues)}
 
@@ -456,12 +462,13 @@ YOU MUST:
 
 REGENERATE with COMPREHENSIVE, detailed diagram including 30-50 components.
 """
+                    discard_cached_response(llm, messages)
                     messages.append(AIMessage(content=answer_text))
                     messages.append(HumanMessage(content=error_msg))
                     attempt += 1
                     continue
                 
-                print(f"   ✅ Diagram validated successfully!")
+                log(f"   ✅ Diagram validated successfully!")
             
             follow_ups = generate_follow_up_questions(answer, mermaid_code is not None, diagram_type)
             
@@ -475,7 +482,8 @@ REGENERATE with COMPREHENSIVE, detailed diagram including 30-50 components.
             }
         
         except Exception as e:
-            print(f"   ❌ Error: {str(e)}")
+            log(f"   ❌ Error: {str(e)}")
+            discard_cached_response(llm, messages)
             if attempt < max_retries - 1:
                 attempt += 1
                 continue
@@ -498,13 +506,130 @@ REGENERATE with COMPREHENSIVE, detailed diagram including 30-50 components.
         "repo_name": repo_data.get('name', 'Unknown')
     }
 
+class DiagramStreamSplitter:
+    """
+    Split streamed answer text into plain tokens and a [DIAGRAM_START]/[DIAGRAM_END] block
+    Text that might be the beginning of a marker is held back until it can be classified,
+    and the diagram is only released once its closing marker has arrived.
+    """
+    
+    START = "[DIAGRAM_START]"
+    END = "[DIAGRAM_END]"
+    
+    def __init__(self):
+        self.pending = ""
+        self.in_diagram = False
+        self.diagram_done = False
+    
+    def _split_safe(self, marker: str) -> tuple:
+        """Return (text safe to release, text to hold) for a marker that may be split across chunks"""
+        for keep in range(min(len(marker) - 1, len(self.pending)), 0, -1):
+            if marker.startswith(self.pending[-keep:]):
+                return self.pending[:-keep], self.pending[-keep:]
+        return self.pending, ""
+    
+    def feed(self, text: str) -> list:
+        """Consume a chunk and return a list of (event, payload) pairs ready to emit"""
+        events = []
+        self.pending += text
+        
+        while True:
+            if self.in_diagram:
+                if self.END not in self.pending:
+                    break
+                end_idx = self.pending.index(self.END)
+                raw_code = self.pending[:end_idx].strip()
+                self.pending = self.pending[end_idx + len(self.END):]
+                self.in_diagram = False
+                self.diagram_done = True
+                
+                mermaid_code = clean_mermaid_code(raw_code)
+                events.append(("diagram", {
+                    "mermaid_code": mermaid_code,
+                    "diagram_type": detect_diagram_type(mermaid_code)
+                }))
+            elif not self.diagram_done and self.START in self.pending:
+                start_idx = self.pending.index(self.START)
+                if start_idx:
+                    events.append(("token", {"text": self.pending[:start_idx]}))
+                self.pending = self.pending[start_idx + len(self.START):]
+                self.in_diagram = True
+            else:
+                safe, held = self._split_safe(self.START) if not self.diagram_done else (self.pending, "")
+                if safe:
+                    events.append(("token", {"text": safe}))
+                self.pending = held
+                break
+        
+        return events
+    
+    def close(self) -> list:
+        """Flush anything still held back once the stream ends"""
+        events = []
+        if self.pending and not self.in_diagram:
+            events.append(("token", {"text": self.pending}))
+        self.pending = ""
+        return events
+
+async def stream_repo_chat(repo_data: dict, question: str, chat_history: list = None,
+                           use_cache: bool = True):
+    """
+    Stream a chat answer as (event, payload) pairs
+    - token: answer text as it arrives
+    - diagram: the cleaned diagram once [DIAGRAM_END] closes
+    - done: final answer/diagram/follow-ups, same shape as analyze_repo_with_chat
+    No LLM retries here: tokens already sent can't be taken back, so the diagram is
+    repaired locally with clean_mermaid_code instead.
+    A cached answer is replayed as a single token event.
+    """
+    llm = get_llm()
+    with stage_timer("context_build"):
+        messages, components = await run_blocking(build_chat_messages, repo_data, question, chat_history)
+    splitter = DiagramStreamSplitter()
+    chunks = []
+    
+    cached = get_cached_response(llm, messages) if use_cache else None
+    if cached is not None:
+        log(f"⚡ LLM cache hit")
+        chunks.append(cached)
+        for event in splitter.feed(cached):
+            yield event
+    else:
+        with stage_timer("llm_stream"):
+            async with llm_slot(llm):
+                async for chunk in llm.astream(messages):
+                    text = chunk.content or ""
+                    if not text:
+                        continue
+                    chunks.append(text)
+                    for event in splitter.feed(text):
+                        yield event
+        store_response(llm, messages, "".join(chunks))
+    
+    for event in splitter.close():
+        yield event
+    
+    answer, mermaid_code, diagram_type = extract_diagram_from_response("".join(chunks))
+    
+    yield ("done", {
+        "answer": answer,
+        "mermaid_code": mermaid_code,
+        "diagram_type": diagram_type,
+        "has_diagram": mermaid_code is not None,
+        "follow_up_questions": generate_follow_up_questions(answer, mermaid_code is not None, diagram_type),
+        "repo_name": repo_data.get('name', 'Unknown')
+    })
+
 def clean_mermaid_code(mermaid_code: str) -> str:
-    """Clean and validate Mermaid code"""
-    cleaned = fix_mermaid_syntax(mermaid_code)
-    is_valid, errors = validate_mermaid_syntax(cleaned)
-    if not is_valid:
-        print(f"Validation warnings: {', '.join(errors)}")
-    return cleaned
+    """Clean, locally repair and validate Mermaid code
+    ⚡ Parser-driven repair fixes most syntax errors without another LLM round trip"""
+    with stage_timer("repair"):
+        result = repair_diagram(mermaid_code)
+    if result["fixes"]:
+        log(f"🔧 Repaired {len(result['fixes'])} syntax problem(s) locally")
+    if result["errors"]:
+        log(f"Validation warnings: {', '.join(result['errors'])}")
+    return result["mermaid_code"]
 
 def detect_diagram_type(mermaid_code: str) -> str:
     """Detect the type of Mermaid diagram"""
@@ -529,19 +654,20 @@ def extract_diagram_from_response(response_text: str) -> tuple:
     diagram_type = None
     answer = response_text.strip()
     
-    if "[DIAGRAM_START]" in answer and "[DIAGRAM_END]" in answer:
+    marker_idx = answer.find("[DIAGRAM_START]")
+    end_idx = answer.find("[DIAGRAM_END]")
+    if marker_idx != -1 and end_idx != -1:
         try:
-            start_idx = answer.index("[DIAGRAM_START]") + len("[DIAGRAM_START]")
-            end_idx = answer.index("[DIAGRAM_END]")
+            start_idx = marker_idx + len("[DIAGRAM_START]")
             raw_code = answer[start_idx:end_idx].strip()
             
             mermaid_code = clean_mermaid_code(raw_code)
             diagram_type = detect_diagram_type(mermaid_code)
             
-            answer = answer[:answer.index("[DIAGRAM_START]")].strip()
+            answer = answer[:marker_idx].strip()
             
         except Exception as e:
-            print(f"Error extracting diagram: {e}")
+            log(f"Error extracting diagram: {e}")
             mermaid_code = None
             diagram_type = None
     
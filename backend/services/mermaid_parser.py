@@ -0,0 +1,1130 @@
+# backend/services/mermaid_parser.py - MERMAID PARSER, AST & LOCAL REPAIR
+import re
+
+# Diagram headers the parser understands statement by statement
+PARSED_HEADERS = [
+    ("flowchart", re.compile(r'^(?:flowchart|graph|flowchart-elk)\b')),
+    ("sequence", re.compile(r'^sequenceDiagram\b')),
+    ("class", re.compile(r'^classDiagram(?:-v2)?\b')),
+    ("er", re.compile(r'^erDiagram\b')),
+    ("state", re.compile(r'^stateDiagram(?:-v2)?\b')),
+]
+
+# Headers Mermaid accepts but we only check for brackets
+OTHER_HEADERS = (
+    'journey', 'gantt', 'mindmap', 'pie', 'gitGraph', 'timeline', 'quadrantChart',
+    'requirementDiagram', 'C4Context', 'C4Container', 'C4Component', 'C4Dynamic',
+    'C4Deployment', 'sankey-beta', 'xychart-beta', 'block-beta'
+)
+
+FLOW_DIRECTIONS = {"TB", "TD", "BT", "RL", "LR"}
+
+
+class MermaidError:
+    """One problem found by the parser (1-based line/column) and whether a local fix exists"""
+
+    def __init__(self, line: int, column: int, message: str, fixable: bool = False):
+        self.line = line
+        self.column = column
+        self.message = message
+        self.fixable = fixable
+
+    def __str__(self):
+        return f"Line {self.line}, col {self.column}: {self.message}"
+
+    def __repr__(self):
+        return f"MermaidError({self})"
+
+
+class MermaidDiagram:
+    """
+    Parsed diagram: header, statements, node/edge view, errors and pending fixes
+    Statements are dicts with at least "type" and "line"; nodes map id -> info;
+    edges are {"source", "target", "arrow", "label", "line"} for every diagram kind.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.lines = source.split("\n")
+        self.kind = None  # flowchart, sequence, class, er, state, other or None
+        self.header = None
+        self.header_line = None
+        self.header_prefix = None  # 'graph TD;' when statements share the header line
+        self.direction = None
+        self.statements = []
+        self.nodes = {}
+        self.edges = []
+        self.errors = []
+        self.line_fixes = {}  # line number -> replacement text (None deletes the line)
+        self.prepend = []
+        self.append = []
+
+    @property
+    def supported(self) -> bool:
+        return self.kind in PARSERS
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.errors
+
+    @property
+    def has_fixes(self) -> bool:
+        return bool(self.line_fixes or self.prepend or self.append)
+
+    def error(self, line: int, column: int, message: str, fixable: bool = False):
+        self.errors.append(MermaidError(line, column, message, fixable))
+
+    def fix_line(self, line: int, text):
+        if line == self.header_line and self.header_prefix is not None:
+            text = self.header_prefix + (" " + text.strip() if text else "")
+        self.line_fixes[line] = text
+
+    def add_node(self, node_id: str, line: int, label: str = None, shape: str = None):
+        node = self.nodes.get(node_id)
+        if node is None:
+            self.nodes[node_id] = {"label": label or node_id, "shape": shape, "line": line}
+        elif label:
+            node["label"] = label
+            node["shape"] = shape
+
+    def add_edge(self, source: str, target: str, arrow: str, label: str, line: int):
+        self.edges.append({"source": source, "target": target, "arrow": arrow, "label": label, "line": line})
+
+    def apply_fixes(self) -> str:
+        """Source with every pending line fix applied"""
+        lines = []
+        for number, text in enumerate(self.lines, 1):
+            if number in self.line_fixes:
+                if self.line_fixes[number] is not None:
+                    lines.append(self.line_fixes[number])
+            else:
+                lines.append(text)
+        return "\n".join(self.prepend + lines + self.append)
+
+
+def _split_indent(raw: str) -> tuple:
+    text = raw.strip()
+    indent = raw[:len(raw) - len(raw.lstrip())]
+    return indent, text
+
+
+def _needs_quotes(label: str, extra: str = "") -> bool:
+    """Unquoted label text Mermaid's lexer would trip over"""
+    if label.startswith('"') and label.endswith('"') and len(label) >= 2:
+        return False
+    return any(ch in label for ch in '()[]{}";' + extra)
+
+
+def _quote(label: str) -> str:
+    return '"' + label.strip().strip('"').replace('"', '#quot;') + '"'
+
+
+def _identifier(words: str) -> str:
+    """Turn 'user service' into 'user_service'"""
+    return re.sub(r'\W+', '_', words.strip()).strip('_') or "node"
+
+
+# ============================================================
+# FLOWCHART
+# ============================================================
+
+NODE_ID = re.compile(r'\w+(?:[.\-]\w+)*')
+
+# (opener, closers, shape) - longest openers first
+NODE_SHAPES = [
+    ("(((", (")))",), "double_circle"),
+    ("([", ("])",), "stadium"),
+    ("[[", ("]]",), "subroutine"),
+    ("[(", (")]",), "cylinder"),
+    ("((", ("))",), "circle"),
+    ("{{", ("}}",), "hexagon"),
+    ("[/", ("/]", "\\]"), "parallelogram"),
+    ("[\\", ("\\]", "/]"), "parallelogram_alt"),
+    ("[", ("]",), "rect"),
+    ("(", (")",), "round"),
+    ("{", ("}",), "rhombus"),
+    (">", ("]",), "asymmetric"),
+]
+SINGLE_OPENER = {"[": ("]",), "(": (")",), "{": ("}",)}
+
+FLOW_EDGE = re.compile(r'<?-{2,}[>ox]|-{3,}|<?-\.+-[>ox]?|<?={2,}[>ox]|={3,}|~{3,}')
+FLOW_TEXT_EDGE = re.compile(r'(--|-\.|==)\s+(.+?)\s+(-{2,}>|-{3,}|\.-+>|\.-|={2,}>|={3,})')
+
+# Arrows LLMs write that Mermaid flowcharts don't accept -> replacement
+FLOW_ARROW_FIXES = [
+    (re.compile(r'-{1,}>>+'), '-->'),
+    (re.compile(r'={1,}>>+'), '==>'),
+    (re.compile(r'-\.+>'), '-.->'),
+    (re.compile(r'\.{2,}-*>'), '-.->'),
+    (re.compile(r'=>'), '==>'),
+    (re.compile(r'->'), '-->'),
+    (re.compile(r'(?:[—–]+>|→|⟶)'), '-->'),
+]
+
+# Mermaid 11 node data 'id@{ shape: rect, label: "..." }' and edge ids 'a e1@--> b' (kept as written)
+NODE_DATA_SHAPE = re.compile(r'\bshape:\s*([\w-]+)')
+NODE_DATA_LABEL = re.compile(r'\blabel:\s*"([^"]*)"')
+EDGE_ID = re.compile(r'\w+@(?=[-=~<.])')
+
+FLOW_DIRECTIVE = re.compile(r'^(classDef|class|style|linkStyle|click|accTitle|accDescr|direction)\b')
+
+
+def _split_statements(text: str) -> list:
+    """Split on ';' outside quotes and brackets. Returns [(offset, statement)]"""
+    statements, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(text):
+        if ch == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif ch in '([{':
+            depth += 1
+        elif ch in ')]}':
+            depth = max(0, depth - 1)
+        elif ch == ';' and depth == 0:
+            statements.append((start, text[start:i]))
+            start = i + 1
+    statements.append((start, text[start:]))
+    return [(offset, s) for offset, s in statements if s.strip()]
+
+
+def _scan_label(text: str, pos: int, closers: tuple) -> tuple:
+    """
+    Find where a node label ends
+    Returns (label, position after closer, closer); closer is None when the label never closes
+    """
+    if text.startswith('"', pos):
+        end = text.find('"', pos + 1)
+        if end != -1:
+            for closer in closers:
+                if text.startswith(closer, end + 1):
+                    return text[pos:end + 1], end + 1 + len(closer), closer
+
+    pairs = {'(': ')', '[': ']', '{': '}'}
+    stack = []
+    i = pos
+    while i < len(text):
+        if not stack:
+            for closer in closers:
+                if text.startswith(closer, i):
+                    return text[pos:i], i + len(closer), closer
+        ch = text[i]
+        if ch == '"':
+            end = text.find('"', i + 1)
+            i = end + 1 if end != -1 else len(text)
+            continue
+        if ch in pairs:
+            stack.append(pairs[ch])
+        elif stack and ch == stack[-1]:
+            stack.pop()
+        i += 1
+
+    # Unbalanced brackets inside the label: settle for the first closer, unless an
+    # arrow comes first - then the label was never closed and runs up to the arrow
+    arrow = re.search(r'\s(?:-{2,}|={2,}|-\.)', text[pos:])
+    arrow_at = pos + arrow.start() if arrow else len(text)
+    for closer in closers:
+        end = text.find(closer, pos)
+        if end != -1 and end < arrow_at:
+            return text[pos:end], end + len(closer), closer
+
+    return text[pos:arrow_at].rstrip(), arrow_at, None
+
+
+def _scan_node_data(text: str, pos: int) -> int:
+    """End of the '@{ ... }' block starting at pos (after its '}'), or -1 when it never closes"""
+    depth = 0
+    i = pos + 1
+    while i < len(text):
+        ch = text[i]
+        if ch == '"':
+            end = text.find('"', i + 1)
+            if end == -1:
+                return -1
+            i = end
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return -1
+
+
+class _FlowStatement:
+    """Cursor over one flowchart statement that re-renders it as it parses"""
+
+    def __init__(self, diagram: MermaidDiagram, line: int, text: str, column: int):
+        self.diagram = diagram
+        self.line = line
+        self.text = text
+        self.column = column  # column of text[0] in the source line
+        self.pos = 0
+        self.parts = []
+        self.fixed = False
+        self.failed = False
+
+    def col(self, pos: int = None) -> int:
+        return self.column + (self.pos if pos is None else pos)
+
+    def skip_spaces(self):
+        while self.pos < len(self.text) and self.text[self.pos] in ' \t':
+            self.pos += 1
+
+    def error(self, message: str, fixable: bool, pos: int = None):
+        self.diagram.error(self.line, self.col(pos), message, fixable)
+        if fixable:
+            self.fixed = True
+        else:
+            self.failed = True
+
+    def parse_node(self) -> str:
+        """Parse 'id', 'id[label]', 'id:::cls' ... and return the node id"""
+        self.skip_spaces()
+        start = self.pos
+        match = NODE_ID.match(self.text, self.pos)
+        if not match:
+            self.error(f"Expected a node id, found '{self.text[self.pos:self.pos + 10]}'", False)
+            return None
+
+        node_id = match.group(0)
+        self.pos = match.end()
+
+        # 'user service[...]' - ids can't contain spaces
+        words = [node_id]
+        while True:
+            lookahead = re.match(r'[ \t]+(\w+(?:[.\-]\w+)*)', self.text[self.pos:])
+            if not lookahead or FLOW_EDGE.match(self.text, self.pos + lookahead.start(1)) \
+                    or EDGE_ID.match(self.text, self.pos + lookahead.start(1)):
+                break
+            following = self.text[self.pos + lookahead.end():].lstrip()
+            if lookahead.group(1) in ("o", "x") and following[:1] not in ("", "[", "(", "{", ">"):
+                break
+            words.append(lookahead.group(1))
+            self.pos += lookahead.end()
+        if len(words) > 1:
+            node_id = _identifier(" ".join(words))
+            self.error(f"Node id '{' '.join(words)}' contains spaces", True, start)
+
+        if node_id == "end":
+            self.error("'end' can't be used as a node id", True, start)
+            node_id = "end_node"
+
+        rendered = node_id
+        if self.text.startswith(":::", self.pos):
+            cls = re.match(r':::\w+', self.text[self.pos:])
+            if cls:
+                rendered += cls.group(0)
+                self.pos += cls.end()
+
+        label, shape = None, None
+        if self.text.startswith("@{", self.pos):
+            end = _scan_node_data(self.text, self.pos)
+            if end == -1:
+                self.error(f"Unclosed '@{{' in node '{node_id}'", False, self.pos)
+                return None
+            data = self.text[self.pos:end]
+            shape_match, label_match = NODE_DATA_SHAPE.search(data), NODE_DATA_LABEL.search(data)
+            shape = shape_match.group(1) if shape_match else None
+            label = label_match.group(1) if label_match else None
+            rendered += data
+            self.pos = end
+            cls = re.match(r':::\w+', self.text[self.pos:])
+            if cls:
+                rendered += cls.group(0)
+                self.pos += cls.end()
+
+        for opener, closers, shape_name in NODE_SHAPES if shape is None and label is None else ():
+            if not self.text.startswith(opener, self.pos):
+                continue
+            label_start = self.pos + len(opener)
+            label, end, closer = _scan_label(self.text, label_start, closers)
+
+            # '[/api/users]' isn't a parallelogram; fall back to the plain bracket
+            if closer is None and len(opener) > 1 and opener[0] in SINGLE_OPENER:
+                opener, closers, shape_name = opener[0], SINGLE_OPENER[opener[0]], "rect"
+                label_start = self.pos + 1
+                label, end, closer = _scan_label(self.text, label_start, closers)
+
+            shape = shape_name
+            new_label = label
+            if closer is None:
+                self.error(f"Unclosed '{opener}' in node '{node_id}'", True, self.pos)
+                closer = closers[0]
+                new_label = _quote(label) if _needs_quotes(label) else label.strip()
+            elif not label.strip():
+                self.error(f"Empty label for node '{node_id}'", True, self.pos)
+                new_label = _quote(node_id)
+            elif _needs_quotes(label) or (opener == "[" and label[:1] in "/\\"):
+                self.error(f"Label of '{node_id}' has special characters and must be quoted", True, label_start)
+                new_label = _quote(label)
+
+            rendered += opener + new_label + closer
+            label = new_label.strip('"')
+            self.pos = end
+            if self.text.startswith(":::", self.pos):
+                cls = re.match(r':::\w+', self.text[self.pos:])
+                if cls:
+                    rendered += cls.group(0)
+                    self.pos += cls.end()
+            break
+
+        self.diagram.add_node(node_id, self.line, label, shape)
+        self.parts.append(rendered)
+        return node_id
+
+    def parse_group(self) -> list:
+        """Parse 'a & b & c'"""
+        ids = [self.parse_node()]
+        while not self.failed:
+            self.skip_spaces()
+            if not self.text.startswith("&", self.pos):
+                break
+            self.pos += 1
+            self.parts.append("&")
+            ids.append(self.parse_node())
+        return [i for i in ids if i]
+
+    def parse_edge(self) -> tuple:
+        """Parse an arrow with an optional label; returns (arrow, label) or (None, None) at the end"""
+        self.skip_spaces()
+        if self.pos >= len(self.text):
+            return None, None
+
+        start = self.pos
+        label = None
+        edge_id = EDGE_ID.match(self.text, self.pos)
+        if edge_id:
+            self.pos = edge_id.end()
+        match = FLOW_TEXT_EDGE.match(self.text, self.pos)
+        if match:
+            head = match.group(3).endswith(">")
+            arrow = {"--": ("-->", "---"), "-.": ("-.->", "-.-"), "==": ("==>", "===")}[match.group(1)][0 if head else 1]
+            label = match.group(2)
+            self.pos = match.end()
+        else:
+            arrow = None
+            for pattern, replacement in FLOW_ARROW_FIXES:
+                bad = pattern.match(self.text, self.pos)
+                if bad:
+                    self.error(f"Invalid arrow '{bad.group(0)}', use '{replacement}'", True)
+                    arrow = replacement
+                    self.pos = bad.end()
+                    break
+            if arrow is None:
+                good = FLOW_EDGE.match(self.text, self.pos)
+                if not good:
+                    self.error(f"Expected an arrow, found '{self.text[self.pos:self.pos + 10]}'", False)
+                    return None, None
+                arrow = good.group(0)
+                self.pos = good.end()
+
+        self.skip_spaces()
+        if label is None and self.text.startswith("|", self.pos):
+            end = self.text.find("|", self.pos + 1)
+            if end == -1:
+                self.error("Unclosed '|' in edge label", False)
+                return None, None
+            label = self.text[self.pos + 1:end]
+            self.pos = end + 1
+
+        rendered = (edge_id.group(0) if edge_id else "") + arrow
+        if label is not None:
+            if _needs_quotes(label):
+                self.error("Edge label has special characters and must be quoted", True, start)
+                label = _quote(label)
+            rendered += f"|{label.strip()}|"
+        self.parts.append(rendered)
+        return arrow, (label.strip('"') if label else None)
+
+    def parse_chain(self):
+        sources = self.parse_group()
+        while not self.failed:
+            arrow, label = self.parse_edge()
+            if arrow is None:
+                break
+            targets = self.parse_group()
+            if self.failed:
+                break
+            for source in sources:
+                for target in targets:
+                    self.diagram.add_edge(source, target, arrow, label, self.line)
+            sources = targets
+
+    def render(self) -> str:
+        return " ".join(self.parts)
+
+
+def _parse_flowchart(diagram: MermaidDiagram, body: list):
+    header = diagram.header.split(";", 1)[0].split()
+    if len(header) > 1:
+        if header[1] in FLOW_DIRECTIONS:
+            diagram.direction = header[1]
+        else:
+            diagram.error(diagram.header_line, len(header[0]) + 2, f"Unknown direction '{header[1]}'", True)
+            if diagram.header_prefix is not None:
+                diagram.header_prefix = f"{header[0]} TD;"
+                diagram.line_fixes.setdefault(diagram.header_line, diagram.lines[diagram.header_line - 1])
+                prefix_end = diagram.line_fixes[diagram.header_line].index(";") + 1
+                diagram.line_fixes[diagram.header_line] = (
+                    diagram.header_prefix + diagram.line_fixes[diagram.header_line][prefix_end:]
+                )
+            else:
+                diagram.fix_line(diagram.header_line, f"{header[0]} TD")
+    diagram.direction = diagram.direction or "TB"
+
+    subgraphs = []  # (id, line)
+    subgraph_ids = {}
+
+    for number, raw in body:
+        indent, text = _split_indent(raw)
+        rendered = []
+        line_fixed = False
+        line_failed = False
+
+        for offset, statement in _split_statements(text):
+            column = len(indent) + offset + len(statement) - len(statement.lstrip()) + 1
+            statement = statement.strip()
+            keyword = statement.split(None, 1)[0]
+
+            if keyword == "subgraph":
+                title = statement[len("subgraph"):].strip()
+                new_statement = statement
+                if not title:
+                    diagram.error(number, column, "Subgraph needs an id or title", True)
+                    title = f"group_{number}"
+                    new_statement = f"subgraph {title}"
+                    line_fixed = True
+                labelled = re.match(r'^(.+?)\s*\[(.*)\]$', title)
+                if labelled:
+                    sub_id, sub_label = labelled.group(1), labelled.group(2)
+                    if not NODE_ID.fullmatch(sub_id):
+                        diagram.error(number, column, f"Subgraph id '{sub_id}' contains spaces", True)
+                        sub_id = _identifier(sub_id)
+                        line_fixed = True
+                    if _needs_quotes(sub_label):
+                        diagram.error(number, column, "Subgraph title has special characters and must be quoted", True)
+                        sub_label = _quote(sub_label)
+                        line_fixed = True
+                    new_statement = f"subgraph {sub_id}[{sub_label}]"
+                else:
+                    sub_id = title.strip('"')
+                subgraphs.append((sub_id, number))
+                subgraph_ids.setdefault(sub_id, (number, indent, new_statement))
+                diagram.statements.append({"type": "subgraph", "line": number, "id": sub_id})
+                rendered.append(new_statement)
+                continue
+
+            if statement == "end":
+                if not subgraphs:
+                    diagram.error(number, column, "'end' without an open subgraph", True)
+                    line_fixed = True
+                    continue
+                subgraphs.pop()
+                diagram.statements.append({"type": "end", "line": number})
+                rendered.append(statement)
+                continue
+
+            if FLOW_DIRECTIVE.match(statement):
+                if keyword == "direction":
+                    parts = statement.split()
+                    if len(parts) != 2 or parts[1] not in FLOW_DIRECTIONS:
+                        diagram.error(number, column, f"Invalid direction statement '{statement}'", True)
+                        statement = "direction TB"
+                        line_fixed = True
+                diagram.statements.append({"type": "directive", "line": number, "keyword": keyword})
+                rendered.append(statement)
+                continue
+
+            cursor = _FlowStatement(diagram, number, statement, column)
+            cursor.parse_chain()
+            if not cursor.failed and cursor.pos < len(statement):
+                cursor.error(f"Unexpected text '{statement[cursor.pos:cursor.pos + 20]}'", False)
+            diagram.statements.append({"type": "chain", "line": number})
+            line_fixed = line_fixed or cursor.fixed
+            line_failed = line_failed or cursor.failed
+            rendered.append(cursor.render() if cursor.fixed and not cursor.failed else statement)
+
+        if line_failed:
+            # Fixes on a line that still doesn't parse are never applied
+            for error in diagram.errors:
+                if error.line == number:
+                    error.fixable = False
+        elif line_fixed:
+            diagram.fix_line(number, indent + "; ".join(rendered) if rendered else None)
+
+    for sub_id, number in subgraphs:
+        diagram.error(number, 1, f"Subgraph '{sub_id}' is never closed with 'end'", True)
+        diagram.append.append("end")
+
+    # A subgraph sharing an id with a shaped node makes Mermaid report a cycle
+    # (plain references like 'A --> Backend' legitimately point at the subgraph)
+    for sub_id, (number, indent, statement) in subgraph_ids.items():
+        if diagram.nodes.get(sub_id, {}).get("shape"):
+            diagram.error(number, 1, f"Subgraph id '{sub_id}' is also used as a node id", True)
+            new_id = f"{_identifier(sub_id)}_group"
+            if statement == f"subgraph {sub_id}":
+                new_statement = f'subgraph {new_id}["{sub_id}"]'
+            else:
+                new_statement = statement.replace(sub_id, new_id, 1)
+            current = diagram.line_fixes.get(number, indent + statement)
+            diagram.fix_line(number, current.replace(statement, new_statement, 1) if current else current)
+
+
+# ============================================================
+# SEQUENCE DIAGRAM
+# ============================================================
+
+SEQ_PARTICIPANT = re.compile(r'^(participant|actor)\s+(.+?)(?:\s+as\s+(.+))?$')
+SEQ_NOTE = re.compile(r'^[Nn]ote\s+(left of|right of|over)\s+([^:]+?)\s*(?::\s*(.*))?$')
+SEQ_MESSAGE = re.compile(
+    r'^(?P<src>[^\-<>:,;+]+?)\s*(?P<arrow><<-->>|<<->>|-->>|->>|--x|-x|--\)|-\)|-->|->)'
+    r'\s*(?P<act>[+-]?)\s*(?P<dst>[^\-<>:,;+]+?)\s*(?::(?P<text>.*))?$'
+)
+SEQ_BLOCKS = {"loop", "alt", "opt", "par", "critical", "break", "rect", "box"}
+SEQ_BRANCHES = {"else": "alt", "and": "par", "option": "critical"}
+SEQ_KEYWORDS = {"autonumber", "activate", "deactivate", "title", "link", "links", "properties",
+                "details", "create", "destroy", "accTitle", "accDescr"}
+SEQ_ARROW_FIXES = [
+    (re.compile(r'-->>>+'), '-->>'),
+    (re.compile(r'(?<!-)->>>+'), '->>'),
+    (re.compile(r'==?>>?'), '->>'),
+    (re.compile(r'\.{2,}>>?'), '-->>'),
+    (re.compile(r'(?:[—–]+>|→|⟶)'), '->>'),
+]
+
+
+def _parse_sequence(diagram: MermaidDiagram, body: list):
+    blocks = []  # (keyword, line)
+
+    for number, raw in body:
+        indent, text = _split_indent(raw)
+        column = len(indent) + 1
+        keyword = text.split(None, 1)[0].rstrip(":")
+
+        if keyword in ("participant", "actor"):
+            match = SEQ_PARTICIPANT.match(text)
+            if not match:
+                diagram.error(number, column, f"Invalid {keyword} declaration", False)
+                continue
+            diagram.add_node(match.group(2).strip(), number, (match.group(3) or match.group(2)).strip(), keyword)
+            diagram.statements.append({"type": keyword, "line": number, "id": match.group(2).strip()})
+            continue
+
+        if keyword in SEQ_BLOCKS:
+            blocks.append((keyword, number))
+            diagram.statements.append({"type": "block", "line": number, "keyword": keyword})
+            continue
+
+        if keyword in SEQ_BRANCHES:
+            if not blocks or blocks[-1][0] != SEQ_BRANCHES[keyword]:
+                diagram.error(number, column, f"'{keyword}' is only allowed inside '{SEQ_BRANCHES[keyword]}'", False)
+            diagram.statements.append({"type": "branch", "line": number, "keyword": keyword})
+            continue
+
+        if text == "end":
+            if not blocks:
+                diagram.error(number, column, "'end' without an open block", True)
+                diagram.fix_line(number, None)
+                continue
+            blocks.pop()
+            diagram.statements.append({"type": "end", "line": number})
+            continue
+
+        if keyword.lower() == "note":
+            match = SEQ_NOTE.match(text)
+            if not match or match.group(3) is None:
+                diagram.error(number, column, "Notes need 'Note left of|right of|over <actor>: <text>'", False)
+                continue
+            diagram.statements.append({"type": "note", "line": number, "text": match.group(3)})
+            continue
+
+        if keyword in SEQ_KEYWORDS:
+            diagram.statements.append({"type": "directive", "line": number, "keyword": keyword})
+            continue
+
+        match = SEQ_MESSAGE.match(text)
+        fixed = None
+        if not match:
+            for pattern, replacement in SEQ_ARROW_FIXES:
+                bad = pattern.search(text)
+                if bad:
+                    candidate = text[:bad.start()] + replacement + text[bad.end():]
+                    if SEQ_MESSAGE.match(candidate):
+                        diagram.error(number, column + bad.start(),
+                                      f"Invalid arrow '{bad.group(0)}', use '{replacement}'", True)
+                        fixed = text = candidate
+                        match = SEQ_MESSAGE.match(text)
+                        break
+        if not match:
+            diagram.error(number, column, f"Unrecognized statement '{text[:40]}'", False)
+            continue
+
+        if match.group("text") is None or not match.group("text").strip():
+            diagram.error(number, column + len(text), "Messages need ': <text>' after the receiver", True)
+            filler = "response" if match.group("arrow").startswith("--") else "request"
+            fixed = text = f"{text.rstrip().rstrip(':')}: {filler}"
+            match = SEQ_MESSAGE.match(text)
+
+        source, target = match.group("src").strip(), match.group("dst").strip()
+        diagram.add_node(source, number)
+        diagram.add_node(target, number)
+        diagram.add_edge(source, target, match.group("arrow"), match.group("text").strip(), number)
+        diagram.statements.append({"type": "message", "line": number})
+        if fixed is not None:
+            diagram.fix_line(number, indent + fixed)
+
+    for keyword, number in reversed(blocks):
+        diagram.error(number, 1, f"'{keyword}' block is never closed with 'end'", True)
+        diagram.append.append("end")
+
+
+# ============================================================
+# CLASS DIAGRAM
+# ============================================================
+
+CLASS_NAME = r'(?:`[^`]+`|\w+(?:~[^~]+~)?)'
+CLASS_DECL = re.compile(rf'^class\s+({CLASS_NAME})(?:\s*\[\s*"[^"]*"\s*\])?(?:\s*:::\s*\w+)?\s*(\{{)?\s*(\}})?$')
+CLASS_RELATION = re.compile(
+    rf'^({CLASS_NAME})\s*(?:"([^"]*)"\s*)?(<\||\*|o|<)?(--|\.\.)(\|>|\*|o|>)?\s*(?:"([^"]*)"\s*)?'
+    rf'({CLASS_NAME})\s*(?::\s*(.*))?$'
+)
+CLASS_RELATION_TOKEN = re.compile(r'\s(<\||\*|o|<)?(--|\.\.)(\|>|\*|o|>)?\s')
+CLASS_MEMBER = re.compile(rf'^({CLASS_NAME})\s*:\s*(.+)$')
+CLASS_ANNOTATION = re.compile(rf'^<<[^>]+>>\s*({CLASS_NAME})?$')
+CLASS_NOTE = re.compile(rf'^note(?:\s+for\s+{CLASS_NAME})?\s+"[^"]*"$')
+CLASS_KEYWORDS = {"direction", "classDef", "cssClass", "style", "click", "link", "callback",
+                  "accTitle", "accDescr", "title"}
+CLASS_ARROW_FIXES = [
+    (re.compile(r'(?<=\s)==+>(?=\s)'), '-->'),
+    (re.compile(r'(?<=\s)-\.+->(?=\s)'), '..>'),
+    (re.compile(r'(?<=\s)\.{3,}>(?=\s)'), '..>'),
+    (re.compile(r'(?<=\s)->(?=\s)'), '-->'),
+    (re.compile(r'(?<=\s)<\|-(?=\s)'), '<|--'),
+]
+
+
+def _parse_class(diagram: MermaidDiagram, body: list):
+    blocks = []  # ("class" | "namespace", name, line)
+
+    for number, raw in body:
+        indent, text = _split_indent(raw)
+        column = len(indent) + 1
+
+        if text == "}":
+            if not blocks:
+                diagram.error(number, column, "'}' without an open class body", True)
+                diagram.fix_line(number, None)
+                continue
+            blocks.pop()
+            continue
+
+        if blocks and blocks[-1][0] == "class":
+            diagram.nodes[blocks[-1][1]].setdefault("members", []).append(text)
+            diagram.statements.append({"type": "member", "line": number, "class": blocks[-1][1]})
+            continue
+
+        keyword = text.split(None, 1)[0]
+
+        if keyword == "class":
+            match = CLASS_DECL.match(text)
+            if not match:
+                diagram.error(number, column, f"Invalid class declaration '{text[:40]}'", False)
+                continue
+            name = match.group(1)
+            diagram.add_node(name, number, shape="class")
+            diagram.statements.append({"type": "class", "line": number, "id": name})
+            if match.group(2) and not match.group(3):
+                blocks.append(("class", name, number))
+            continue
+
+        if keyword == "namespace":
+            if not text.endswith("{"):
+                diagram.error(number, column, "Namespaces need '{' on the same line", True)
+                diagram.fix_line(number, indent + text + " {")
+            blocks.append(("namespace", text, number))
+            continue
+
+        if keyword in CLASS_KEYWORDS or CLASS_NOTE.match(text) or CLASS_ANNOTATION.match(text):
+            diagram.statements.append({"type": "directive", "line": number})
+            continue
+
+        match = CLASS_RELATION.match(text)
+        fixed = None
+        if not match:
+            candidate = text
+            for pattern, replacement in CLASS_ARROW_FIXES:
+                candidate = pattern.sub(replacement, candidate, count=1)
+            token = CLASS_RELATION_TOKEN.search(candidate)
+            if token and not CLASS_RELATION.match(candidate):
+                # 'Order Item --> Product': class names can't contain spaces
+                left, rest = candidate[:token.start()], candidate[token.end():]
+                right, _, label = rest.partition(":")
+                cardinality = re.compile(r'\s*("[^"]*")\s*$')
+                left_card = cardinality.search(left)
+                left_name = _identifier(left[:left_card.start()] if left_card else left)
+                right_card = re.match(r'\s*("[^"]*")\s*', right)
+                right_name = _identifier(right[right_card.end():] if right_card else right)
+                candidate = (
+                    f"{left_name}{' ' + left_card.group(1) if left_card else ''} {token.group(0).strip()} "
+                    f"{right_card.group(1) + ' ' if right_card else ''}{right_name}"
+                    f"{' : ' + label.strip() if label.strip() else ''}"
+                )
+            if candidate != text and CLASS_RELATION.match(candidate):
+                diagram.error(number, column, f"Invalid relationship '{text[:40]}'", True)
+                fixed = text = candidate
+                match = CLASS_RELATION.match(text)
+
+        if match:
+            left_head, line_style, right_head = match.group(3), match.group(4), match.group(5)
+            arrow = (left_head or "") + line_style + (right_head or "")
+            diagram.add_node(match.group(1), number, shape="class")
+            diagram.add_node(match.group(7), number, shape="class")
+            diagram.add_edge(match.group(1), match.group(7), arrow, match.group(8), number)
+            diagram.statements.append({"type": "relation", "line": number})
+            if fixed is not None:
+                diagram.fix_line(number, indent + fixed)
+            continue
+
+        match = CLASS_MEMBER.match(text)
+        if match:
+            diagram.add_node(match.group(1), number, shape="class")
+            diagram.nodes[match.group(1)].setdefault("members", []).append(match.group(2))
+            diagram.statements.append({"type": "member", "line": number, "class": match.group(1)})
+            continue
+
+        diagram.error(number, column, f"Unrecognized statement '{text[:40]}'", False)
+
+    for kind, name, number in reversed(blocks):
+        diagram.error(number, 1, f"{kind.title()} body for '{name}' is never closed with '}}'", True)
+        diagram.append.append("}")
+
+
+# ============================================================
+# ER DIAGRAM
+# ============================================================
+
+ER_NAME = r'(?:"[^"]+"|[A-Za-z_][\w\-]*)'
+ER_LEFT = ("|o", "||", "}o", "}|")
+ER_RIGHT = ("o|", "||", "o{", "|{")
+ER_RELATION = re.compile(
+    rf'^({ER_NAME})\s*(\|o|\|\||\}}o|\}}\|)(--|\.\.)(o\||\|\||o\{{|\|\{{)\s*({ER_NAME})\s*(?::\s*(.*))?$'
+)
+ER_RELATION_TOKEN = re.compile(r'\s*([|}o{<>*1n]*(?:--|\.\.|->|-)[|}o{<>*1n]*)\s*')
+ER_ENTITY = re.compile(rf'^({ER_NAME})(?:\s*\[[^\]]*\])?\s*(\{{)?\s*(\}})?$')
+ER_ATTRIBUTE = re.compile(
+    r'^([A-Za-z_][\w\-\[\]()]*)\s+(\*?[A-Za-z_][\w\-\[\]()]*)'
+    r'(?:\s+((?:PK|FK|UK)(?:\s*,\s*(?:PK|FK|UK))*))?(?:\s+"[^"]*")?$'
+)
+ER_LABEL = re.compile(r'^(?:"[^"]*"|[\w\-]+)$')
+
+
+def _fix_er_attribute(text: str) -> str:
+    """Normalize SQL-flavoured attribute lines ('id INT PRIMARY KEY,', 'name: string')"""
+    fixed = text.rstrip(",;").strip()
+    fixed = re.sub(r'\bPRIMARY\s+KEY\b', 'PK', fixed, flags=re.I)
+    fixed = re.sub(r'\bFOREIGN\s+KEY\b', 'FK', fixed, flags=re.I)
+    fixed = re.sub(r'\bUNIQUE\b', 'UK', fixed, flags=re.I)
+    fixed = re.sub(r'\b(?:NOT\s+NULL|NULL|AUTO_INCREMENT|AUTOINCREMENT)\b', '', fixed, flags=re.I)
+    fixed = re.sub(r'\b(PK|FK|UK)\s+(?=PK|FK|UK)', r'\1, ', fixed)
+    colon = re.match(r'^(\*?\w+)\s*:\s*([\w\[\]()\-]+)(.*)$', fixed)
+    if colon:
+        fixed = f"{colon.group(2)} {colon.group(1)}{colon.group(3)}"
+    fixed = re.sub(r'\(\s*(\d+)\s*,\s*(\d+)\s*\)', r'(\1-\2)', fixed)
+    return re.sub(r'\s+', ' ', fixed).strip()
+
+
+def _parse_er(diagram: MermaidDiagram, body: list):
+    entity = None  # (name, line) of the open attribute block
+
+    for number, raw in body:
+        indent, text = _split_indent(raw)
+        column = len(indent) + 1
+
+        if entity is not None:
+            if text == "}":
+                entity = None
+                continue
+            if ER_ATTRIBUTE.match(text):
+                diagram.nodes[entity[0]].setdefault("attributes", []).append(text)
+                continue
+            fixed = _fix_er_attribute(text)
+            if ER_ATTRIBUTE.match(fixed):
+                diagram.error(number, column, f"Invalid attribute '{text[:40]}'", True)
+                diagram.fix_line(number, indent + fixed)
+                diagram.nodes[entity[0]].setdefault("attributes", []).append(fixed)
+            else:
+                diagram.error(number, column, f"Invalid attribute '{text[:40]}'", False)
+            continue
+
+        if text == "}":
+            diagram.error(number, column, "'}' without an open entity", True)
+            diagram.fix_line(number, None)
+            continue
+
+        match = ER_ENTITY.match(text)
+        if match:
+            diagram.add_node(match.group(1), number, shape="entity")
+            diagram.statements.append({"type": "entity", "line": number, "id": match.group(1)})
+            if match.group(2) and not match.group(3):
+                entity = (match.group(1), number)
+            continue
+
+        if text.endswith("{") and ER_ENTITY.match(_identifier(text[:-1]) + " {"):
+            name = _identifier(text[:-1])
+            diagram.error(number, column, f"Entity name '{text[:-1].strip()}' contains spaces", True)
+            diagram.fix_line(number, f"{indent}{name} {{")
+            diagram.add_node(name, number, shape="entity")
+            entity = (name, number)
+            continue
+
+        match = ER_RELATION.match(text)
+        fixed = None
+        if not match:
+            before, _, label = text.partition(":")
+            token = ER_RELATION_TOKEN.search(before)
+            if token:
+                middle = token.group(1)
+                left = middle[:2] if middle[:2] in ER_LEFT else "||"
+                right = middle[-2:] if middle[-2:] in ER_RIGHT else "o{"
+                line_style = ".." if ".." in middle else "--"
+                source = before[:token.start()].strip()
+                target = before[token.end():].strip()
+                if source and target:
+                    source = source if re.fullmatch(ER_NAME, source) else _identifier(source)
+                    target = target if re.fullmatch(ER_NAME, target) else _identifier(target)
+                    candidate = f"{source} {left}{line_style}{right} {target}"
+                    if label.strip():
+                        candidate += f" : {label.strip()}"
+                    if ER_RELATION.match(candidate):
+                        diagram.error(number, column, f"Invalid relationship '{text[:40]}'", True)
+                        fixed = text = candidate
+                        match = ER_RELATION.match(text)
+
+        if not match:
+            diagram.error(number, column, f"Unrecognized statement '{text[:40]}'", False)
+            continue
+
+        label = (match.group(6) or "").strip()
+        if not label:
+            diagram.error(number, column + len(text), "Relationships need ': <label>'", True)
+            label = '"relates to"'
+        elif not ER_LABEL.match(label):
+            diagram.error(number, column + text.index(":") + 1, "Relationship labels with spaces must be quoted", True)
+            label = _quote(label)
+        if label != (match.group(6) or "").strip():
+            fixed = f"{match.group(1)} {match.group(2)}{match.group(3)}{match.group(4)} {match.group(5)} : {label}"
+
+        diagram.add_node(match.group(1), number, shape="entity")
+        diagram.add_node(match.group(5), number, shape="entity")
+        diagram.add_edge(match.group(1), match.group(5), match.group(2) + match.group(3) + match.group(4),
+                         label.strip('"'), number)
+        diagram.statements.append({"type": "relation", "line": number})
+        if fixed is not None:
+            diagram.fix_line(number, indent + fixed)
+
+    if entity is not None:
+        diagram.error(entity[1], 1, f"Entity '{entity[0]}' attribute block is never closed with '}}'", True)
+        diagram.append.append("}")
+
+
+# ============================================================
+# STATE DIAGRAM
+# ============================================================
+
+STATE_ID = r'(?:\[\*\]|\w+)'
+STATE_TRANSITION = re.compile(rf'^({STATE_ID})(?::::\w+)?\s*-->\s*({STATE_ID})(?::::\w+)?\s*(?::\s*(.*))?$')
+STATE_TRANSITION_TOKEN = re.compile(r'\s*(-->|->|==>|=>|-->>|→)\s*')
+STATE_ALIAS = re.compile(r'^state\s+"[^"]*"\s+as\s+(\w+)\s*(\{)?$')
+STATE_DECL = re.compile(r'^state\s+(\w+)\s*(<<(?:choice|fork|join)>>)?\s*(\{)?$')
+STATE_DESCRIPTION = re.compile(r'^(\w+)\s*:\s*(.+)$')
+STATE_NOTE_INLINE = re.compile(r'^note\s+(?:left|right)\s+of\s+\w+\s*:\s*.+$')
+STATE_NOTE_BLOCK = re.compile(r'^note\s+(?:left|right)\s+of\s+\w+$')
+STATE_KEYWORDS = {"direction", "classDef", "class", "style", "accTitle", "accDescr", "title"}
+
+
+def _parse_state(diagram: MermaidDiagram, body: list):
+    blocks = []  # (state id, line)
+    in_note = None
+
+    for number, raw in body:
+        indent, text = _split_indent(raw)
+        column = len(indent) + 1
+
+        if in_note is not None:
+            if text == "end note":
+                in_note = None
+            continue
+
+        if text == "}":
+            if not blocks:
+                diagram.error(number, column, "'}' without an open composite state", True)
+                diagram.fix_line(number, None)
+                continue
+            blocks.pop()
+            continue
+
+        if text == "--":
+            diagram.statements.append({"type": "concurrency", "line": number})
+            continue
+
+        keyword = text.split(None, 1)[0]
+
+        if keyword == "state":
+            match = STATE_ALIAS.match(text) or STATE_DECL.match(text)
+            if not match:
+                diagram.error(number, column, f"Invalid state declaration '{text[:40]}'", False)
+                continue
+            diagram.add_node(match.group(1), number, shape="state")
+            if text.endswith("{"):
+                blocks.append((match.group(1), number))
+            continue
+
+        if keyword == "note":
+            if STATE_NOTE_BLOCK.match(text):
+                in_note = number
+            elif not STATE_NOTE_INLINE.match(text):
+                diagram.error(number, column, "Notes need 'note left of|right of <state> : <text>'", False)
+            continue
+
+        if keyword in STATE_KEYWORDS or re.match(r'^\w+:::\w+$', text):
+            diagram.statements.append({"type": "directive", "line": number})
+            continue
+
+        match = STATE_TRANSITION.match(text)
+        fixed = None
+        if not match:
+            before, colon, label = text.partition(":")
+            token = STATE_TRANSITION_TOKEN.search(before)
+            if token:
+                source, target = before[:token.start()].strip(), before[token.end():].strip()
+                if source and target:
+                    source = source if re.fullmatch(STATE_ID, source) else _identifier(source)
+                    target = target if re.fullmatch(STATE_ID, target) else _identifier(target)
+                    candidate = f"{source} --> {target}" + (f" : {label.strip()}" if label.strip() else "")
+                    if STATE_TRANSITION.match(candidate):
+                        diagram.error(number, column, f"Invalid transition '{text[:40]}'", True)
+                        fixed = text = candidate
+                        match = STATE_TRANSITION.match(text)
+
+        if match:
+            for state in (match.group(1), match.group(2)):
+                diagram.add_node(state, number, shape="state")
+            diagram.add_edge(match.group(1), match.group(2), "-->", match.group(3), number)
+            diagram.statements.append({"type": "transition", "line": number})
+            if fixed is not None:
+                diagram.fix_line(number, indent + fixed)
+            continue
+
+        match = STATE_DESCRIPTION.match(text)
+        if match:
+            diagram.add_node(match.group(1), number, match.group(2).strip(), "state")
+            continue
+
+        if re.fullmatch(r'\w+', text):
+            diagram.add_node(text, number, shape="state")
+            continue
+
+        diagram.error(number, column, f"Unrecognized statement '{text[:40]}'", False)
+
+    if in_note is not None:
+        diagram.error(in_note, 1, "Note is never closed with 'end note'", True)
+        diagram.append.append("end note")
+    for state, number in reversed(blocks):
+        diagram.error(number, 1, f"Composite state '{state}' is never closed with '}}'", True)
+        diagram.append.append("}")
+
+
+PARSERS = {
+    "flowchart": _parse_flowchart,
+    "sequence": _parse_sequence,
+    "class": _parse_class,
+    "er": _parse_er,
+    "state": _parse_state,
+}
+
+# What the header should be when the model forgot it, guessed from the body
+HEADER_GUESSES = [
+    (re.compile(r'->>|-->>'), "sequenceDiagram"),
+    (re.compile(r'[|}][|o]--[|o][|{]'), "erDiagram"),
+    (re.compile(r'<\|--|--\|>|^\s*class\s+\w+\s*\{', re.M), "classDiagram"),
+    (re.compile(r'\[\*\]'), "stateDiagram-v2"),
+    (re.compile(r'-->|---|==>|-\.->'), "flowchart TD"),
+]
+
+
+def parse_mermaid(code: str) -> MermaidDiagram:
+    """
+    Parse Mermaid source into a MermaidDiagram
+    ✅ Flowchart, sequence, class, ER and state diagrams are parsed statement by statement
+    ✅ Other diagram types are recognized by header only (kind "other")
+    """
+    diagram = MermaidDiagram(code)
+    body = []
+    in_front_matter = False
+
+    for number, raw in enumerate(diagram.lines, 1):
+        text = raw.strip()
+        if diagram.header is not None:
+            if text and not text.startswith("%%"):
+                body.append((number, raw))
+            continue
+
+        # YAML front matter and %% comments/directives may precede the header
+        if number == 1 and text == "---":
+            in_front_matter = True
+            continue
+        if in_front_matter:
+            in_front_matter = text != "---"
+            continue
+        if not text or text.startswith("%%"):
+            continue
+
+        diagram.header, diagram.header_line = text, number
+        diagram.kind = next((kind for kind, pattern in PARSED_HEADERS if pattern.match(text)), None)
+        if diagram.kind is None and text.split()[0].rstrip(":;") in OTHER_HEADERS:
+            diagram.kind = "other"
+
+        if diagram.kind is None:
+            guess = next((header for pattern, header in HEADER_GUESSES if pattern.search(code)), None)
+            diagram.error(number, 1, f"Invalid diagram type: {text[:50]}", guess is not None)
+            if guess is None:
+                return diagram
+            diagram.prepend.append(guess)
+            diagram.kind = next(kind for kind, pattern in PARSED_HEADERS if pattern.match(guess))
+            diagram.header, diagram.header_line = guess, None
+            body.append((number, raw))
+        elif diagram.kind == "flowchart" and ";" in text:
+            # 'graph TD; A-->B' keeps statements on the header line
+            prefix, rest = raw.split(";", 1)
+            if rest.strip():
+                diagram.header_prefix = prefix.strip() + ";"
+                body.append((number, rest))
+
+    if diagram.header is None:
+        diagram.error(1, 1, "Empty diagram code")
+        return diagram
+
+    if diagram.kind in PARSERS:
+        PARSERS[diagram.kind](diagram, body)
+    return diagram
+
+
+def repair_mermaid(code: str, max_passes: int = 3) -> tuple:
+    """
+    Fix what the parser can fix locally, re-parsing after each pass
+    ⚡ Deterministic and fast - no LLM round trip
+    Returns (repaired code, list of fixed problems, remaining MermaidError list)
+    """
+    applied = []
+    diagram = parse_mermaid(code)
+
+    for _ in range(max_passes):
+        if diagram.is_valid or not diagram.has_fixes:
+            break
+        applied.extend(str(e) for e in diagram.errors if e.fixable)
+        code = diagram.apply_fixes()
+        diagram = parse_mermaid(code)
+
+    return code, applied, diagram.errors
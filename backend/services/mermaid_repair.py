@@ -0,0 +1,73 @@
+# backend/services/mermaid_repair.py - SHARED MERMAID REPAIR ENGINE
+import re
+from .mermaid_parser import repair_mermaid
+
+# Typographic characters models sometimes emit instead of ASCII syntax
+CHARACTER_REPLACEMENTS = {
+    "\u201c": '"', "\u201d": '"', "\u2018": "'", "\u2019": "'",
+    "\u00a0": " ", "\u200b": "", "\u200c": "", "\u200d": "", "\ufeff": "",
+    "\t": "    "
+}
+CHARACTER_PATTERN = re.compile("|".join(re.escape(c) for c in CHARACTER_REPLACEMENTS))
+
+
+def strip_wrappers(code: str) -> str:
+    """Drop ``` fences, [DIAGRAM_START]/[DIAGRAM_END] markers and a leftover 'mermaid' language tag"""
+    code = code.replace("[DIAGRAM_START]", "").replace("[DIAGRAM_END]", "").strip()
+    code = re.sub(r'^```[ \t]*(?:mermaid)?[ \t]*\n?', '', code)
+    code = re.sub(r'\n?```[ \t]*$', '', code)
+    code = re.sub(r'^mermaid[ \t]*\n', '', code)
+    return code.strip()
+
+
+def normalize_characters(code: str) -> str:
+    """Smart quotes, non-breaking/zero-width spaces and tabs"""
+    return CHARACTER_PATTERN.sub(lambda m: CHARACTER_REPLACEMENTS[m.group(0)], code)
+
+
+def collapse_semicolons(code: str) -> str:
+    return re.sub(r';{2,}', ';', code)
+
+
+def trim_trailing_whitespace(code: str) -> str:
+    return "\n".join(line.rstrip() for line in code.split("\n"))
+
+
+# Text-level rules run in order before the grammar-aware pass: (description, rule)
+TEXT_RULES = [
+    ("Removed code fences / diagram markers", strip_wrappers),
+    ("Replaced typographic quotes and invisible characters", normalize_characters),
+    ("Collapsed repeated semicolons", collapse_semicolons),
+    ("Trimmed trailing whitespace", trim_trailing_whitespace),
+]
+
+
+def normalize_mermaid_text(code: str) -> tuple:
+    """Apply the text rules. Returns (code, descriptions of rules that changed something)"""
+    applied = []
+    for description, rule in TEXT_RULES:
+        updated = rule(code)
+        if updated != code:
+            applied.append(description)
+            code = updated
+    return code, applied
+
+
+def repair_diagram(code: str) -> dict:
+    """
+    The one repair pipeline for Mermaid produced anywhere in the app
+    1. Text rules: wrappers, characters, semicolons, whitespace
+    2. Grammar-aware repair (mermaid_parser): node ID sanitization, arrow normalization,
+       bracket balancing, subgraph/end pairing, label quoting
+    Returns {"mermaid_code", "fixes", "errors", "is_valid"}
+    """
+    code, fixes = normalize_mermaid_text(code or "")
+    code, grammar_fixes, remaining = repair_mermaid(code)
+    fixes.extend(grammar_fixes)
+
+    return {
+        "mermaid_code": code,
+        "fixes": fixes,
+        "errors": [str(e) for e in remaining],
+        "is_valid": not remaining
+    }
@@ -0,0 +1,238 @@
+# backend/services/metrics.py - STAGE TIMINGS, PROMETHEUS METRICS AND REQUEST IDS
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Histogram buckets: seconds for stages/requests, tokens for prompt sizes
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 200000)
+
+METRIC_HELP = {
+    "repovision_stage_duration_seconds": ("histogram", "Time spent in each pipeline stage"),
+    "repovision_http_request_duration_seconds": ("histogram", "HTTP request latency until the last body byte"),
+    "repovision_http_requests_total": ("counter", "HTTP requests by route and status"),
+    "repovision_llm_tokens": ("histogram", "Tokens per LLM call (prompt, completion) and per packed context"),
+    "repovision_errors_total": ("counter", "Failed pipeline stages"),
+    "repovision_cache_events_total": ("counter", "Cache lookups and maintenance events"),
+    "repovision_cache_entries": ("gauge", "Entries currently held by each cache"),
+    "repovision_cache_hit_ratio": ("gauge", "hits / (hits + misses) since the process started"),
+    "repovision_llm_in_flight": ("gauge", "LLM requests currently holding a concurrency slot"),
+    "repovision_llm_waiting": ("gauge", "LLM requests queued for a concurrency slot"),
+}
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+_request_stages = contextvars.ContextVar("request_stages", default=None)  # stage -> [count, seconds]
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> {"buckets", "counts", "sum", "count"}
+_counters = {}  # (name, labels) -> value
+
+
+def log(message: str = ""):
+    """print() with the current request id in front, so interleaved requests can be told apart"""
+    request_id = request_id_var.get()
+    if request_id and message:
+        text = message.lstrip("\n")
+        message = f"{message[:len(message) - len(text)]}[{request_id}] {text}"
+    print(message)
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def observe(name: str, value: float, buckets: tuple = DURATION_BUCKETS, **labels):
+    """Add one observation to a histogram"""
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(histogram["buckets"]):
+            if value <= bound:
+                histogram["counts"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+def increment(name: str, amount: float = 1, **labels):
+    """Add to a counter"""
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe_tokens(kind: str, tokens: int):
+    """Record a token count (kind: prompt, completion, context)"""
+    if tokens:
+        observe("repovision_llm_tokens", tokens, TOKEN_BUCKETS, kind=kind)
+
+
+def record_stage(stage: str, seconds: float):
+    """Add a stage duration to the histogram and to the current request's summary"""
+    observe("repovision_stage_duration_seconds", seconds, stage=stage)
+    stages = _request_stages.get()
+    if stages is not None:
+        entry = stages.setdefault(stage, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """
+    Time a pipeline stage (works in sync and async code)
+    Failures are counted in repovision_errors_total and still timed
+    (cancellation and closed generators are not failures)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        increment("repovision_errors_total", stage=stage)
+        raise
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def format_stage_summary(stages: dict) -> str:
+    """'clone 1.20s, llm_attempt×2 8.31s' in the order the stages first ran"""
+    return ", ".join(
+        f"{stage}{f'×{count}' if count > 1 else ''} {seconds:.2f}s"
+        for stage, (count, seconds) in stages.items()
+    )
+
+
+def format_server_timing(stages: dict) -> str:
+    """Server-Timing header value ('resolve;dur=12.3, clone;dur=840.0'), durations in milliseconds"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, (_, seconds) in stages.items())
+
+
+@contextmanager
+def request_scope(request_id: str = None):
+    """
+    Run work under a request id with its own stage summary (background jobs use this too)
+    Yields the stages dict; tasks created inside share it
+    """
+    id_token = request_id_var.set(request_id or uuid.uuid4().hex[:12])
+    stages_token = _request_stages.set({})
+    try:
+        yield _request_stages.get()
+    finally:
+        _request_stages.reset(stages_token)
+        request_id_var.reset(id_token)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware: request id (X-Request-ID in and out), HTTP latency/count metrics,
+    a Server-Timing header with the stage durations and one timing summary line per request
+    Pure ASGI rather than BaseHTTPMiddleware so streamed (SSE) responses are timed
+    until their last byte, not until the headers
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1").strip()
+        request_id = incoming[:64] or uuid.uuid4().hex[:12]
+        status = {"code": 500}
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+                stages = _request_stages.get()
+                if stages:  # complete for normal responses; streamed ones start before their stages run
+                    headers.append((b"server-timing", format_server_timing(stages).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with request_scope(request_id) as stages:
+            start = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                elapsed = time.perf_counter() - start
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                method = scope.get("method", "")
+                observe("repovision_http_request_duration_seconds", elapsed, method=method, route=route)
+                increment("repovision_http_requests_total", method=method, route=route, status=str(status["code"]))
+                if stages:
+                    log(f"⏱️ {method} {route} → {status['code']} in {elapsed:.2f}s ({format_stage_summary(stages)})")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics(caches: dict = None, llm_clients: dict = None) -> str:
+    """
+    Everything recorded in this process in Prometheus text format (version 0.0.4)
+    - caches: {cache_name: stats dict} from cache_stats() / llm_cache_stats()
+    - llm_clients: llm_client_stats() output
+    Each uvicorn worker keeps its own numbers; Prometheus sums them across scrape targets
+    """
+    with _lock:
+        histograms = {key: dict(h, counts=list(h["counts"])) for key, h in _histograms.items()}
+        counters = dict(_counters)
+
+    samples = {}  # metric name -> lines
+
+    for (name, labels), histogram in sorted(histograms.items()):
+        lines = samples.setdefault(name, [])
+        for bound, count in zip(histogram["buckets"], histogram["counts"]):
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', _format_value(bound)),))} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    for (name, labels), value in sorted(counters.items()):
+        samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for cache, stats in (caches or {}).items():
+        for event, value in stats.items():
+            if event in ("entries", "hit_ratio") or not isinstance(value, (int, float)):
+                continue
+            samples.setdefault("repovision_cache_events_total", []).append(
+                f"repovision_cache_events_total{_format_labels((('cache', cache), ('event', event)))} {value}"
+            )
+        if isinstance(stats.get("entries"), int):
+            samples.setdefault("repovision_cache_entries", []).append(
+                f"repovision_cache_entries{_format_labels((('cache', cache),))} {stats['entries']}"
+            )
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        samples.setdefault("repovision_cache_hit_ratio", []).append(
+            f"repovision_cache_hit_ratio{_format_labels((('cache', cache),))} "
+            f"{_format_value(stats.get('hits', 0) / lookups if lookups else 0)}"
+        )
+
+    for model, stats in (llm_clients or {}).items():
+        for gauge, field in (("repovision_llm_in_flight", "in_flight"), ("repovision_llm_waiting", "waiting")):
+            samples.setdefault(gauge, []).append(f"{gauge}{_format_labels((('model', model),))} {stats[field]}")
+
+    output = []
+    for name, lines in samples.items():
+        metric_type, help_text = METRIC_HELP.get(name, ("untyped", name))
+        output.append(f"# HELP {name} {help_text}")
+        output.append(f"# TYPE {name} {metric_type}")
+        output.extend(lines)
+    return "\n".join(output) + "\n"
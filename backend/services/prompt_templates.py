@@ -638,4 +638,20 @@ QUALITY CHECKLIST:
 ☐ Showed all important connections
 
 NOW CREATE A COMPREHENSIVE, PRODUCTION-QUALITY DIAGRAM:
-"""
\ No newline at end of file
+"""
+
+
+def get_static_description_prompt(diagram_type: str, nodes_text: str) -> str:
+    """Get prompt asking for short descriptions of the nodes of a rule-based diagram"""
+    
+    return f"""
+You are labelling a {diagram_type} diagram that was generated directly from the repository's code.
+Do NOT change the diagram. Only describe what each node does.
+
+Nodes (id: file or class, with the symbols it defines):
+{nodes_text}
+
+Reply with ONLY a JSON object mapping each node id to a description of 3-6 words,
+for example {{"f_api_routes_py": "HTTP endpoints for users"}}.
+Describe only nodes you can infer from the symbols; omit the rest.
+"""
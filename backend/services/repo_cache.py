@@ -0,0 +1,445 @@
+# backend/services/repo_cache.py - PERSISTENT MIRROR STORE
+import os
+import sys
+import time
+import uuid
+import base64
+import shutil
+import asyncio
+import hashlib
+import subprocess
+from contextlib import asynccontextmanager
+
+from .executor import run_blocking
+from .metrics import log, stage_timer
+
+# Mirror store configuration (override in .env)
+REPO_CACHE_DIR = os.getenv("REPO_CACHE_DIR", os.path.join(os.getcwd(), "repo_cache"))
+REPO_CACHE_MAX_BYTES = int(os.getenv("REPO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))  # 2GB
+REPO_CACHE_STALE_SECONDS = int(os.getenv("REPO_CACHE_STALE_SECONDS", "300"))  # 5 minutes
+GIT_TIMEOUT_SECONDS = 180  # 3 minute timeout
+# "full": mirrors hold every blob at HEAD and are analyzed from a worktree
+# "partial": blob-less mirrors (--filter=blob:none); only blobs the analyzer reads are fetched
+# "tarball": no git at all, the GitHub tarball is streamed and scanned (see tarball_source.py)
+REPO_ACQUISITION_MODE = os.getenv("REPO_ACQUISITION_MODE", "full").lower()
+REGULAR_FILE_MODES = {"100644", "100755"}  # symlinks and submodules are skipped, as in a disk scan
+# Git host the mirrors are cloned from (e.g. file:// remotes for benchmarks)
+GITHUB_URL = os.getenv("GITHUB_URL", "https://github.com").rstrip("/")
+
+# Marker files kept inside each bare mirror
+FETCHED_MARKER = "repovision-fetched"
+USED_MARKER = "repovision-used"
+SIZE_MARKER = "repovision-size"
+
+_mirror_locks = {}
+_mirrors_in_use = {}
+
+
+class GitCommandError(Exception):
+    """Raised when a git command exits with a non-zero status"""
+
+    def __init__(self, args: list, returncode: int, stderr: str):
+        self.git_args = args
+        self.returncode = returncode
+        self.stderr = stderr or ""
+        super().__init__(f"git {' '.join(args[:2])} failed ({returncode}): {self.stderr[:200]}")
+
+
+def git_env(github_token: str = None) -> dict:
+    """
+    Environment for non-interactive git commands
+    The token is sent as an HTTP header (scoped to GITHUB_URL) so it never lands in the mirror's config
+    """
+    env = os.environ.copy()
+    env['GIT_TERMINAL_PROMPT'] = '0'
+    env['GIT_ASKPASS'] = 'echo'  # Prevent password prompts
+
+    if github_token:
+        basic = base64.b64encode(f"x-access-token:{github_token}".encode('utf-8')).decode('ascii')
+        env['GIT_CONFIG_COUNT'] = '1'
+        env['GIT_CONFIG_KEY_0'] = f"http.{GITHUB_URL}/.extraheader"
+        env['GIT_CONFIG_VALUE_0'] = f"Authorization: Basic {basic}"
+
+    return env
+
+
+def _run_git_sync(args: list, env: dict, cwd: str, timeout: int, input_bytes: bytes = None) -> tuple:
+    result = subprocess.run(
+        ["git"] + args,
+        input=input_bytes,
+        capture_output=True,
+        timeout=timeout,
+        env=env,
+        cwd=cwd
+    )
+    return result.returncode, result.stdout, result.stderr
+
+
+async def run_git_bytes(args: list, env: dict, cwd: str = None, timeout: int = GIT_TIMEOUT_SECONDS,
+                        input_bytes: bytes = None) -> bytes:
+    """run_git returning raw stdout bytes, optionally feeding input_bytes to stdin"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "git", *args,
+            stdin=asyncio.subprocess.PIPE if input_bytes is not None else None,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            cwd=cwd
+        )
+    except NotImplementedError:
+        # Windows selector event loops (e.g. uvicorn --reload) can't spawn async subprocesses
+        returncode, stdout_bytes, stderr_bytes = await run_blocking(
+            _run_git_sync, args, env, cwd, timeout, input_bytes
+        )
+    else:
+        try:
+            stdout_bytes, stderr_bytes = await asyncio.wait_for(process.communicate(input_bytes), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(["git"] + args, timeout)
+        returncode = process.returncode
+
+    if returncode != 0:
+        raise GitCommandError(args, returncode, stderr_bytes.decode('utf-8', errors='replace'))
+    return stdout_bytes
+
+
+async def run_git(args: list, env: dict, cwd: str = None, timeout: int = GIT_TIMEOUT_SECONDS) -> str:
+    """Run a git command without blocking the event loop, raising GitCommandError on failure"""
+    stdout = await run_git_bytes(args, env, cwd, timeout)
+    return stdout.decode('utf-8', errors='replace')
+
+
+async def cat_file_batch(git_dir: str, specs: list, env: dict, check_only: bool = False) -> dict:
+    """
+    Look up many objects with one git cat-file process
+    - specs: object names ("<sha>" or "<commit>:<path>")
+    - check_only: sizes only (--batch-check), no contents
+    Returns {spec: (size, bytes or None)}; missing objects are left out
+    """
+    if not specs:
+        return {}
+    mode = "--batch-check" if check_only else "--batch"
+    output = await run_git_bytes(
+        ["--git-dir", git_dir, "cat-file", mode], env, input_bytes="".join(f"{s}\n" for s in specs).encode("utf-8")
+    )
+
+    objects = {}
+    pos = 0
+    for spec in specs:
+        end = output.index(b"\n", pos)
+        header = output[pos:end].decode("utf-8", errors="replace").split()
+        pos = end + 1
+        if len(header) != 3:  # "<spec> missing" / "ambiguous"
+            continue
+        size = int(header[2])
+        content = None
+        if not check_only:
+            content = output[pos:pos + size]
+            pos += size + 1  # contents are followed by a newline
+        objects[spec] = (size, content)
+    return objects
+
+
+async def list_tree_files(git_dir: str, rev: str, env: dict) -> list:
+    """
+    Every regular file at rev as (blob_sha, path), straight from the tree objects
+    Needs no blobs, so it works on a blob-less mirror without downloading anything
+    """
+    output = await run_git_bytes(["--git-dir", git_dir, "ls-tree", "-r", "-z", "--full-tree", rev], env)
+    files = []
+    for entry in output.decode("utf-8", errors="replace").split("\0"):
+        if not entry:
+            continue
+        meta, path = entry.split("\t", 1)
+        mode, _, sha = meta.split()
+        if mode in REGULAR_FILE_MODES:
+            files.append((sha, path))
+    return files
+
+
+async def fetch_missing_blobs(git_dir: str, rev: str, shas: list, env: dict) -> int:
+    """
+    Download just these blobs into a partial mirror, in one request
+    Blobs already in the mirror are not fetched again. Returns the number fetched
+    """
+    output = await run_git(["--git-dir", git_dir, "rev-list", "--objects", "--missing=print", rev], env)
+    missing = {line[1:] for line in output.splitlines() if line.startswith("?")}
+    wanted = [sha for sha in dict.fromkeys(shas) if sha in missing]
+    if wanted:
+        await run_git_bytes(
+            ["-c", "fetch.negotiationAlgorithm=noop", "--git-dir", git_dir, "fetch", "origin", "--no-tags",
+             "--no-write-fetch-head", "--recurse-submodules=no", "--filter=blob:none", "--stdin"],
+            env, input_bytes="".join(f"{sha}\n" for sha in wanted).encode("utf-8")
+        )
+    return len(wanted)
+
+
+async def read_blobs(git_dir: str, rev: str, shas: list, env: dict) -> dict:
+    """
+    cat_file_batch for blobs of rev, fetching the missing ones first on partial mirrors
+    (one request for the batch instead of a lazy fetch per blob)
+    """
+    if REPO_ACQUISITION_MODE == "partial" and shas:
+        await fetch_missing_blobs(git_dir, rev, shas, env)
+    return await cat_file_batch(git_dir, shas, env)
+
+
+def token_scope(github_token: str = None) -> str:
+    """Separate mirrors per credential so private clones are never shared anonymously"""
+    if not github_token:
+        return "public"
+    return "token-" + hashlib.sha256(github_token.encode('utf-8')).hexdigest()[:16]
+
+
+def get_mirror_path(owner: str, repo_name: str, github_token: str = None) -> str:
+    """Location of the bare mirror for owner/repo under the given credential scope"""
+    return os.path.join(
+        REPO_CACHE_DIR, owner.lower(), repo_name.lower(), f"{token_scope(github_token)}.git"
+    )
+
+
+def _get_mirror_lock(mirror_path: str) -> asyncio.Lock:
+    lock = _mirror_locks.get(mirror_path)
+    if lock is None:
+        lock = asyncio.Lock()
+        _mirror_locks[mirror_path] = lock
+    return lock
+
+
+def _touch(path: str):
+    with open(path, 'a'):
+        pass
+    os.utime(path, None)
+
+
+def _marker_age(mirror_path: str, marker: str) -> float:
+    try:
+        return time.time() - os.path.getmtime(os.path.join(mirror_path, marker))
+    except OSError:
+        return float('inf')
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                continue
+    return total
+
+
+def remove_tree(path: str):
+    """Delete a directory, handling read-only git objects on Windows"""
+    if not path or not os.path.exists(path):
+        return
+
+    if sys.platform.startswith('win'):
+        for root, dirs, files in os.walk(path):
+            for name in dirs + files:
+                try:
+                    os.chmod(os.path.join(root, name), 0o777)
+                except OSError:
+                    pass
+
+    shutil.rmtree(path, ignore_errors=True)
+
+
+async def _configure_partial_mirror(mirror_path: str, clone_url: str, env: dict):
+    """Register origin as a promisor remote so blob-less fetches (and lazy blob reads) are allowed"""
+    for key, value in (
+        ("core.repositoryformatversion", "1"),
+        ("extensions.partialClone", "origin"),
+        ("remote.origin.url", clone_url),
+        ("remote.origin.promisor", "true"),
+        ("remote.origin.partialclonefilter", "blob:none"),
+    ):
+        await run_git(["--git-dir", mirror_path, "config", key, value], env)
+
+
+async def _fetch_head(mirror_path: str, clone_url: str, env: dict):
+    """Shallow-fetch the remote default branch and point the mirror's HEAD at it"""
+    if REPO_ACQUISITION_MODE == "partial":
+        # Commits and trees only; blobs come later through fetch_missing_blobs
+        await _configure_partial_mirror(mirror_path, clone_url, env)
+        await run_git(["--git-dir", mirror_path, "fetch", "--depth", "1", "--filter=blob:none", "--force",
+                       "origin", "HEAD"], env)
+    else:
+        await run_git(["--git-dir", mirror_path, "fetch", "--depth", "1", "--force", clone_url, "HEAD"], env)
+    await run_git(["--git-dir", mirror_path, "update-ref", "HEAD", "FETCH_HEAD"], env)
+
+    size = await run_blocking(_directory_size, mirror_path)
+    with open(os.path.join(mirror_path, SIZE_MARKER), 'w') as f:
+        f.write(str(size))
+    _touch(os.path.join(mirror_path, FETCHED_MARKER))
+
+
+async def remote_head_sha(clone_url: str, github_token: str = None) -> str:
+    """Resolve the remote HEAD commit with git ls-remote (no objects are transferred)"""
+    output = await run_git(["ls-remote", clone_url, "HEAD"], git_env(github_token), timeout=60)
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[1] == "HEAD":
+            return parts[0]
+    raise GitCommandError(["ls-remote", clone_url], 0, "Remote HEAD not found")
+
+
+async def head_sha(repo_path: str, env: dict) -> str:
+    """Commit currently referenced by HEAD in a mirror or worktree"""
+    return (await run_git(["-C", repo_path, "rev-parse", "HEAD"], env)).strip()
+
+
+async def ensure_mirror(owner: str, repo_name: str, clone_url: str, github_token: str = None,
+                  expected_sha: str = None) -> str:
+    """
+    Return an up-to-date bare mirror for owner/repo
+    - Missing mirror: created with a shallow fetch
+    - Stale mirror (older than REPO_CACHE_STALE_SECONDS): refreshed with git fetch
+    - Mirror behind expected_sha (from ls-remote): refreshed regardless of age
+    - Fresh mirror: used as-is, no network round trip
+    - REPO_ACQUISITION_MODE=partial: fetches commits and trees only (no blobs)
+    """
+    mirror_path = get_mirror_path(owner, repo_name, github_token)
+    env = git_env(github_token)
+
+    async with _get_mirror_lock(mirror_path):
+        if not os.path.isdir(mirror_path):
+            log(f"📥 Creating mirror for {owner}/{repo_name}...")
+            staging_path = f"{mirror_path}.tmp-{uuid.uuid4().hex[:8]}"
+            os.makedirs(os.path.dirname(mirror_path), exist_ok=True)
+            try:
+                await run_git(["init", "--bare", "--quiet", staging_path], env)
+                await _fetch_head(staging_path, clone_url, env)
+                os.replace(staging_path, mirror_path)
+            finally:
+                remove_tree(staging_path)
+        elif _marker_age(mirror_path, FETCHED_MARKER) > REPO_CACHE_STALE_SECONDS:
+            log(f"🔄 Refreshing stale mirror for {owner}/{repo_name}...")
+            await _fetch_head(mirror_path, clone_url, env)
+        elif expected_sha and await head_sha(mirror_path, env) != expected_sha:
+            log(f"🔄 Mirror for {owner}/{repo_name} is behind remote, fetching...")
+            await _fetch_head(mirror_path, clone_url, env)
+        else:
+            log(f"⚡ Using cached mirror for {owner}/{repo_name}")
+
+        _touch(os.path.join(mirror_path, USED_MARKER))
+
+    return mirror_path
+
+
+@asynccontextmanager
+async def cached_mirror(owner: str, repo_name: str, clone_url: str, github_token: str = None,
+                        expected_sha: str = None):
+    """
+    Up-to-date mirror (see ensure_mirror) that is kept from eviction while in use
+    On exit the store is trimmed back to REPO_CACHE_MAX_BYTES
+    """
+    with stage_timer("clone"):
+        mirror_path = await ensure_mirror(owner, repo_name, clone_url, github_token, expected_sha)
+
+    _mirrors_in_use[mirror_path] = _mirrors_in_use.get(mirror_path, 0) + 1
+    try:
+        yield mirror_path
+    finally:
+        _mirrors_in_use[mirror_path] -= 1
+        if _mirrors_in_use[mirror_path] <= 0:
+            del _mirrors_in_use[mirror_path]
+
+        await evict_mirrors()
+
+
+@asynccontextmanager
+async def mirror_worktree(owner: str, repo_name: str, clone_url: str, github_token: str = None,
+                          expected_sha: str = None):
+    """
+    Check out a short-lived worktree of the cached mirror
+    The worktree is removed on exit; the mirror stays for the next request
+    """
+    env = git_env(github_token)
+    worktree_path = os.path.join(REPO_CACHE_DIR, "_worktrees", f"wt_{uuid.uuid4().hex[:12]}")
+
+    async with cached_mirror(owner, repo_name, clone_url, github_token, expected_sha) as mirror_path:
+        try:
+            os.makedirs(os.path.dirname(worktree_path), exist_ok=True)
+            with stage_timer("checkout"):
+                async with _get_mirror_lock(mirror_path):
+                    await run_git(["--git-dir", mirror_path, "worktree", "add", "--detach", "--quiet", worktree_path, "HEAD"], env)
+            yield worktree_path
+        finally:
+            try:
+                await run_git(["--git-dir", mirror_path, "worktree", "remove", "--force", worktree_path], env)
+            except (GitCommandError, subprocess.TimeoutExpired, OSError):
+                await run_blocking(remove_tree, worktree_path)
+                try:
+                    await run_git(["--git-dir", mirror_path, "worktree", "prune"], env)
+                except (GitCommandError, subprocess.TimeoutExpired, OSError):
+                    pass
+
+
+def list_mirrors() -> list:
+    """List cached mirrors with their size and last-used time"""
+    mirrors = []
+    if not os.path.isdir(REPO_CACHE_DIR):
+        return mirrors
+
+    for owner in os.listdir(REPO_CACHE_DIR):
+        owner_dir = os.path.join(REPO_CACHE_DIR, owner)
+        # Internal directories start with "_", which GitHub owner names can't
+        if owner.startswith("_") or not os.path.isdir(owner_dir):
+            continue
+        for repo_name in os.listdir(owner_dir):
+            repo_dir = os.path.join(owner_dir, repo_name)
+            if not os.path.isdir(repo_dir):
+                continue
+            for entry in os.listdir(repo_dir):
+                if not entry.endswith(".git"):
+                    continue
+                mirror_path = os.path.join(repo_dir, entry)
+                try:
+                    with open(os.path.join(mirror_path, SIZE_MARKER)) as f:
+                        size = int(f.read().strip() or 0)
+                except (OSError, ValueError):
+                    size = _directory_size(mirror_path)
+                try:
+                    last_used = os.path.getmtime(os.path.join(mirror_path, USED_MARKER))
+                except OSError:
+                    last_used = 0.0
+                mirrors.append({"path": mirror_path, "size": size, "last_used": last_used})
+
+    return mirrors
+
+
+async def evict_mirrors(max_bytes: int = None) -> int:
+    """
+    Evict least-recently-used mirrors until the store fits the disk budget
+    Mirrors with a live worktree or an in-flight fetch (in any worker process) are never
+    evicted. Returns bytes freed.
+    """
+    from .single_flight import interprocess_lock
+
+    max_bytes = REPO_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    mirrors = await run_blocking(list_mirrors)
+    total = sum(m["size"] for m in mirrors)
+    freed = 0
+
+    for mirror in sorted(mirrors, key=lambda m: m["last_used"]):
+        if total <= max_bytes:
+            break
+
+        if mirror["path"] in _mirrors_in_use or _get_mirror_lock(mirror["path"]).locked():
+            continue
+
+        async with interprocess_lock(mirror["path"], wait=False) as acquired:
+            if not acquired:
+                continue
+            async with _get_mirror_lock(mirror["path"]):
+                await run_blocking(remove_tree, mirror["path"])
+        total -= mirror["size"]
+        freed += mirror["size"]
+        log(f"🗑️ Evicted cached mirror: {mirror['path']}")
+
+    return freed
@@ -0,0 +1,388 @@
+# backend/services/repo_model.py - COMPACT IN-MEMORY REPOSITORY MODEL
+import hashlib
+import threading
+from collections.abc import Mapping
+
+# Keys every file_contents record exposes (same as file_content_entry)
+RECORD_KEYS = ("content", "size", "extension", "purpose", "full_size")
+
+
+class PathTable:
+    """
+    Repository paths with integer ids (ids follow insertion order)
+    compact_repo_data points the symbol graph at these strings, so file_contents keys
+    and graph paths are the same objects instead of separate copies
+    """
+    __slots__ = ("_paths", "_ids")
+
+    def __init__(self):
+        self._paths = []
+        self._ids = {}
+
+    def add(self, path: str) -> int:
+        """Id of path, registering it on first use"""
+        path_id = self._ids.get(path)
+        if path_id is None:
+            path_id = self._ids[path] = len(self._paths)
+            self._paths.append(path)
+        return path_id
+
+    def path(self, path_id: int) -> str:
+        return self._paths[path_id]
+
+    def get_id(self, path: str):
+        return self._ids.get(path)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+class ContentArena:
+    """
+    File contents as UTF-8 in one buffer; records keep (offset, length)
+    ✅ One allocation instead of one string per file
+    ✅ Non-ASCII text stays at its UTF-8 size (a single emoji makes a Python str 4 bytes per character)
+    """
+    __slots__ = ("_buffer",)
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def append(self, text: str) -> tuple:
+        data = text.encode("utf-8")
+        offset = len(self._buffer)
+        self._buffer += data
+        return offset, len(data)
+
+    def text(self, offset: int, length: int) -> str:
+        return str(memoryview(self._buffer)[offset:offset + length], "utf-8")
+
+    def data(self, offset: int, length: int) -> bytes:
+        return bytes(memoryview(self._buffer)[offset:offset + length])
+
+    def read(self, record) -> str:
+        return self.text(record.offset, record.length)
+
+    def freeze(self):
+        """Drop the spare capacity bytearray keeps for appends"""
+        self._buffer = bytes(self._buffer)
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+
+class StoredContents:
+    """
+    File contents left in the content store until a record is read
+    Records carry the content SHA (the handle); text is loaded on first access and kept
+    for the rest of the request, so files the prompt never shows are never read
+    - load: callable([sha]) -> {sha: UTF-8 bytes}, e.g. analysis_cache.read_file_contents
+    - on_missing: callable([sha]) for SHAs the store no longer has (pruned after the analysis was read);
+      their records read as "" for the rest of the request
+    """
+    __slots__ = ("_load", "_on_missing", "_texts", "_lock")
+
+    def __init__(self, load, on_missing=None):
+        self._load = load
+        self._on_missing = on_missing
+        self._texts = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, shas):
+        """Load every SHA not read yet in one lookup"""
+        with self._lock:
+            wanted = [sha for sha in dict.fromkeys(shas) if sha not in self._texts]
+            if not wanted:
+                return
+            found = self._load(wanted)
+            missing = [sha for sha in wanted if sha not in found]
+            for sha in wanted:
+                self._texts[sha] = str(found.get(sha, b""), "utf-8")
+        if missing and self._on_missing is not None:
+            self._on_missing(missing)
+
+    def read(self, record) -> str:
+        text = self._texts.get(record.sha)
+        if text is None:
+            self.prefetch([record.sha])
+            text = self._texts[record.sha]
+        return text
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+
+def content_sha(data: bytes) -> str:
+    """Content store key: the git blob id of the stored bytes (equal to the blob SHA for files kept whole)"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FileRecord(Mapping):
+    """
+    One file_contents entry; reads like the dict from file_content_entry
+    (entry["content"], entry.get("purpose")), content is resolved from its source on access:
+    an arena slice (offset, length) or a content store handle (sha, length)
+    - length: UTF-8 bytes of the content, known without reading it
+    """
+    __slots__ = ("_source", "path_id", "offset", "length", "sha", "size", "full_size", "extension", "purpose")
+
+    def __init__(self, source, path_id: int, offset, length: int, size: int, full_size: int,
+                 extension: str, purpose: str, sha: str = None):
+        self._source = source
+        self.path_id = path_id
+        self.offset = offset
+        self.length = length
+        self.sha = sha
+        self.size = size
+        self.full_size = full_size
+        self.extension = extension
+        self.purpose = purpose
+
+    @property
+    def content(self) -> str:
+        return self._source.read(self)
+
+    def __getitem__(self, key: str):
+        if key not in RECORD_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(RECORD_KEYS)
+
+    def __len__(self) -> int:
+        return len(RECORD_KEYS)
+
+    def __repr__(self) -> str:
+        return (f"FileRecord(size={self.size}, extension={self.extension!r}, "
+                f"purpose={self.purpose!r}, bytes={self.length})")
+
+
+class FileContents(Mapping):
+    """Read-only {path: FileRecord} in walk order; the PathTable is the index, records are a list by path id"""
+    __slots__ = ("paths", "arena", "stored", "_records")
+
+    def __init__(self, paths: PathTable, arena: ContentArena, records: list, stored: StoredContents = None):
+        self.paths = paths
+        self.arena = arena
+        self.stored = stored
+        self._records = records
+
+    def __getitem__(self, path: str) -> FileRecord:
+        path_id = self.paths.get_id(path)
+        if path_id is None:
+            raise KeyError(path)
+        return self._records[path_id]
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, path) -> bool:
+        return self.paths.get_id(path) is not None
+
+    def prefetch(self, paths):
+        """Resolve the handles among paths with one content store lookup"""
+        if self.stored is not None:
+            self.stored.prefetch([record.sha for record in map(self.get, paths)
+                                  if record is not None and record.offset is None])
+
+    def __repr__(self) -> str:
+        return f"FileContents({len(self._records)} files, {len(self.arena)} bytes)"
+
+
+def is_handle(entry) -> bool:
+    """A file_contents entry whose content lives in the content store (stored handle or store-backed record)"""
+    if isinstance(entry, FileRecord):
+        return entry.offset is None
+    return isinstance(entry, Mapping) and "sha" in entry and "content" not in entry
+
+
+def content_length(entry) -> int:
+    """Size of an entry's content without loading it (UTF-8 bytes for records and handles)"""
+    if isinstance(entry, FileRecord):
+        return entry.length
+    if isinstance(entry, Mapping):
+        return entry["length"] if is_handle(entry) else len(entry.get("content", ""))
+    return len(str(entry))
+
+
+def _handle(entry) -> tuple:
+    """(sha, length) of a handle"""
+    if isinstance(entry, FileRecord):
+        return entry.sha, entry.length
+    return entry["sha"], entry["length"]
+
+
+def build_file_contents(file_contents: Mapping, strings: dict = None, load=None, on_missing=None) -> FileContents:
+    """
+    Pack plain file_contents entries (or records from another model) into one arena
+    - strings: memo for sharing repeated values (see _shared)
+    - load / on_missing: content store reader for handles ({"sha", "length", ...} without "content")
+      and what to do about SHAs it no longer has (see StoredContents); handles stay unread
+    """
+    strings = {} if strings is None else strings
+    paths = PathTable()
+    arena = ContentArena()
+    stored = StoredContents(load, on_missing) if load is not None else None
+    records = []
+
+    for rel_path, entry in file_contents.items():
+        path_id = paths.add(rel_path)
+        if stored is not None and is_handle(entry):
+            sha, length = _handle(entry)
+            records.append(FileRecord(stored, path_id, None, length, entry["size"],
+                                      entry.get("full_size", entry["size"]), _shared(entry["extension"], strings),
+                                      _shared(entry["purpose"], strings), sha))
+            continue
+        if isinstance(entry, Mapping):
+            content = entry.get("content", "")
+            size = entry.get("size", 0)
+            full_size = entry.get("full_size", size)
+            extension = _shared(entry.get("extension", ""), strings)
+            purpose = _shared(entry.get("purpose", "general"), strings)
+        else:
+            content, size, full_size, extension, purpose = str(entry), 0, 0, "", "general"
+        offset, length = arena.append(content)
+        records.append(FileRecord(arena, path_id, offset, length, size, full_size, extension, purpose))
+
+    arena.freeze()
+    return FileContents(paths, arena, records, stored)
+
+
+def split_file_contents(file_contents: Mapping) -> tuple:
+    """
+    file_contents as content store handles plus the bytes to store
+    Returns ({path: {"sha", "length", "size", "extension", "purpose", "full_size"}}, {sha: UTF-8 bytes});
+    entries that are already handles contribute no bytes (their content is in the store)
+    """
+    handles, blobs = {}, {}
+    for rel_path, entry in file_contents.items():
+        if not isinstance(entry, Mapping):
+            entry = {"content": str(entry), "size": 0, "extension": "", "purpose": "general", "full_size": 0}
+        if is_handle(entry):
+            sha, length = _handle(entry)
+        elif isinstance(entry, FileRecord):
+            data = entry._source.data(entry.offset, entry.length)
+            sha, length = content_sha(data), entry.length
+            blobs[sha] = data
+        else:
+            data = entry["content"].encode("utf-8")
+            sha, length = content_sha(data), len(data)
+            blobs[sha] = data
+        handles[rel_path] = {
+            "sha": sha,
+            "length": length,
+            "size": entry["size"],
+            "extension": entry["extension"],
+            "purpose": entry["purpose"],
+            "full_size": entry.get("full_size", entry["size"])
+        }
+    return handles, blobs
+
+
+class FileNode(Mapping):
+    """
+    A file in file_structure; reads like the scanner's dict ({"type": "file", "path", ...})
+    The path is derived from the parent directory's path and the name, both of which
+    the tree already holds, so a node costs a few pointers instead of a dict and five strings
+    """
+    __slots__ = ("dir_path", "name", "size", "extension", "purpose")
+    KEYS = ("type", "path", "size", "extension", "purpose")
+    type = "file"
+
+    def __init__(self, dir_path: str, name: str, size: int, extension: str, purpose: str):
+        self.dir_path = dir_path
+        self.name = name
+        self.size = size
+        self.extension = extension
+        self.purpose = purpose
+
+    @property
+    def path(self) -> str:
+        return f"{self.dir_path}/{self.name}" if self.dir_path else self.name
+
+    def __getitem__(self, key: str):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __repr__(self) -> str:
+        return f"FileNode({self.path!r}, size={self.size})"
+
+
+def _shared(value: str, strings: dict) -> str:
+    """
+    One string object per distinct value within an analysis
+    A per-analysis memo rather than sys.intern: unique names gain nothing from interning
+    and would only grow the interpreter's global intern table
+    """
+    return strings.setdefault(value, value)
+
+
+def _compact_tree(level: dict, strings: dict, dir_path: str = "") -> dict:
+    """file_structure with FileNode leaves and shared repeated values"""
+    compacted = {}
+    for name, node in level.items():
+        if isinstance(node, dict) and tuple(node) == FileNode.KEYS and node["type"] == "file" \
+                and node["path"] == (f"{dir_path}/{name}" if dir_path else name):
+            node = FileNode(dir_path, name, node["size"],
+                            _shared(node["extension"], strings), _shared(node["purpose"], strings))
+        elif isinstance(node, dict) and isinstance(node.get("contents"), dict):
+            node = dict(node, contents=_compact_tree(node["contents"], strings, node.get("path", name)))
+        compacted[name] = node
+    return compacted
+
+
+def _share_strings(value, strings: dict):
+    """Copy of a JSON-like structure with equal strings collapsed into one object"""
+    if isinstance(value, str):
+        return strings.setdefault(value, value)
+    if isinstance(value, list):
+        return [_share_strings(item, strings) for item in value]
+    if isinstance(value, dict):
+        return {_share_strings(key, strings): _share_strings(item, strings) for key, item in value.items()}
+    return value
+
+
+def compact_repo_data(repo_data: dict, load=None, on_missing=None) -> dict:
+    """
+    repo_data in the compact model, for holding while a request runs
+    ⚡ file_contents: FileRecords over one UTF-8 arena, indexed by a PathTable
+    ⚡ file_structure: FileNode leaves instead of one dict per file
+    ⚡ symbols: one object per distinct name and path (the same strings appear in many edges)
+    ⚡ load: content store reader; stored handles become records that read their content on first use
+      (on_missing: called with SHAs the store has lost, see StoredContents)
+    Everything that reads repo_data keeps working (nodes and records are read-only Mappings);
+    to_plain turns the result back into JSON-ready dicts
+    """
+    if isinstance(repo_data.get("file_contents"), FileContents):
+        return repo_data
+    strings = {}
+    compacted = dict(repo_data)
+    compacted["file_contents"] = contents = build_file_contents(repo_data.get("file_contents", {}), strings, load, on_missing)
+    compacted["file_structure"] = _compact_tree(repo_data.get("file_structure", {}), strings)
+    if repo_data.get("symbols"):
+        strings.update((path, path) for path in contents.paths)
+        compacted["symbols"] = _share_strings(repo_data["symbols"], strings)
+    return compacted
+
+
+def to_plain(value):
+    """json.dumps default= hook: FileContents, FileRecord and FileNode as plain dicts"""
+    if isinstance(value, FileContents):
+        return {path: to_plain(record) for path, record in value.items()}
+    if isinstance(value, (FileRecord, FileNode)):
+        return dict(value.items())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
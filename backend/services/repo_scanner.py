@@ -0,0 +1,296 @@
+# backend/services/repo_scanner.py - SINGLE-PASS REPOSITORY SCANNER
+import os
+
+# Directories hidden from the file tree
+TREE_SKIP_DIRS = {
+    '.git', 'node_modules', '__pycache__', '.next', 'dist', 'build',
+    'coverage', '.venv', 'venv', 'env', '.idea', '.vscode', 'target',
+    '.pytest_cache', '.mypy_cache', '__pypackages__', 'eggs', '.eggs',
+    'vendor', 'bower_components', '.bundle'
+}
+
+# Hidden entries that still belong in the file tree
+TREE_VISIBLE_HIDDEN = {'.env', '.gitignore', '.env.example', '.github'}
+
+# Directories never read for file contents (hidden directories are skipped too)
+READ_SKIP_DIRS = {
+    '.git', 'node_modules', '__pycache__', '.next', 'dist', 'build',
+    'coverage', '.venv', 'venv', 'env', '.idea', '.vscode', 'target',
+    '.pytest_cache', '.mypy_cache', '__pypackages__', 'vendor'
+}
+
+# Directories excluded from language statistics
+LANGUAGE_SKIP_DIRS = {'.git', 'node_modules', '__pycache__', 'venv', '.venv', 'vendor'}
+
+CODE_EXTENSIONS = {
+    'py', 'js', 'jsx', 'ts', 'tsx', 'java', 'go', 'rs', 'cpp', 'c', 'h',
+    'rb', 'php', 'swift', 'kt', 'kts', 'scala', 'sh', 'bash', 'yml', 'yaml',
+    'json', 'xml', 'md', 'txt', 'toml', 'ini', 'cfg', 'env', 'sql', 'graphql',
+    'vue', 'svelte', 'css', 'scss', 'sass', 'html', 'htm'
+}
+
+IMPORTANT_FILENAMES = {
+    "package.json", "requirements.txt", "Dockerfile", "README.md",
+    "docker-compose.yml", "Makefile", ".env.example", "pyproject.toml",
+    "go.mod", "Cargo.toml", "pom.xml", "build.gradle", "tsconfig.json"
+}
+
+MAX_READ_FILE_SIZE = 400000  # 400KB limit
+MAX_TREE_DEPTH = 6
+
+LANGUAGE_EXTENSIONS = {
+    'Python': ['.py', '.pyw'],
+    'JavaScript': ['.js', '.jsx', '.mjs'],
+    'TypeScript': ['.ts', '.tsx'],
+    'Java': ['.java'],
+    'Go': ['.go'],
+    'Rust': ['.rs'],
+    'C++': ['.cpp', '.cc', '.cxx', '.hpp'],
+    'C': ['.c', '.h'],
+    'Ruby': ['.rb'],
+    'PHP': ['.php'],
+    'Swift': ['.swift'],
+    'Kotlin': ['.kt', '.kts'],
+    'Scala': ['.scala'],
+    'HTML': ['.html', '.htm'],
+    'CSS': ['.css', '.scss', '.sass', '.less'],
+    'Shell': ['.sh', '.bash'],
+    'SQL': ['.sql'],
+    'Vue': ['.vue'],
+    'Svelte': ['.svelte']
+}
+
+# Inverted once so each file costs a single dict lookup
+EXTENSION_TO_LANGUAGE = {ext: lang for lang, exts in LANGUAGE_EXTENSIONS.items() for ext in exts}
+
+DEPENDENCY_FILES = {
+    "package.json": "npm",
+    "yarn.lock": "yarn",
+    "requirements.txt": "pip",
+    "Pipfile": "pipenv",
+    "pyproject.toml": "poetry",
+    "Cargo.toml": "cargo",
+    "go.mod": "go",
+    "pom.xml": "maven",
+    "build.gradle": "gradle",
+    "build.gradle.kts": "gradle",
+    "composer.json": "composer",
+    "Gemfile": "bundler"
+}
+
+README_FILES = ["README.md", "README.txt", "README.rst", "README", "readme.md", "Readme.md"]
+
+
+# (purpose, substrings of the lowercased filename), first match wins
+PURPOSE_RULES = (
+    ("testing", ("test", "spec")),
+    ("configuration", ("config", "setup", ".env", "settings", "conf")),
+    ("data_model", ("model", "schema", "entity", "dto")),
+    ("api", ("route", "endpoint", "api", "controller", "handler")),
+    ("ui", ("component", "view", "page", "screen", "template")),
+    ("utility", ("util", "helper", "tool", "common")),
+    ("service", ("service", "provider", "manager", "factory")),
+    ("middleware", ("middleware", "interceptor", "filter")),
+    ("database", ("migration", "seed", "database", "db", ".sql")),
+)
+DEPENDENCY_MANIFESTS = {"package.json", "requirements.txt", "Cargo.toml", "go.mod", "pom.xml", "build.gradle"}
+DOCUMENTATION_MARKERS = ("readme", "doc", ".md")
+
+
+def classify_file_purpose(filename: str, filepath: str) -> str:
+    """
+    Classify file purpose for better diagram organization
+    Runs for every file in the tree, so the keyword tables are built once at import
+    """
+    name_lower = filename.lower()
+
+    for purpose, keywords in PURPOSE_RULES:
+        for keyword in keywords:
+            if keyword in name_lower:
+                return purpose
+
+    if filename in DEPENDENCY_MANIFESTS:
+        return "dependencies"
+
+    for marker in DOCUMENTATION_MARKERS:
+        if marker in name_lower:
+            return "documentation"
+
+    return "general"
+
+
+def file_extension(filename: str) -> str:
+    """Extension without the dot ('' when the name has none)"""
+    return filename.split(".")[-1] if "." in filename else ""
+
+
+def should_read_file(filename: str, size: int) -> bool:
+    """Read if: code file or important config, and under 400KB"""
+    return (
+        (file_extension(filename) in CODE_EXTENSIONS or filename in IMPORTANT_FILENAMES)
+        and size < MAX_READ_FILE_SIZE
+    )
+
+
+def walk_order_key(rel_path: str) -> tuple:
+    """Sort key giving depth-first order with each directory's files before its subdirectories"""
+    parts = rel_path.split('/')
+    return tuple((1, p) for p in parts[:-1]) + ((0, parts[-1]),)
+
+
+def child_dir_flags(name: str, depth: int, in_tree: bool, in_read: bool, in_languages: bool,
+                    max_depth: int = MAX_TREE_DEPTH) -> tuple:
+    """
+    Skip rules for a subdirectory `name` at `depth` (1 = top-level directory)
+    Returns (in_tree, in_read, in_languages) for everything inside it
+    """
+    hidden = name.startswith('.')
+    return (
+        in_tree and depth <= max_depth
+        and name not in TREE_SKIP_DIRS and (not hidden or name in TREE_VISIBLE_HIDDEN),
+        in_read and name not in READ_SKIP_DIRS and not hidden,
+        in_languages and name not in LANGUAGE_SKIP_DIRS
+    )
+
+
+def path_flags(dir_parts: tuple, max_depth: int = MAX_TREE_DEPTH) -> tuple:
+    """(in_tree, in_read, in_languages) for a file in dir_parts, as a full scan would decide"""
+    flags = (True, True, True)
+    for depth, name in enumerate(dir_parts, start=1):
+        flags = child_dir_flags(name, depth, *flags, max_depth=max_depth)
+    return flags
+
+
+def sort_tree_level(level: dict) -> dict:
+    """Files then directories, each by name, recursively (the scanner's canonical tree order)"""
+    files = sorted((k, v) for k, v in level.items() if v["type"] == "file")
+    dirs = sorted((k, v) for k, v in level.items() if v["type"] == "dir")
+    for _, node in dirs:
+        node["contents"] = sort_tree_level(node["contents"])
+    return dict(files + dirs)
+
+
+class RepoScan:
+    """
+    Everything the analyzer needs from one traversal of a repository:
+    file tree, language histogram, read candidates and root-level manifests
+
+    Sources call add_file() once per file; each consumer applies its own skip rules,
+    so any traversal order produces the same result after finalize().
+    """
+
+    def __init__(self, max_depth: int = MAX_TREE_DEPTH):
+        self.max_depth = max_depth
+        self.file_structure = {}
+        self.languages = {}
+        self.read_candidates = []  # (rel_path, source, size)
+        self.root_files = {}  # filename -> source, for manifests and README
+
+    def add_file(self, dir_parts: tuple, name: str, size: int, source,
+                 in_tree: bool = True, in_read: bool = True, in_languages: bool = True):
+        """
+        Record one file
+        - dir_parts: path components of the containing directory (empty for repo root)
+        - source: how to open the file later (absolute path for disk scans)
+        - in_*: whether every ancestor directory passes that consumer's skip rules
+        """
+        rel_path = "/".join(dir_parts + (name,))
+
+        if not dir_parts:
+            self.root_files[name] = source
+
+        if in_languages:
+            lang = EXTENSION_TO_LANGUAGE.get(os.path.splitext(name)[1])
+            if lang:
+                self.languages[lang] = self.languages.get(lang, 0) + 1
+
+        if in_tree and len(dir_parts) <= self.max_depth and (
+                not name.startswith('.') or name in TREE_VISIBLE_HIDDEN):
+            level = self.file_structure
+            for i, part in enumerate(dir_parts):
+                node = level.get(part)
+                if node is None:
+                    node = {
+                        "type": "dir",
+                        "path": "/".join(dir_parts[:i + 1]),
+                        "contents": {}
+                    }
+                    level[part] = node
+                level = node["contents"]
+            level[name] = {
+                "type": "file",
+                "path": rel_path,
+                "size": size,
+                "extension": file_extension(name) or "none",
+                "purpose": classify_file_purpose(name, rel_path)
+            }
+
+        if in_read and should_read_file(name, size):
+            self.read_candidates.append((rel_path, source, size))
+
+    def finalize(self) -> "RepoScan":
+        """Put tree levels and read candidates in canonical walk order"""
+        self.file_structure = sort_tree_level(self.file_structure)
+        self.read_candidates.sort(key=lambda c: walk_order_key(c[0]))
+        return self
+
+    def readme_source(self):
+        """Source of the root README, or None"""
+        for readme_name in README_FILES:
+            if readme_name in self.root_files:
+                return self.root_files[readme_name]
+        return None
+
+    def manifest_sources(self) -> dict:
+        """Root-level dependency manifests as {package_manager: source}"""
+        manifests = {}
+        for dep_file, package_manager in DEPENDENCY_FILES.items():
+            if dep_file in self.root_files:
+                manifests[package_manager] = self.root_files[dep_file]
+        return manifests
+
+
+def scan_repository(repo_path: str, max_depth: int = MAX_TREE_DEPTH) -> RepoScan:
+    """
+    Walk a checked-out repository exactly once with os.scandir
+    Symlinks are skipped so a repository can't point the reader outside its checkout.
+    """
+    scan = RepoScan(max_depth)
+
+    def visit(path: str, dir_parts: tuple, in_tree: bool, in_read: bool, in_languages: bool):
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            return
+
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir():
+                    subdirs.append(entry)
+                    continue
+                if not entry.is_file():
+                    continue
+
+                # Only stat files whose size somebody will look at
+                needs_size = in_tree or in_read
+                size = entry.stat().st_size if needs_size else 0
+            except OSError:
+                continue
+
+            scan.add_file(dir_parts, entry.name, size, entry.path, in_tree, in_read, in_languages)
+
+        for entry in subdirs:
+            name = entry.name
+            child_tree, child_read, child_languages = child_dir_flags(
+                name, len(dir_parts) + 1, in_tree, in_read, in_languages, max_depth
+            )
+
+            if child_tree or child_read or child_languages:
+                visit(entry.path, dir_parts + (name,), child_tree, child_read, child_languages)
+
+    visit(repo_path, (), True, True, True)
+    return scan.finalize()
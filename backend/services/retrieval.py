@@ -0,0 +1,254 @@
+# backend/services/retrieval.py - QUESTION-AWARE RETRIEVAL OVER FILE CHUNKS AND SYMBOLS
+import os
+import re
+import math
+from collections import Counter
+from collections.abc import Mapping
+
+from .context_packer import count_tokens, file_priority, DEFINITION_START
+
+# Retrieval configuration (override in .env)
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "8000"))  # retrieved code per chat turn
+CHUNK_LINES = 40
+MIN_CHUNK_LINES = 12  # a chunk may end early at a definition, but not shorter than this
+MIN_CHUNK_TOKENS = 60  # stop filling once less than this is left
+MAX_SKIPPED_CHUNKS = 20  # chunks too big for what is left before giving up (each may mean reading a file)
+
+# Okapi BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Matches on a file's path and symbol names (from the symbol graph) lift every chunk of that file
+FILE_FIELD_WEIGHT = 0.6
+
+IDENTIFIER = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+WORD_PARTS = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+# Question filler and keywords every source file has; they only add noise to scores
+STOP_WORDS = frozenset("""
+a an and are as at be by can could do does for from how i if in into is it its me my of on or please show
+should tell that the their them there these this to use used uses using was what when where which who why
+will with would you your explain about work works happen happens repo repository code file files project
+def self cls return import from const let var function class new none null true false else elif then end
+string int bool void public private protected static async await try catch except finally pass
+""".split())
+
+
+def _normalize(word: str) -> str:
+    """Lowercase and fold plain plurals, so 'Users' in a question matches a 'user' identifier"""
+    word = word.lower()
+    if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """
+    Search terms of code or a question
+    Identifiers are split into their camelCase/snake_case words and also kept whole,
+    so 'getUserById' matches questions about 'user' as well as the exact name
+    """
+    terms = []
+    for identifier in IDENTIFIER.findall(text):
+        parts = WORD_PARTS.findall(identifier)
+        if len(parts) > 1:
+            terms.append(_normalize(identifier))
+        terms.extend(_normalize(part) for part in parts)
+    return [term for term in terms if len(term) > 1 and term not in STOP_WORDS]
+
+
+def split_chunks(content: str) -> list:
+    """
+    Line ranges of about CHUNK_LINES lines as [(start, end)] (0-based, end exclusive)
+    A chunk ends just before a top-level definition when one is in reach, so chunks hold whole functions
+    """
+    lines = content.split("\n")
+    chunks = []
+    start = 0
+    while start < len(lines):
+        end = min(start + CHUNK_LINES, len(lines))
+        if end < len(lines):
+            for cut in range(end, start + MIN_CHUNK_LINES, -1):
+                if DEFINITION_START.match(lines[cut]):
+                    end = cut
+                    break
+        chunks.append((start, end))
+        start = end
+    return chunks
+
+
+def index_file(content: str) -> list:
+    """[[start, end, term count, {term: frequency}]] for each chunk of one file"""
+    lines = content.split("\n")
+    entries = []
+    for start, end in split_chunks(content):
+        terms = Counter(tokenize("\n".join(lines[start:end])))
+        if terms:
+            entries.append([start, end, sum(terms.values()), dict(terms)])
+    return entries
+
+
+def _content(file_data) -> str:
+    return file_data.get("content", "") if isinstance(file_data, Mapping) else str(file_data)
+
+
+def build_retrieval_index(file_contents: dict) -> dict:
+    """
+    Keyword index over the files read at analysis time (blocking - run via run_blocking)
+    ✅ Built once per analysis and stored with it; questions only score it
+    ✅ Forward index per file, so incremental updates replace just the changed files
+    Returns {"files": {path: [[start, end, term count, {term: frequency}]]}}
+    """
+    files = {}
+    for path, file_data in file_contents.items():
+        entries = index_file(_content(file_data))
+        if entries:
+            files[path] = entries
+    return {"files": files}
+
+
+def update_retrieval_index(index: dict, file_contents: dict, changed_paths) -> dict:
+    """Re-index only changed_paths; files no longer in file_contents drop out"""
+    files = {path: entries for path, entries in (index or {}).get("files", {}).items() if path in file_contents}
+    for path in changed_paths:
+        files.pop(path, None)
+        if path in file_contents:
+            entries = index_file(_content(file_contents[path]))
+            if entries:
+                files[path] = entries
+
+    # Keep walk order so the result matches a full rebuild
+    return {"files": {path: files[path] for path in file_contents if path in files}}
+
+
+def _symbol_terms(path: str, symbols) -> list:
+    """Search terms of a file's path and the names it defines (classes, methods, functions, routes)"""
+    names = [path]
+    if symbols:
+        names.extend(symbols.get("functions", []))
+        for cls in symbols.get("classes", []):
+            names.append(cls["name"])
+            names.extend(cls["methods"])
+        for route in symbols.get("routes", []):
+            names.extend([route["path"], route["handler"]])
+    return tokenize(" ".join(names))
+
+
+def _bm25(query: set, terms: dict, length: int, average_length: float, idf: dict) -> float:
+    score = 0.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+    for term in query:
+        frequency = terms.get(term)
+        if frequency:
+            score += idf[term] * frequency * (BM25_K1 + 1) / (frequency + norm)
+    return score
+
+
+def _idf(query: set, documents: list) -> dict:
+    """BM25 idf of each query term over documents (term -> frequency mappings)"""
+    idf = {}
+    for term in query:
+        df = sum(1 for terms in documents if term in terms)
+        idf[term] = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+    return idf
+
+
+def rank_chunks(repo_data: dict, question: str) -> list:
+    """
+    Chunks by relevance to question as [(score, path, start, end)], best first
+    Score = BM25 of the chunk text + FILE_FIELD_WEIGHT × BM25 of its file's path and symbol names.
+    Chunks nothing matches keep file priority order (architecture files, entry points, shallow paths),
+    first chunks first, so a general question still gets an overview
+    """
+    files = (repo_data.get("retrieval") or {}).get("files", {})
+    contents = repo_data.get("file_contents", {})
+    if not files:
+        return []
+    query = set(tokenize(question))
+
+    chunk_scores = {}
+    if query:
+        chunks = [(path, entry) for path, entries in files.items() for entry in entries]
+        idf = _idf(query, [entry[3] for _, entry in chunks])
+        average = sum(entry[2] for _, entry in chunks) / len(chunks) or 1.0
+
+        symbol_files = (repo_data.get("symbols") or {}).get("files", {})
+        file_terms = {path: Counter(_symbol_terms(path, symbol_files.get(path))) for path in files}
+        file_idf = _idf(query, list(file_terms.values()))
+        file_average = sum(sum(terms.values()) for terms in file_terms.values()) / len(file_terms) or 1.0
+        file_scores = {
+            path: _bm25(query, terms, sum(terms.values()), file_average, file_idf)
+            for path, terms in file_terms.items()
+        }
+
+        for path, entry in chunks:
+            score = _bm25(query, entry[3], entry[2], average, idf) + FILE_FIELD_WEIGHT * file_scores[path]
+            if score > 0:
+                chunk_scores[(path, entry[0])] = score
+
+    ranked = []
+    for path, entries in files.items():
+        priority = file_priority(path, contents.get(path, {}))
+        for ordinal, (start, end, _, _) in enumerate(entries):
+            score = chunk_scores.get((path, start), 0.0)
+            ranked.append(((-score, 0 if score else ordinal, priority, start), (score, path, start, end)))
+    ranked.sort(key=lambda item: item[0])
+    return [chunk for _, chunk in ranked]
+
+
+def _format_range(path: str, file_data, lines: list, start: int, end: int) -> str:
+    """One excerpt in the same layout as format_file_contents"""
+    divider = "=" * 60
+    purpose = file_data.get("purpose", "") if isinstance(file_data, Mapping) else ""
+    return (f"\n{divider}\nFILE: {path} | Lines {start + 1}-{end} | Purpose: {purpose}\n{divider}\n"
+            + "\n".join(lines[start:end]))
+
+
+def retrieve_context(repo_data: dict, question: str, budget: int = None) -> dict:
+    """
+    The code excerpts most relevant to question, within budget tokens
+    ⚡ Only files with a selected chunk are read (lazy records load from the content store here)
+    ✅ Excerpts are grouped per file in relevance order; adjacent chunks are merged
+    Returns {"text", "tokens", "files" (paths by relevance), "chunks", "matched" (chunks with a score)}
+    """
+    budget = RETRIEVAL_TOKEN_BUDGET if budget is None else budget
+    contents = repo_data.get("file_contents", {})
+    remaining = budget
+    lines_by_path = {}
+    selected = {}  # path -> [(start, end)], in order of the file's best chunk
+    matched = skipped = 0
+
+    for score, path, start, end in rank_chunks(repo_data, question):
+        if remaining < MIN_CHUNK_TOKENS or skipped >= MAX_SKIPPED_CHUNKS:
+            break
+        if path not in contents:
+            continue
+        if path not in lines_by_path:
+            lines_by_path[path] = _content(contents[path]).split("\n")
+        if not any(lines_by_path[path][start:end]):
+            continue  # content no longer available (see StoredContents)
+        cost = count_tokens(_format_range(path, contents[path], lines_by_path[path], start, end))
+        if cost > remaining:
+            skipped += 1
+            continue
+        selected.setdefault(path, []).append((start, end))
+        remaining -= cost
+        matched += score > 0
+
+    blocks = []
+    for path, ranges in selected.items():
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        blocks.extend(_format_range(path, contents[path], lines_by_path[path], start, end) for start, end in merged)
+
+    text = "\n".join(blocks)
+    return {
+        "text": text,
+        "tokens": count_tokens(text),
+        "files": list(selected),
+        "chunks": sum(len(ranges) for ranges in selected.values()),
+        "matched": matched
+    }
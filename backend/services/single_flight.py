@@ -0,0 +1,123 @@
+# backend/services/single_flight.py - REQUEST COALESCING
+import os
+import sys
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+
+from .repo_cache import REPO_CACHE_DIR
+from .metrics import log
+
+LOCK_DIR = os.path.join(REPO_CACHE_DIR, "_locks")
+
+if sys.platform.startswith('win'):
+    import msvcrt
+
+    def _try_lock(fd: int) -> bool:
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except (BlockingIOError, PermissionError):
+            return False
+
+    def _unlock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one shared task
+    Callers that arrive while a task is running await the same result instead of
+    starting their own. The shared task is shielded, so one caller disconnecting
+    doesn't cancel the work for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key: str, func, progress=None):
+        """
+        Run func(progress) once per key at a time and return its result to every caller
+        - func: async callable taking a progress callback
+        - progress: this caller's callback; every waiting caller receives the stages
+        """
+        entry = self._inflight.get(key)
+        if entry is None:
+            listeners = []
+
+            def broadcast(stage: str):
+                for listener in list(listeners):
+                    listener(stage)
+
+            task = asyncio.ensure_future(func(broadcast))
+            entry = {"task": task, "listeners": listeners}
+            self._inflight[key] = entry
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            log(f"🤝 Joining in-flight analysis for {key}")
+
+        if progress is not None:
+            entry["listeners"].append(progress)
+        try:
+            return await asyncio.shield(entry["task"])
+        finally:
+            if progress is not None and progress in entry["listeners"]:
+                entry["listeners"].remove(progress)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key, {}).get("task") is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed"""
+        return len(self._inflight)
+
+
+def lock_path(name: str) -> str:
+    """Lock file used for a given resource name"""
+    return os.path.join(LOCK_DIR, hashlib.sha256(name.encode('utf-8')).hexdigest()[:32] + ".lock")
+
+
+@asynccontextmanager
+async def interprocess_lock(name: str, wait: bool = True, on_wait=None):
+    """
+    Exclusive lock shared by all worker processes on this machine (file lock)
+    Polls without blocking a thread; yields True if acquired, False when wait=False
+    and another process holds it. on_wait() is called once if we have to wait.
+    """
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    fd = os.open(lock_path(name), os.O_RDWR | os.O_CREAT, 0o644)
+    acquired = False
+    delay = 0.05
+
+    try:
+        while True:
+            acquired = _try_lock(fd)
+            if acquired or not wait:
+                break
+            if on_wait is not None and delay == 0.05:
+                on_wait()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+        yield acquired
+    finally:
+        if acquired:
+            _unlock(fd)
+        os.close(fd)
@@ -0,0 +1,229 @@
+# backend/services/static_diagrams.py - RULE-BASED DIAGRAMS FROM THE SYMBOL GRAPH
+import re
+import sys
+import json
+
+STATIC_DIAGRAM_TYPES = ("component", "class")
+
+MAX_COMPONENT_NODES = 60
+MAX_SUBGRAPH_DEPTH = 3
+MAX_EXTERNAL_PACKAGES = 8
+MAX_CLASSES = 60
+MAX_MEMBERS_PER_CLASS = 12
+
+PYTHON_STDLIB = set(getattr(sys, "stdlib_module_names", ())) | {"__future__"}
+NODE_BUILTINS = {
+    "fs", "path", "http", "https", "url", "os", "crypto", "events", "stream", "util", "child_process",
+    "net", "zlib", "buffer", "querystring", "readline", "assert", "node:fs", "node:path", "node:http"
+}
+
+
+def _node_id(prefix: str, text: str) -> str:
+    """Mermaid-safe ID: letters, digits and underscores, never a bare keyword"""
+    return f"{prefix}_{re.sub(r'[^A-Za-z0-9_]', '_', text)}"
+
+
+def _label(text: str) -> str:
+    return text.replace('"', "#quot;")
+
+
+def _is_external_package(package: str, language: str) -> bool:
+    if language == "python":
+        return package not in PYTHON_STDLIB
+    return package not in NODE_BUILTINS
+
+
+def _select_component_files(files: dict, edges: list) -> list:
+    """Files worth a node, most connected first, capped at MAX_COMPONENT_NODES"""
+    degree = {}
+    for src, dst in edges:
+        degree[src] = degree.get(src, 0) + 1
+        degree[dst] = degree.get(dst, 0) + 1
+
+    candidates = [
+        path for path, symbols in files.items()
+        if degree.get(path) or symbols["classes"] or symbols["functions"] or symbols["routes"]
+    ]
+    ranked = sorted(candidates, key=lambda p: (-degree.get(p, 0), -len(files[p]["routes"]), p))
+    return sorted(ranked[:MAX_COMPONENT_NODES])
+
+
+def build_component_diagram(repo_data: dict) -> tuple:
+    """
+    flowchart of modules: folders as nested subgraphs, files as nodes,
+    internal imports as edges, the most used third-party packages on the side
+    Returns (mermaid_code, {node_id: file path or package})
+    """
+    graph = repo_data.get("symbols") or {}
+    files = graph.get("files") or {
+        path: {"language": "", "classes": [], "functions": [], "routes": [], "external": []}
+        for path in repo_data.get("file_contents", {})
+    }
+    edges = graph.get("imports", [])
+    selected = _select_component_files(files, edges) or sorted(files)[:MAX_COMPONENT_NODES]
+    kept = set(selected)
+    nodes = {}
+
+    # Folder tree (capped depth) -> files in it
+    tree = {"dirs": {}, "files": []}
+    for path in selected:
+        folders = path.split("/")[:-1][:MAX_SUBGRAPH_DEPTH]
+        level = tree
+        for folder in folders:
+            level = level["dirs"].setdefault(folder, {"dirs": {}, "files": []})
+        level["files"].append(path)
+
+    lines = ["flowchart TB"]
+
+    def file_node(path: str, indent: str):
+        symbols = files[path]
+        node = _node_id("f", path)
+        nodes[node] = path
+        label = path.rsplit("/", 1)[-1]
+        if symbols["routes"]:
+            label += f"<br/>{len(symbols['routes'])} routes"
+        elif symbols["classes"]:
+            label += f"<br/>{len(symbols['classes'])} classes"
+        lines.append(f'{indent}{node}["{_label(label)}"]')
+
+    def emit(level: dict, prefix: str, indent: str):
+        for folder, child in sorted(level["dirs"].items()):
+            folder_path = f"{prefix}{folder}"
+            lines.append(f'{indent}subgraph {_node_id("d", folder_path)}["{_label(folder)}/"]')
+            emit(child, f"{folder_path}/", indent + "    ")
+            lines.append(f"{indent}end")
+        for path in level["files"]:
+            file_node(path, indent)
+
+    emit(tree, "", "    ")
+
+    # Third-party packages imported by the most files
+    usage = {}
+    for path in selected:
+        for package in files[path].get("external", []):
+            if _is_external_package(package, files[path].get("language", "")):
+                usage.setdefault(package, []).append(path)
+    packages = sorted(usage, key=lambda p: (-len(usage[p]), p))[:MAX_EXTERNAL_PACKAGES]
+    if packages:
+        lines.append('    subgraph d_external["External packages"]')
+        for package in packages:
+            node = _node_id("x", package)
+            nodes[node] = package
+            lines.append(f'        {node}(["{_label(package)}"])')
+        lines.append("    end")
+
+    for src, dst in edges:
+        if src in kept and dst in kept:
+            lines.append(f"    {_node_id('f', src)} --> {_node_id('f', dst)}")
+    for package in packages:
+        for path in usage[package]:
+            lines.append(f"    {_node_id('f', path)} -.-> {_node_id('x', package)}")
+
+    return "\n".join(lines), nodes
+
+
+def _class_name(text: str) -> str:
+    """'models.Base[int]' -> 'Base'"""
+    base = re.split(r"[\[<(]", text, 1)[0].rsplit(".", 1)[-1]
+    return re.sub(r"[^A-Za-z0-9_]", "_", base)
+
+
+def build_class_diagram(repo_data: dict) -> tuple:
+    """
+    classDiagram of the repository's classes with their methods and inheritance
+    Classes are taken in file order; a repeated class name keeps its first definition.
+    Returns (mermaid_code, {class name: file path})
+    """
+    files = (repo_data.get("symbols") or {}).get("files", {})
+    classes = {}
+    for path, symbols in files.items():
+        for cls in symbols["classes"]:
+            name = _class_name(cls["name"])
+            if name and name not in classes and len(classes) < MAX_CLASSES:
+                classes[name] = (path, cls)
+
+    lines = ["classDiagram"]
+    inheritance = []
+    for name, (path, cls) in classes.items():
+        members = [m for m in cls["methods"] if not (m.startswith("__") and m.endswith("__") and m != "__init__")]
+        if members:
+            lines.append(f"    class {name} {{")
+            for method in members[:MAX_MEMBERS_PER_CLASS]:
+                visibility = "-" if method.startswith("_") and method != "__init__" else "+"
+                lines.append(f"        {visibility}{method}()")
+            if len(members) > MAX_MEMBERS_PER_CLASS:
+                lines.append(f"        +{len(members) - MAX_MEMBERS_PER_CLASS}_more()")
+            lines.append("    }")
+        else:
+            lines.append(f"    class {name}")
+        for base in cls["bases"]:
+            base_name = _class_name(base)
+            if base_name and base_name not in ("object", name):
+                inheritance.append(f"    {base_name} <|-- {name}")
+
+    lines.extend(dict.fromkeys(inheritance))
+    return "\n".join(lines), {name: path for name, (path, _) in classes.items()}
+
+
+def build_static_diagram(diagram_type: str, repo_data: dict) -> tuple:
+    """Dispatch to the builder for diagram_type. Returns (mermaid_code, nodes)"""
+    if diagram_type == "component":
+        return build_component_diagram(repo_data)
+    if diagram_type == "class":
+        return build_class_diagram(repo_data)
+    raise ValueError(f"No static builder for '{diagram_type}' diagrams (supported: {', '.join(STATIC_DIAGRAM_TYPES)})")
+
+
+def describe_nodes_text(diagram_type: str, nodes: dict, repo_data: dict) -> str:
+    """One line per node for the description prompt: id, what it is, its main symbols"""
+    files = (repo_data.get("symbols") or {}).get("files", {})
+    lines = []
+    for node, target in nodes.items():
+        symbols = files.get(target)
+        if diagram_type == "class":
+            cls = next((c for c in files.get(target, {}).get("classes", []) if _class_name(c["name"]) == node), None)
+            detail = f"methods: {', '.join(cls['methods'][:10])}" if cls else ""
+        elif symbols:
+            names = [c["name"] for c in symbols["classes"]] + symbols["functions"]
+            routes = [f"{r['method']} {r['path']}" for r in symbols["routes"]]
+            detail = "; ".join(part for part in (
+                f"routes: {', '.join(routes[:6])}" if routes else "",
+                f"defines: {', '.join(names[:10])}" if names else ""
+            ) if part)
+        else:
+            detail = "third-party package"
+        lines.append(f"{node}: {target}{f' ({detail})' if detail else ''}")
+    return "\n".join(lines)
+
+
+def parse_descriptions(text: str, nodes: dict) -> dict:
+    """{node_id: description} from the model's JSON reply; unknown IDs and bad JSON are ignored"""
+    match = re.search(r"\{.*\}", text or "", re.S)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    return {
+        node: re.sub(r'["\[\]{}<>|]', "", str(description)).strip()[:60]
+        for node, description in data.items()
+        if node in nodes and str(description).strip()
+    }
+
+
+def apply_descriptions(diagram_type: str, mermaid_code: str, descriptions: dict) -> str:
+    """Add the descriptions as a second label line (component) or as notes (class)"""
+    if not descriptions:
+        return mermaid_code
+    if diagram_type == "class":
+        notes = [f'    note for {name} "{description}"' for name, description in descriptions.items()]
+        return mermaid_code + "\n" + "\n".join(notes)
+
+    def add_description(match):
+        description = descriptions.get(match.group(1))
+        if not description:
+            return match.group(0)
+        return f'{match.group(1)}{match.group(2)}"{match.group(3)}<br/><i>{description}</i>"{match.group(4)}'
+
+    return re.sub(r'\b([fx]_\w+)(\[|\(\[)"([^"]*)"(\]|\]\))', add_description, mermaid_code)
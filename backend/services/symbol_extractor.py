@@ -0,0 +1,563 @@
+# backend/services/symbol_extractor.py - SYMBOL & IMPORT GRAPH EXTRACTION
+import re
+import ast
+import posixpath
+from collections.abc import Mapping
+
+PYTHON_EXTENSIONS = {'py'}
+JS_EXTENSIONS = {'js', 'jsx', 'ts', 'tsx', 'mjs', 'cjs'}
+JS_RESOLVE_SUFFIXES = ['', '.ts', '.tsx', '.js', '.jsx', '.mjs', '/index.ts', '/index.tsx', '/index.js', '/index.jsx']
+
+# Decorator / call names that register an HTTP handler
+ROUTE_METHODS = {'get', 'post', 'put', 'patch', 'delete', 'head', 'options', 'route', 'api_route', 'websocket', 'all'}
+# Objects whose .get('/path', ...) is a route registration rather than an HTTP client call
+JS_ROUTER_NAMES = re.compile(r'^(?:app|router|server|api|routes|r|\w*Router|\w*App)$')
+
+MAX_CALLS_PER_FUNCTION = 30
+MAX_CALL_EDGES = 2000
+
+JS_TOKEN = re.compile(
+    r'//[^\n]*|/\*.*?\*/'                                      # comments (skipped)
+    r'|`(?:\\.|[^`\\])*`|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\''  # strings
+    r'|[A-Za-z_$][\w$]*'                                       # identifiers / keywords
+    r'|=>|\.\.\.|[^\s\w]',                                     # punctuation
+    re.S
+)
+JS_KEYWORDS = {
+    'if', 'for', 'while', 'switch', 'catch', 'return', 'typeof', 'function', 'import', 'export',
+    'new', 'await', 'async', 'yield', 'delete', 'void', 'in', 'of', 'instanceof', 'super', 'this',
+    'const', 'let', 'var', 'class', 'extends', 'else', 'do', 'try', 'finally', 'throw', 'case', 'default'
+}
+
+
+def _empty_symbols(language: str) -> dict:
+    return {"language": language, "imports": [], "classes": [], "functions": [], "routes": [], "calls": {}}
+
+
+# ----------------------------------------------------------------------------- Python
+
+def _parse_python(source: str):
+    """ast.parse, retrying once without a definition cut off by the read limit"""
+    try:
+        return ast.parse(source)
+    except (SyntaxError, ValueError) as e:
+        error_line = getattr(e, "lineno", None)
+
+    lines = source.split("\n")
+    cut = min(error_line or len(lines), len(lines)) - 1
+    while cut > 0:
+        line = lines[cut]
+        if line and not line[0].isspace() and not line.startswith(("#", ")", "]", "}")):
+            break
+        cut -= 1
+    while cut > 0 and lines[cut - 1].startswith("@"):
+        cut -= 1
+    if cut <= 0:
+        return None
+
+    try:
+        return ast.parse("\n".join(lines[:cut]))
+    except (SyntaxError, ValueError):
+        return None
+
+
+def _python_route(decorator, handler: str):
+    """{"method", "path", "handler"} for @app.get("/x") / @router.post(...) / @app.route(..., methods=[...])"""
+    if not (isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Attribute)):
+        return None
+    verb = decorator.func.attr
+    if verb not in ROUTE_METHODS or not decorator.args:
+        return None
+    path = decorator.args[0]
+    if not (isinstance(path, ast.Constant) and isinstance(path.value, str)):
+        return None
+
+    method = verb.upper()
+    if verb in ('route', 'api_route'):
+        method = "GET"
+        for keyword in decorator.keywords:
+            if keyword.arg == "methods" and isinstance(keyword.value, (ast.List, ast.Tuple)):
+                names = [e.value for e in keyword.value.elts if isinstance(e, ast.Constant)]
+                method = "|".join(str(n).upper() for n in names) or method
+    elif verb == 'websocket':
+        method = "WS"
+    return {"method": method, "path": path.value, "handler": handler}
+
+
+def _python_calls(node) -> list:
+    """Names called inside a function body: foo() -> foo, obj.bar() -> bar, Cls() -> Cls"""
+    calls = []
+    for child in ast.walk(node):
+        if not isinstance(child, ast.Call):
+            continue
+        func = child.func
+        name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+        if name and name not in calls:
+            calls.append(name)
+            if len(calls) >= MAX_CALLS_PER_FUNCTION:
+                break
+    return calls
+
+
+def extract_python_symbols(source: str) -> dict:
+    """Imports, classes, functions, routes and calls of one Python module (None if it can't be parsed)"""
+    tree = _parse_python(source)
+    if tree is None:
+        return None
+
+    symbols = _empty_symbols("python")
+    symbols["from_names"] = {}
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name not in symbols["imports"]:
+                    symbols["imports"].append(alias.name)
+        elif isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            if module not in symbols["imports"]:
+                symbols["imports"].append(module)
+            symbols["from_names"].setdefault(module, []).extend(
+                alias.name for alias in node.names if alias.name != "*"
+            )
+
+    def add_function(node, qualname: str):
+        for decorator in node.decorator_list:
+            route = _python_route(decorator, qualname)
+            if route:
+                symbols["routes"].append(route)
+        calls = _python_calls(node)
+        if calls:
+            symbols["calls"][qualname] = calls
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols["functions"].append(node.name)
+            add_function(node, node.name)
+        elif isinstance(node, ast.ClassDef):
+            methods = []
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    methods.append(item.name)
+                    add_function(item, f"{node.name}.{item.name}")
+            symbols["classes"].append({
+                "name": node.name,
+                "bases": [ast.unparse(base) for base in node.bases],
+                "methods": methods
+            })
+
+    return symbols
+
+
+# ----------------------------------------------------------------------------- JavaScript / TypeScript
+
+def _js_tokens(source: str) -> list:
+    """(kind, text) tokens with comments dropped: kind is 'str', 'id' or 'punct'"""
+    tokens = []
+    for match in JS_TOKEN.finditer(source):
+        text = match.group(0)
+        first = text[0]
+        if text.startswith(("//", "/*")):
+            continue
+        if first in "\"'`":
+            tokens.append(("str", text[1:-1]))
+        elif first.isalpha() or first in "_$":
+            tokens.append(("id", text))
+        else:
+            tokens.append(("punct", text))
+    return tokens
+
+
+def _skip_parens(tokens: list, i: int) -> int:
+    """Index just past the ')' matching the '(' at tokens[i]"""
+    depth = 0
+    while i < len(tokens):
+        text = tokens[i][1]
+        if tokens[i][0] == "punct":
+            if text == "(":
+                depth += 1
+            elif text == ")":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        i += 1
+    return i
+
+
+def _is_arrow_function(tokens: list, i: int) -> bool:
+    """Does an arrow function start at tokens[i] (right after '=')?"""
+    if i < len(tokens) and tokens[i] == ("id", "async"):
+        i += 1
+    if i >= len(tokens):
+        return False
+    if tokens[i] == ("id", "function"):
+        return True
+    if tokens[i] == ("punct", "("):
+        i = _skip_parens(tokens, i)
+        # Optional TS return type: (...): Type =>
+        if i < len(tokens) and tokens[i] == ("punct", ":"):
+            while i < len(tokens) and tokens[i] != ("punct", "=>") and tokens[i][1] not in (";", "{", "="):
+                i += 1
+    elif tokens[i][0] == "id":
+        i += 1
+    return i < len(tokens) and tokens[i] == ("punct", "=>")
+
+
+def extract_js_symbols(source: str, language: str = "javascript") -> dict:
+    """
+    Imports, classes, functions, routes and calls of one JS/TS module
+    A single pass over comment- and string-aware tokens, tracking brace depth
+    to know which function (or class body) each token belongs to.
+    """
+    symbols = _empty_symbols(language)
+    tokens = _js_tokens(source)
+    scopes = []  # (kind "class"/"function", name, brace depth of its body)
+    pending = None  # (kind, name, paren depth) waiting for its opening brace
+    depth = 0
+    parens = 0
+
+    def current(kind):
+        for scope in reversed(scopes):
+            if scope[0] == kind:
+                return scope
+        return None
+
+    def define_function(name):
+        nonlocal pending
+        cls = scopes[-1] if scopes and scopes[-1][0] == "class" and scopes[-1][2] == depth else None
+        qualname = f"{cls[1]}.{name}" if cls else name
+        if cls:
+            for entry in symbols["classes"]:
+                if entry["name"] == cls[1] and name not in entry["methods"]:
+                    entry["methods"].append(name)
+        elif not current("function") and name not in symbols["functions"]:
+            symbols["functions"].append(name)
+        pending = ("function", qualname, parens)
+        return qualname
+
+    def add_import(module):
+        if module and module not in symbols["imports"]:
+            symbols["imports"].append(module)
+
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else ("", "")
+        prev = tokens[i - 1] if i > 0 else ("", "")
+
+        if kind == "punct":
+            if text == "(":
+                parens += 1
+            elif text == ")":
+                parens -= 1
+            elif text == "{":
+                depth += 1
+                if pending and pending[2] == parens:
+                    scopes.append((pending[0], pending[1], depth))
+                    pending = None
+            elif text == "}":
+                while scopes and scopes[-1][2] >= depth:
+                    scopes.pop()
+                depth -= 1
+            elif text == ";" and pending and pending[0] == "function":
+                pending = None  # expression-bodied arrow function
+            i += 1
+            continue
+
+        if kind == "str":
+            i += 1
+            continue
+
+        # import x from 'y' / export { a } from 'y' / import 'y'
+        if text in ("import", "export") and prev[1] != ".":
+            if nxt == ("punct", "("):
+                if i + 2 < len(tokens) and tokens[i + 2][0] == "str":
+                    add_import(tokens[i + 2][1])
+            else:
+                j = i + 1
+                while j < len(tokens) and j < i + 64 and tokens[j][1] not in (";", "function", "class", "const", "let", "var"):
+                    if tokens[j][0] == "str" and (tokens[j - 1][1] in ("from", "import")):
+                        add_import(tokens[j][1])
+                        break
+                    j += 1
+        elif text == "require" and nxt == ("punct", "(") and i + 2 < len(tokens) and tokens[i + 2][0] == "str":
+            add_import(tokens[i + 2][1])
+        elif text == "class" and nxt[0] == "id" and prev[1] != ".":
+            bases = []
+            j = i + 2
+            if j < len(tokens) and tokens[j] == ("id", "extends"):
+                j += 1
+                base = []
+                while j < len(tokens) and (tokens[j][0] == "id" or tokens[j][1] == "."):
+                    base.append(tokens[j][1])
+                    j += 1
+                if base:
+                    bases.append("".join(base))
+            symbols["classes"].append({"name": nxt[1], "bases": bases, "methods": []})
+            pending = ("class", nxt[1], parens)
+            i += 2
+            continue
+        elif text == "function" and prev[1] != ".":
+            j = i + 1
+            if j < len(tokens) and tokens[j] == ("punct", "*"):
+                j += 1
+            if j < len(tokens) and tokens[j][0] == "id":
+                define_function(tokens[j][1])
+                i = j + 1
+                continue
+            pending = ("function", current("function")[1] if current("function") else "<anonymous>", parens)
+        elif text in ("const", "let", "var") and nxt[0] == "id" and i + 2 < len(tokens) \
+                and tokens[i + 2] == ("punct", "=") and _is_arrow_function(tokens, i + 3):
+            define_function(nxt[1])
+            i += 3
+            continue
+        elif nxt == ("punct", "(") and text not in JS_KEYWORDS:
+            scope = scopes[-1] if scopes else None
+            in_class_body = scope and scope[0] == "class" and scope[2] == depth and prev[1] not in (".", "new")
+            after = _skip_parens(tokens, i + 1) if in_class_body else 0
+            if in_class_body and after < len(tokens) and tokens[after][1] in ("{", ":"):
+                # Method definition in a class body: name(args) { / name(args): Type {
+                define_function(text)
+                i += 1
+                continue
+
+            # app.get('/users', handler) route registration
+            if prev[1] == "." and text in ROUTE_METHODS and i >= 2 and JS_ROUTER_NAMES.match(tokens[i - 2][1]) \
+                    and i + 2 < len(tokens) and tokens[i + 2][0] == "str" and tokens[i + 2][1].startswith("/"):
+                handler = "<inline>"
+                j = _skip_parens(tokens, i + 1) - 2
+                if j > i + 2 and tokens[j][0] == "id" and tokens[j - 1][1] in (",", "."):
+                    handler = tokens[j][1]
+                method = "ALL" if text in ("all", "route") else text.upper()
+                symbols["routes"].append({"method": method, "path": tokens[i + 2][1], "handler": handler})
+
+            function = current("function")
+            if function and prev[1] != "function":
+                calls = symbols["calls"].setdefault(function[1], [])
+                if text not in calls and len(calls) < MAX_CALLS_PER_FUNCTION:
+                    calls.append(text)
+        elif nxt == ("punct", "=") and scopes and scopes[-1][0] == "class" and scopes[-1][2] == depth \
+                and _is_arrow_function(tokens, i + 2):
+            # Class field holding an arrow function: handle = () => {...}
+            define_function(text)
+            i += 2
+            continue
+
+        i += 1
+
+    return symbols
+
+
+# ----------------------------------------------------------------------------- Graph
+
+def extract_file_symbols(path: str, content: str) -> dict:
+    """Symbols for one file by extension, or None for unsupported/unparseable files"""
+    extension = path.rsplit(".", 1)[-1].lower() if "." in path else ""
+    try:
+        if extension in PYTHON_EXTENSIONS:
+            return extract_python_symbols(content)
+        if extension in JS_EXTENSIONS:
+            return extract_js_symbols(content, "typescript" if extension in ("ts", "tsx") else "javascript")
+    except (RecursionError, MemoryError):
+        return None
+    return None
+
+
+def _python_module_index(paths) -> dict:
+    """Dotted module name (and each shorter suffix, for src/ or backend/ roots) -> path"""
+    index = {}
+    for path in paths:
+        if not path.endswith(".py"):
+            continue
+        parts = path[:-3].split("/")
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        for start in range(len(parts)):
+            index.setdefault(".".join(parts[start:]), path)
+    return index
+
+
+def _resolve_python_import(module: str, names: list, path: str, index: dict) -> list:
+    if module.startswith("."):
+        level = len(module) - len(module.lstrip("."))
+        package = path.split("/")[:-1]
+        if level > 1:
+            package = package[:-(level - 1)]
+        base = ".".join(package + ([module.lstrip(".")] if module.lstrip(".") else []))
+    else:
+        base = module
+
+    resolved = []
+    for candidate in [base] + [f"{base}.{name}" if base else name for name in names]:
+        target = index.get(candidate)
+        if target and target != path and target not in resolved:
+            resolved.append(target)
+    return resolved
+
+
+def _resolve_js_import(module: str, path: str, paths: set) -> list:
+    if module.startswith("@/"):
+        base = "src/" + module[2:]
+    elif module.startswith("."):
+        base = posixpath.normpath(posixpath.join(posixpath.dirname(path), module))
+    else:
+        return []
+    for suffix in JS_RESOLVE_SUFFIXES:
+        if base + suffix in paths:
+            return [base + suffix]
+    return []
+
+
+def build_symbol_graph(file_contents: dict) -> dict:
+    """
+    Compact architecture data for the prompt, from the files already read
+    ✅ Python via ast; JS/TS via a lightweight tokenizer
+    ✅ Internal import edges resolved to repository paths
+    ✅ Call edges resolved within a file and across its internal imports
+    Returns {"files": {path: symbols}, "imports": [[src, dst]], "calls": [[src, dst]]}
+    where call endpoints are "path:qualname"
+    """
+    files = {}
+    for path, file_data in file_contents.items():
+        symbols = _extract_entry(path, file_data)
+        if symbols is not None:
+            files[path] = symbols
+    return link_symbol_graph(files, set(file_contents))
+
+
+def _extract_entry(path: str, file_data):
+    content = file_data.get("content", "") if isinstance(file_data, Mapping) else str(file_data)
+    return extract_file_symbols(path, content)
+
+
+def update_symbol_graph(graph: dict, file_contents: dict, changed_paths) -> dict:
+    """
+    Re-parse only changed_paths and relink
+    Files no longer in file_contents drop out; everything else keeps its parsed symbols.
+    """
+    files = {path: symbols for path, symbols in (graph or {}).get("files", {}).items() if path in file_contents}
+    for path in changed_paths:
+        files.pop(path, None)
+        if path in file_contents:
+            symbols = _extract_entry(path, file_contents[path])
+            if symbols is not None:
+                files[path] = symbols
+
+    # Keep walk order so the rendered graph matches a full rebuild
+    ordered = {path: files[path] for path in file_contents if path in files}
+    return link_symbol_graph(ordered, set(file_contents))
+
+
+def link_symbol_graph(files: dict, paths: set) -> dict:
+    """Resolve imports and calls of already-parsed files (cheap: no parsing)"""
+    module_index = _python_module_index(paths)
+
+    import_edges = []
+    for path, symbols in files.items():
+        symbols.pop("call_targets", None)
+        from_names = symbols.get("from_names", {})
+        internal, external = [], []
+        for module in symbols["imports"]:
+            if symbols["language"] == "python":
+                targets = _resolve_python_import(module, from_names.get(module, []), path, module_index)
+                package = module.split(".")[0]
+            else:
+                targets = _resolve_js_import(module, path, paths)
+                package = "/".join(module.split("/")[:2]) if module.startswith("@") else module.split("/")[0]
+            internal.extend(t for t in targets if t not in internal)
+            if not targets and package and not module.startswith((".", "@/")) and package not in external:
+                external.append(package)
+        symbols["uses"] = internal
+        symbols["external"] = external
+        import_edges.extend([path, target] for target in internal)
+
+    # name -> [(path, qualname)] for everything callable the repository defines
+    definitions = {}
+    for path, symbols in files.items():
+        for name in symbols["functions"]:
+            definitions.setdefault(name, []).append((path, name))
+        for cls in symbols["classes"]:
+            definitions.setdefault(cls["name"], []).append((path, cls["name"]))
+            for method in cls["methods"]:
+                definitions.setdefault(method, []).append((path, f"{cls['name']}.{method}"))
+
+    call_edges = []
+    for path, symbols in files.items():
+        scope = [path] + symbols["uses"]
+        for caller, callees in symbols.get("calls", {}).items():
+            resolved_callees = []
+            for callee in callees:
+                # Prefer the caller's own file, then the files it imports; anything else is ambiguous
+                for candidate_path in scope:
+                    match = next((d for d in definitions.get(callee, ()) if d[0] == candidate_path), None)
+                    if match and match != (path, caller):
+                        resolved_callees.append(f"{match[0]}:{match[1]}")
+                        break
+            if resolved_callees:
+                symbols.setdefault("call_targets", {})[caller] = resolved_callees
+                call_edges.extend([f"{path}:{caller}", target] for target in resolved_callees)
+            if len(call_edges) >= MAX_CALL_EDGES:
+                break
+
+    return {"files": files, "imports": import_edges, "calls": call_edges[:MAX_CALL_EDGES]}
+
+
+def _short_target(target: str, path: str) -> str:
+    """'services/x.py:func' -> 'func' within the same file, 'x.func' otherwise"""
+    target_path, qualname = target.rsplit(":", 1)
+    if target_path == path:
+        return qualname
+    module = target_path.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+    return f"{module}.{qualname}"
+
+
+def format_symbol_graph(graph: dict) -> str:
+    """
+    Symbol graph as prompt text, one block per file:
+    routes, classes with methods, functions with the internal functions they call
+    """
+    files = (graph or {}).get("files", {})
+    if not files:
+        return ""
+
+    totals = {
+        "classes": sum(len(s["classes"]) for s in files.values()),
+        "functions": sum(len(s["functions"]) for s in files.values()),
+        "routes": sum(len(s["routes"]) for s in files.values())
+    }
+    result = [
+        f"SYMBOL GRAPH ({len(files)} files, {totals['classes']} classes, "
+        f"{totals['functions']} functions, {totals['routes']} routes, "
+        f"{len(graph.get('imports', []))} internal imports, {len(graph.get('calls', []))} call edges)"
+    ]
+
+    for path, symbols in files.items():
+        if not (symbols["classes"] or symbols["functions"] or symbols["routes"] or symbols.get("uses")):
+            continue
+        calls = symbols.get("call_targets", {})
+        result.append(f"\n{path}")
+
+        if symbols.get("uses"):
+            result.append(f"  uses: {', '.join(symbols['uses'])}")
+        if symbols.get("external"):
+            result.append(f"  external: {', '.join(symbols['external'][:12])}")
+
+        for route in symbols["routes"]:
+            result.append(f"  route {route['method']} {route['path']} -> {route['handler']}")
+
+        for cls in symbols["classes"]:
+            bases = f"({', '.join(cls['bases'])})" if cls["bases"] else ""
+            result.append(f"  class {cls['name']}{bases}: {', '.join(cls['methods']) or '-'}")
+            for method in cls["methods"]:
+                qualname = f"{cls['name']}.{method}"
+                if qualname in calls:
+                    result.append(f"    {method} -> {', '.join(_short_target(t, path) for t in calls[qualname])}")
+
+        plain = [f for f in symbols["functions"] if f not in calls]
+        if plain:
+            result.append(f"  functions: {', '.join(plain)}")
+        for function in symbols["functions"]:
+            if function in calls:
+                result.append(f"  def {function} -> {', '.join(_short_target(t, path) for t in calls[function])}")
+
+    return "\n".join(result)
@@ -0,0 +1,182 @@
+# backend/services/tarball_source.py - STREAMING TARBALL ACQUISITION (NO GIT BINARY)
+import io
+import os
+import re
+import base64
+import bisect
+import tarfile
+import httpx
+
+from .repo_scanner import RepoScan, path_flags, should_read_file, walk_order_key, README_FILES, DEPENDENCY_FILES
+from .github_service import (
+    decode_prefix, file_content_entry, raise_for_git_error, READ_BYTE_BUDGET, MAX_CONTENT_BYTES,
+    GITHUB_URL, GITHUB_API_URL
+)
+from .metrics import log
+
+# Tarball host (override in .env, e.g. to point at a local stand-in serving fixture tarballs)
+GITHUB_CODELOAD_URL = os.getenv("GITHUB_CODELOAD_URL", "https://codeload.github.com").rstrip("/")
+TARBALL_TIMEOUT_SECONDS = 180  # same budget as a git clone
+MAX_FILES = 200  # same cap as read_candidate_files
+
+
+def _auth_headers(github_token: str = None) -> dict:
+    if not github_token:
+        return {}
+    basic = base64.b64encode(f"x-access-token:{github_token}".encode('utf-8')).decode('ascii')
+    return {"Authorization": f"Basic {basic}"}
+
+
+def _raise_for_response(status_code: int, owner: str, repo_name: str):
+    """Map HTTP failures onto the same messages a failed git fetch produces"""
+    if status_code == 404:
+        raise_for_git_error("repository not found", owner, repo_name)
+    if status_code in (401, 403):
+        raise_for_git_error("authentication failed", owner, repo_name)
+    raise_for_git_error(f"HTTP {status_code} from GitHub", owner, repo_name)
+
+
+def _raise_for_transport(error: httpx.HTTPError, owner: str, repo_name: str):
+    if isinstance(error, httpx.TimeoutException):
+        raise_for_git_error("timed out", owner, repo_name)
+    if isinstance(error, httpx.ConnectError):
+        raise_for_git_error("could not resolve host", owner, repo_name)
+    raise_for_git_error(str(error), owner, repo_name)
+
+
+async def resolve_head_sha(owner: str, repo_name: str, github_token: str = None) -> str:
+    """
+    Remote HEAD commit from the smart-HTTP ref advertisement (what git ls-remote reads)
+    One small request, no git binary needed
+    """
+    url = f"{GITHUB_URL}/{owner}/{repo_name}.git/info/refs?service=git-upload-pack"
+    try:
+        async with httpx.AsyncClient(timeout=60, follow_redirects=True) as client:
+            response = await client.get(url, headers=_auth_headers(github_token))
+    except httpx.HTTPError as e:
+        _raise_for_transport(e, owner, repo_name)
+    if response.status_code != 200:
+        _raise_for_response(response.status_code, owner, repo_name)
+
+    match = re.search(rb"([0-9a-f]{40}) HEAD\x00", response.content)
+    if not match:
+        raise_for_git_error("remote HEAD not found in ref advertisement", owner, repo_name)
+    return match.group(1).decode('ascii')
+
+
+def tarball_url(owner: str, repo_name: str, ref: str, github_token: str = None) -> str:
+    """codeload for public repositories; the API endpoint (which redirects to codeload) with a token"""
+    if github_token:
+        return f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/tarball/{ref}"
+    return f"{GITHUB_CODELOAD_URL}/{owner}/{repo_name}/tar.gz/{ref}"
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks (tarfile's streaming mode reads from it)"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b""
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def scan_tarball(fileobj, max_files: int = MAX_FILES, byte_budget: int = None) -> dict:
+    """
+    Fill the analysis structures from a .tar.gz stream in a single pass, nothing written to disk
+    Every file goes through RepoScan (tree, languages, skip rules); only read candidates
+    that could still make the first max_files in walk order are decompressed into memory
+    Returns {"scan", "file_contents", "readme", "dependencies", "commit_sha"}
+    """
+    byte_budget = READ_BYTE_BUDGET if byte_budget is None else byte_budget
+    scan = RepoScan()
+    kept = []  # (walk_order_key, rel_path, content, size), the best max_files text files so far
+    root_texts = {}
+    commit_sha = None
+
+    with tarfile.open(fileobj=fileobj, mode="r|gz") as tar:
+        for member in tar:
+            commit_sha = commit_sha or tar.pax_headers.get("comment")  # GitHub stores the commit here
+            if not member.isfile():
+                continue  # directories, symlinks (submodules are not in tarballs at all)
+
+            parts = member.name.split("/")[1:]  # drop the "owner-repo-sha/" top directory
+            if not parts or not parts[-1]:
+                continue
+            dir_parts = tuple(parts[:-1])
+            name = parts[-1]
+            rel_path = "/".join(parts)
+            flags = path_flags(dir_parts)
+            scan.add_file(dir_parts, name, member.size, rel_path, *flags)
+
+            is_root_text = not dir_parts and (name in README_FILES or name in DEPENDENCY_FILES)
+            key = walk_order_key(rel_path)
+            is_candidate = flags[1] and should_read_file(name, member.size) and (
+                len(kept) < max_files or key < kept[-1][0])
+            if not (is_candidate or is_root_text):
+                continue
+
+            data = tar.extractfile(member).read(None if is_root_text else MAX_CONTENT_BYTES)
+            if is_root_text:
+                root_texts[name] = data.decode('utf-8', errors='ignore')
+            if is_candidate:
+                content = decode_prefix(data)
+                if content is not None:
+                    bisect.insort(kept, (key, rel_path, content, member.size))
+                    del kept[max_files:]
+
+    file_contents = {}
+    remaining = byte_budget
+    for _, rel_path, content, size in kept:
+        if remaining <= 0:
+            break
+        content = content[:remaining]
+        remaining -= len(content)
+        file_contents[rel_path] = file_content_entry(rel_path, content, size)
+
+    return {
+        "scan": scan.finalize(),
+        "file_contents": file_contents,
+        "readme": next((root_texts[name] for name in README_FILES if name in root_texts), ""),
+        "dependencies": {
+            package_manager: root_texts[dep_file][:10000]  # First 10KB
+            for dep_file, package_manager in DEPENDENCY_FILES.items() if dep_file in root_texts
+        },
+        "commit_sha": commit_sha
+    }
+
+
+def stream_repository_tarball(owner: str, repo_name: str, ref: str, github_token: str = None) -> dict:
+    """
+    Download the tarball for ref and scan it while it streams (blocking - run via run_blocking)
+    ⚡ No git process, no temporary checkout to create or clean up
+    """
+    url = tarball_url(owner, repo_name, ref, github_token)
+    headers = {"Authorization": f"Bearer {github_token}"} if github_token else {}
+    log(f"📦 Streaming tarball {owner}/{repo_name}@{ref[:10]}...")
+    try:
+        # Cross-origin redirects (API -> codeload) drop the Authorization header; codeload URLs carry their own token
+        with httpx.stream("GET", url, headers=headers, follow_redirects=True,
+                          timeout=httpx.Timeout(TARBALL_TIMEOUT_SECONDS, connect=30)) as response:
+            if response.status_code != 200:
+                _raise_for_response(response.status_code, owner, repo_name)
+            result = scan_tarball(_ChunkReader(response.iter_bytes()))
+    except httpx.HTTPError as e:
+        _raise_for_transport(e, owner, repo_name)
+    except tarfile.TarError as e:
+        raise_for_git_error(f"Invalid tarball: {e}", owner, repo_name)
+
+    result["commit_sha"] = result["commit_sha"] or ref
+    return result
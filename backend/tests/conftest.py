@@ -0,0 +1,5 @@
+# backend/tests/conftest.py - RUN TESTS FROM backend/ IMPORTS (python -m pytest tests)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
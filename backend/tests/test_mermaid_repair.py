@@ -0,0 +1,47 @@
+# backend/tests/test_mermaid_repair.py - REPAIR ENGINE AGAINST THE MERMAID CORPUS
+import pytest
+
+from benchmarks.mermaid_repair_bench import load_corpus
+from services.mermaid_parser import parse_mermaid
+from services.mermaid_repair import repair_diagram
+
+CASES = load_corpus()
+
+
+@pytest.mark.parametrize("name, code, expected", CASES, ids=[case[0] for case in CASES])
+def test_broken_diagram_repairs_to_expected(name, code, expected):
+    assert expected is not None, f"{name} has no .expected.mmd (python -m benchmarks.mermaid_repair_bench --update)"
+    assert repair_diagram(code)["mermaid_code"] == expected
+
+
+@pytest.mark.parametrize("name, code, expected", CASES, ids=[case[0] for case in CASES])
+def test_repaired_diagram_round_trips_unchanged(name, code, expected):
+    """A diagram that is already fine gets no fixes and comes back byte for byte"""
+    result = repair_diagram(expected)
+    assert result["fixes"] == []
+    assert result["mermaid_code"] == expected
+
+
+@pytest.mark.parametrize("code", [
+    'flowchart TD\n    e1@{ shape: rect }\n    e1 --> B',
+    'flowchart LR\n    A@{ shape: rounded, label: "Start {x}" } --> B@{ shape: diam }',
+    'flowchart TD\n    A@{ shape: rect }:::big --> B',
+    'flowchart LR\n    A e1@--> B\n    B e2@-- yes --> C',
+])
+def test_node_data_and_edge_ids_are_valid(code):
+    result = repair_diagram(code)
+    assert result["is_valid"], result["errors"]
+    assert result["fixes"] == []
+    assert result["mermaid_code"] == code
+
+
+def test_node_data_label_and_shape_are_read():
+    diagram = parse_mermaid('flowchart TD\n    A@{ shape: diam, label: "Is valid?" } --> B')
+    assert diagram.nodes["A"]["label"] == "Is valid?"
+    assert diagram.nodes["A"]["shape"] == "diam"
+
+
+def test_unclosed_node_data_is_reported():
+    result = repair_diagram('flowchart TD\n    A@{ shape: rect --> B')
+    assert not result["is_valid"]
+    assert any("Unclosed '@{'" in error for error in result["errors"])
@@ -1,59 +1,55 @@
 # frontend/components/mermaid_renderer.py
+import time
 import streamlit as st
 import streamlit.components.v1 as components
 from utils.helpers import generate_key
+from config import DEFAULT_API_ENDPOINT
+from functools import lru_cache
+import requests
 import re
 
+BACKEND_RETRY_SECONDS = 30  # skip the repair API this long after it failed
+_backend_down_until = {}  # api_endpoint -> time.monotonic() deadline
+
+def strip_diagram_wrappers(mermaid_code: str) -> str:
+    """Remove markdown code blocks, [DIAGRAM_START]/[DIAGRAM_END] markers and a leftover 'mermaid' tag
+    Same rules as the backend's mermaid_repair.strip_wrappers, kept here so the UI only talks to it over HTTP"""
+    fixed_code = mermaid_code.replace("[DIAGRAM_START]", "").replace("[DIAGRAM_END]", "").strip()
+    fixed_code = re.sub(r'^```[ \t]*(?:mermaid)?[ \t]*\n?', '', fixed_code)
+    fixed_code = re.sub(r'\n?```[ \t]*$', '', fixed_code)
+    fixed_code = re.sub(r'^mermaid[ \t]*\n', '', fixed_code)
+    return fixed_code.strip()
+
+@lru_cache(maxsize=256)
+def _repair_with_backend(api_endpoint: str, mermaid_code: str) -> tuple:
+    response = requests.post(
+        f"{api_endpoint}/repair-diagram",
+        json={"mermaid_code": mermaid_code},
+        timeout=3
+    )
+    response.raise_for_status()
+    result = response.json()
+    return result["mermaid_code"], tuple(result.get("fixes", []))
+
 def validate_and_fix_mermaid_syntax(mermaid_code: str) -> tuple:
-    """Validate and fix common Mermaid syntax errors"""
-    errors = []
-    fixed_code = mermaid_code.strip()
-    
-    # Remove markdown code blocks
-    if fixed_code.startswith("```mermaid"):
-        fixed_code = fixed_code.replace("```mermaid", "").replace("```", "").strip()
-    elif fixed_code.startswith("```"):
-        fixed_code = fixed_code.replace("```", "").strip()
+    """Validate and fix common Mermaid syntax errors
+    Uses the backend's shared repair engine so both sides fix diagrams the same way;
+    if the API is unreachable the code is only unwrapped (backend output is already repaired)
+    and the API is not tried again for BACKEND_RETRY_SECONDS, so reruns don't wait on timeouts"""
+    fixed_code = strip_diagram_wrappers(mermaid_code)
+    api_endpoint = st.session_state.get('api_endpoint', DEFAULT_API_ENDPOINT)
+    if time.monotonic() < _backend_down_until.get(api_endpoint, 0):
+        return fixed_code, []
     
-    # Remove [DIAGRAM_START] and [DIAGRAM_END] markers if present
-    fixed_code = fixed_code.replace("[DIAGRAM_START]", "").replace("[DIAGRAM_END]", "").strip()
-    
-    # Fix common syntax issues
-    lines = fixed_code.split('\n')
-    fixed_lines = []
-    
-    for line in lines:
-        original_line = line
-        line = line.strip()
-        
-        if not line or line.startswith('%%'):
-            fixed_lines.append(line)
-            continue
-        
-        if line.startswith('subgraph') or line == 'end':
-            fixed_lines.append(line)
-            continue
-        
-        # Fix arrow syntax
-        line = re.sub(r'-{3,}>', '-->', line)
-        line = re.sub(r'\.{3,}>', '-..->', line)
-        
-        # Fix node IDs with spaces - more conservative approach
-        if '-->' in line or '-..->' in line or '==>' in line:
-            parts = line.split('[', 1)
-            if len(parts) > 1:
-                before_bracket = parts[0]
-                before_bracket = re.sub(r'(\w+)\s+(\w+)(?=\s*$)', r'\1_\2', before_bracket)
-                line = before_bracket + '[' + parts[1]
-        
-        if line != original_line.strip():
-            errors.append(f"Fixed: {original_line.strip()[:50]}...")
-        
-        fixed_lines.append(line)
-    
-    fixed_code = '\n'.join(fixed_lines)
+    try:
+        fixed_code, fixes = _repair_with_backend(api_endpoint, fixed_code)
+    except (requests.ConnectionError, requests.Timeout):
+        _backend_down_until[api_endpoint] = time.monotonic() + BACKEND_RETRY_SECONDS
+        return fixed_code, []
+    except Exception:
+        return fixed_code, []
     
-    return fixed_code, errors
+    return fixed_code, [f"Fixed: {fix}" for fix in fixes]
 
 def render_mermaid(mermaid_code, height=800, unique_id=None, theme='dark'):
     """Render mermaid diagram with ZOOM, PAN, and FULLSCREEN controls"""
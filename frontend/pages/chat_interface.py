@@ -2,6 +2,7 @@
 import streamlit as st
 import requests
 from components.mermaid_renderer import render_mermaid
+from utils.helpers import iter_sse_events
 from utils.state_manager import (
     add_to_diagram_history, 
     clear_chat_history,
@@ -275,69 +276,105 @@ def generate_suggestions(response_text, has_diagram):
     
     return suggestions[:3]
 
+STAGE_LABELS = {
+    "resolving": "🔍 Checking repository...",
+    "waiting": "🤝 Waiting for a running analysis of this repository...",
+    "cloning": "📥 Cloning repository...",
+    "analyzing": "📂 Analyzing files...",
+    "prompting": "💭 Preparing context...",
+    "generating": "✍️ Writing answer...",
+}
+
 def handle_chat_message(api_endpoint, repo_url, question):
-    """Handle sending a chat message with GitHub token support"""
+    """Handle sending a chat message with GitHub token support (streamed answer)"""
     
-    with st.spinner("🤔 Thinking..."):
-        payload = {
-            "repo_url": repo_url,
-            "question": question,
-            "chat_history": st.session_state.chat_history[-5:]
-        }
+    status_placeholder = st.empty()
+    answer_placeholder = st.empty()
+    status_placeholder.info("🤔 Thinking...")
+    
+    payload = {
+        "repo_url": repo_url,
+        "question": question,
+        "chat_history": st.session_state.chat_history[-5:]
+    }
+    
+    headers = {}
+    if st.session_state.github_token:
+        headers["X-GitHub-Token"] = st.session_state.github_token
+    
+    try:
+        response = requests.post(
+            f"{api_endpoint}/chat/stream",
+            json=payload,
+            headers=headers,
+            stream=True,
+            timeout=(10, 300)
+        )
         
-        headers = {}
-        if st.session_state.github_token:
-            headers["X-GitHub-Token"] = st.session_state.github_token
+        if response.status_code != 200:
+            error_detail = response.json().get('detail', 'Unknown error')
+            st.error(f"❌ Error: {error_detail}")
+            return
         
-        try:
-            response = requests.post(
-                f"{api_endpoint}/chat",
-                json=payload,
-                headers=headers,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                answer = data["answer"]
-                
-                st.session_state.chat_history.append({
-                    "role": "user",
-                    "content": question
-                })
-                
-                assistant_msg = {
-                    "role": "assistant",
-                    "content": answer
-                }
-                
-                has_diagram = False
-                if data.get("has_diagram") and data.get("mermaid_code"):
-                    assistant_msg["diagram"] = data["mermaid_code"]
-                    has_diagram = True
-                    
-                    add_to_diagram_history(
-                        diagram_type=data.get("diagram_type", "custom"),
-                        code=data["mermaid_code"],
-                        repo_name=data.get("repo_name", "Unknown"),
-                        prompt=question
-                    )
-                
-                suggestions = generate_suggestions(answer, has_diagram)
-                assistant_msg["suggestions"] = suggestions
-                
-                st.session_state.chat_history.append(assistant_msg)
-                st.rerun()
-            else:
-                error_detail = response.json().get('detail', 'Unknown error')
+        streamed_text = ""
+        data = None
+        for event, event_data in iter_sse_events(response):
+            if event == "stage":
+                status_placeholder.info(STAGE_LABELS.get(event_data["stage"], "🤔 Thinking..."))
+            elif event == "token":
+                streamed_text += event_data["text"]
+                answer_placeholder.markdown(streamed_text + " ▌")
+            elif event == "diagram":
+                status_placeholder.info("📊 Diagram received, finishing answer...")
+            elif event == "done":
+                data = event_data
+            elif event == "error":
+                error_detail = event_data.get("detail", "Unknown error")
+                status_placeholder.empty()
                 if "rate limit" in error_detail.lower():
                     st.error("⚠️ GitHub API rate limit exceeded. Please add a GitHub token in the sidebar for private repos.")
                 else:
                     st.error(f"❌ Error: {error_detail}")
+                return
         
-        except requests.exceptions.Timeout:
-            st.error("⏱️ Request timed out. Please try a more specific question.")
-        except requests.exceptions.ConnectionError:
-            st.error(f"🔌 Cannot connect to API. Ensure FastAPI server is running on {api_endpoint}")
-        except Exception as e:
-            st.error(f"❌ Error: {str(e)}")
\ No newline at end of file
+        status_placeholder.empty()
+        if data is None:
+            st.error("❌ Error: The response stream ended unexpectedly")
+            return
+        
+        answer = data["answer"]
+        
+        st.session_state.chat_history.append({
+            "role": "user",
+            "content": question
+        })
+        
+        assistant_msg = {
+            "role": "assistant",
+            "content": answer
+        }
+        
+        has_diagram = False
+        if data.get("has_diagram") and data.get("mermaid_code"):
+            assistant_msg["diagram"] = data["mermaid_code"]
+            has_diagram = True
+            
+            add_to_diagram_history(
+                diagram_type=data.get("diagram_type", "custom"),
+                code=data["mermaid_code"],
+                repo_name=data.get("repo_name", "Unknown"),
+                prompt=question
+            )
+        
+        suggestions = generate_suggestions(answer, has_diagram)
+        assistant_msg["suggestions"] = suggestions
+        
+        st.session_state.chat_history.append(assistant_msg)
+        st.rerun()
+    
+    except requests.exceptions.Timeout:
+        st.error("⏱️ Request timed out. Please try a more specific question.")
+    except requests.exceptions.ConnectionError:
+        st.error(f"🔌 Cannot connect to API. Ensure FastAPI server is running on {api_endpoint}")
+    except Exception as e:
+        st.error(f"❌ Error: {str(e)}")
\ No newline at end of file
@@ -1,8 +1,10 @@
 # frontend/pages/quick_diagrams.py
+import time
 import streamlit as st
 import requests
 from config import DIAGRAM_TYPES
 from components.mermaid_renderer import render_mermaid
+from utils.helpers import iter_sse_events
 from utils.state_manager import add_to_diagram_history
 
 def render(api_endpoint):
@@ -25,64 +27,182 @@ def render(api_endpoint):
             DIAGRAM_TYPES
         )
     
+    engine = "llm"
+    if diagram_type in STATIC_DIAGRAM_TYPES:
+        if st.checkbox("⚡ Instant: build from the code structure (no AI)", key="quick_static"):
+            engine = "static"
+    
     if st.button("🎨 Generate Diagram"):
         if not repo_url:
             st.error("Please enter a GitHub repository URL.")
         else:
-            generate_standard_diagram(api_endpoint, repo_url, diagram_type)
+            generate_standard_diagram(api_endpoint, repo_url, diagram_type, engine)
+    
+    with st.expander("📚 Generate several diagram types at once"):
+        diagram_types = st.multiselect(
+            "Diagram Types",
+            DIAGRAM_TYPES,
+            default=["component", "sequence", "class", "database"],
+            key="quick_multi_types"
+        )
+        
+        if st.button("🎨 Generate Selected Diagrams"):
+            if not repo_url:
+                st.error("Please enter a GitHub repository URL.")
+            elif not diagram_types:
+                st.error("Please choose at least one diagram type.")
+            else:
+                generate_multiple_diagrams(api_endpoint, repo_url, diagram_types)
+
+# Diagram types the backend can build without the LLM (engine=static)
+STATIC_DIAGRAM_TYPES = ("component", "class")
+
+# Background job polling
+JOB_POLL_INTERVAL = 2  # seconds
+JOB_MAX_WAIT = 900  # 15 minutes
+
+STAGE_LABELS = {
+    "queued": "⏳ Waiting for a free worker...",
+    "starting": "🚀 Starting...",
+    "resolving": "🔍 Checking repository...",
+    "waiting": "🤝 Waiting for a running analysis of this repository...",
+    "cloning": "📥 Cloning repository...",
+    "analyzing": "📂 Analyzing files...",
+    "building_context": "📝 Building context...",
+    "prompting": "💭 Preparing prompt...",
+    "generating": "🎨 Generating diagram...",
+    "validating": "✔️ Validating diagram...",
+}
 
-def generate_standard_diagram(api_endpoint, repo_url, diagram_type):
-    """Generate a standard diagram"""
+def wait_for_job(api_endpoint, job_id, status_placeholder):
+    """Poll a background job until it completes, fails or times out"""
+    deadline = time.time() + JOB_MAX_WAIT
+    
+    while time.time() < deadline:
+        response = requests.get(f"{api_endpoint}/jobs/{job_id}", timeout=10)
+        response.raise_for_status()
+        job = response.json()
+        
+        if job["status"] in ("completed", "failed"):
+            return job
+        
+        status_placeholder.info(STAGE_LABELS.get(job.get("stage"), "⏳ Working..."))
+        time.sleep(JOB_POLL_INTERVAL)
+    
+    raise requests.exceptions.Timeout(f"Job {job_id} did not finish in time")
+
+def generate_standard_diagram(api_endpoint, repo_url, diagram_type, engine="llm"):
+    """Generate a standard diagram via a background job"""
+    status_placeholder = st.empty()
     with st.spinner("Generating diagram..."):
         try:
             response = requests.post(
-                f"{api_endpoint}/generate-diagram",
-                json={"repo_url": repo_url, "diagram_type": diagram_type},
-                timeout=60,
+                f"{api_endpoint}/jobs/diagram",
+                json={"repo_url": repo_url, "diagram_type": diagram_type, "engine": engine},
+                timeout=30,
             )
             
-            if response.status_code == 200:
-                data = response.json()
+            if response.status_code != 202:
+                st.error(f"Error: {response.json().get('detail', 'Unknown error')}")
+                return
+            
+            job = wait_for_job(api_endpoint, response.json()["job_id"], status_placeholder)
+            status_placeholder.empty()
+            
+            if job["status"] == "completed":
                 st.success("✅ Diagram Generated Successfully!")
-                
-                mermaid_code = data["mermaid_code"]
-                repo_name = data.get("repo_name", "Unknown")
-                
-                # Save to history
-                add_to_diagram_history(
-                    diagram_type=diagram_type,
-                    code=mermaid_code,
-                    repo_name=repo_name,
-                    prompt=f"Standard {diagram_type} diagram"
-                )
-                
-                # Render diagram
-                st.markdown("### 📊 Generated Diagram")
-                theme = st.session_state.get('theme', 'Dark')
-                mermaid_theme = 'dark' if theme == 'Dark' else 'default'
-                render_mermaid(
-                    mermaid_code,
-                    height=600,
-                    unique_id=f"quick_{diagram_type}",
-                    theme=mermaid_theme
-                )
-                
-                # Code view and download
-                with st.expander("📝 View Mermaid Code"):
-                    st.code(mermaid_code, language="mermaid")
-                    
-                    st.download_button(
-                        label="💾 Download Mermaid Code",
-                        data=mermaid_code,
-                        file_name=f"{diagram_type}_diagram.mmd",
-                        mime="text/plain"
-                    )
+                show_diagram(job["result"], diagram_type)
             else:
-                st.error(f"Error: {response.json().get('detail', 'Unknown error')}")
+                st.error(f"Error: {job.get('error') or 'Unknown error'}")
         
         except requests.exceptions.Timeout:
             st.error("Request timed out. The repository might be too large or the server is busy.")
         except requests.exceptions.ConnectionError:
             st.error("Could not connect to the API. Make sure the FastAPI server is running.")
         except Exception as e:
-            st.error(f"Error: {str(e)}")
\ No newline at end of file
+            st.error(f"Error: {str(e)}")
+
+def show_diagram(data, diagram_type, title="### 📊 Generated Diagram"):
+    """Save a generated diagram to history, render it and offer the code for download"""
+    mermaid_code = data["mermaid_code"]
+    repo_name = data.get("repo_name", "Unknown")
+    
+    # Save to history
+    add_to_diagram_history(
+        diagram_type=diagram_type,
+        code=mermaid_code,
+        repo_name=repo_name,
+        prompt=f"Standard {diagram_type} diagram"
+    )
+    
+    # Render diagram
+    st.markdown(title)
+    theme = st.session_state.get('theme', 'Dark')
+    mermaid_theme = 'dark' if theme == 'Dark' else 'default'
+    render_mermaid(
+        mermaid_code,
+        height=600,
+        unique_id=f"quick_{diagram_type}",
+        theme=mermaid_theme
+    )
+    
+    # Code view and download
+    with st.expander("📝 View Mermaid Code"):
+        st.code(mermaid_code, language="mermaid")
+        
+        st.download_button(
+            label="💾 Download Mermaid Code",
+            data=mermaid_code,
+            file_name=f"{diagram_type}_diagram.mmd",
+            mime="text/plain",
+            key=f"download_quick_{diagram_type}"
+        )
+
+def generate_multiple_diagrams(api_endpoint, repo_url, diagram_types):
+    """Generate several diagram types from one analysis, showing each as soon as it is ready"""
+    status_placeholder = st.empty()
+    status_placeholder.info("⏳ Starting...")
+    remaining = set(diagram_types)
+    
+    try:
+        response = requests.post(
+            f"{api_endpoint}/generate-diagrams",
+            json={"repo_url": repo_url, "diagram_types": diagram_types},
+            stream=True,
+            timeout=(10, JOB_MAX_WAIT),
+        )
+        
+        if response.status_code != 200:
+            st.error(f"Error: {response.json().get('detail', 'Unknown error')}")
+            return
+        
+        for event, data in iter_sse_events(response):
+            if event == "stage":
+                if data.get("diagram_type") is None:
+                    status_placeholder.info(STAGE_LABELS.get(data["stage"], "⏳ Working..."))
+                else:
+                    status_placeholder.info(f"🎨 Generating diagrams... ({len(remaining)} left: {', '.join(sorted(remaining))})")
+            elif event == "diagram":
+                remaining.discard(data["diagram_type"])
+                show_diagram(data, data["diagram_type"], title=f"### 📊 {data['diagram_type'].title()} Diagram")
+            elif event == "diagram_error":
+                remaining.discard(data["diagram_type"])
+                st.error(f"❌ {data['diagram_type'].title()} diagram failed: {data.get('detail', 'Unknown error')}")
+            elif event == "done":
+                status_placeholder.empty()
+                st.success(f"✅ {data['succeeded']} of {len(diagram_types)} diagrams generated")
+                return
+            elif event == "error":
+                status_placeholder.empty()
+                st.error(f"Error: {data.get('detail', 'Unknown error')}")
+                return
+        
+        status_placeholder.empty()
+        st.error("Error: The response stream ended unexpectedly")
+    
+    except requests.exceptions.Timeout:
+        st.error("Request timed out. The repository might be too large or the server is busy.")
+    except requests.exceptions.ConnectionError:
+        st.error("Could not connect to the API. Make sure the FastAPI server is running.")
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
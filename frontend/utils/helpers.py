@@ -1,4 +1,5 @@
 # frontend/utils/helpers.py
+import json
 import hashlib
 
 def generate_key(content):
@@ -9,4 +10,19 @@ def truncate_text(text, max_length=60):
     """Truncate text to specified length"""
     if len(text) <= max_length:
         return text
-    return text[:max_length] + "..."
\ No newline at end of file
+    return text[:max_length] + "..."
+
+def iter_sse_events(response):
+    """Yield (event, data) pairs from a Server-Sent Events response"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())